@@ -1,226 +1,250 @@
-import csv
 import os
-import time
-import random
-import requests
-import base64
+import csv
+import argparse
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser
+import metrics
+import rate_limiter
+from catalog import Catalog, CATALOG_DB, SOURCES
+from downloader import download_to_file
+from geocoder import geocode, resolve_all, save_cache
+from static_fetch import find_bing_images
 
 # --- 配置区 ---
-CSV_FILE = 'data.csv'
+CSV_FILE = 'data.csv'  # 从总账本 catalog.db 导出给网页用
 EXCEL_FILE = 'new_places.xlsx'
 IMAGE_DIR = 'images'
 SHOW_BROWSER = True
+EXCEL_FIELDS = ['name', 'type', 'desc']  # Excel 前三列
+DIFF_FIELDS = ['type', 'desc']  # 比对这些字段判断老地名有没有改动
+POLICIES = ['skip', 'update-changed', 'update-all']
 
 
 # --- 初始化浏览器 ---
 def setup_driver():
     print("🚗 正在启动浏览器驱动...")
-    chrome_options = Options()
-    if not SHOW_BROWSER:
-        chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
-
-
-# --- 获取下一个ID ---
-def get_next_id():
-    if not os.path.exists(CSV_FILE):
-        return 1
-    last_id = 0
-    try:
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['id'] and row['id'].isdigit():
-                    last_id = int(row['id'])
-    except:
-        pass
-    return last_id + 1
-
-
-# --- 🔥 修改点1：读取现有数据 (返回 名字:ID 的字典) ---
-def get_existing_data():
-    """
-    返回一个字典，格式为 {'地名': 'ID'}
-    这样我们不仅知道存在，还知道它的ID是多少，方便覆盖更新
-    """
-    data_map = {}
-    if os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['name']:
-                    # 记录 名字 -> ID 的映射
-                    data_map[row['name']] = row['id']
-    return data_map
-
-
-# --- 🔥 新增功能：更新CSV中的某一行 ---
-def update_csv_row(target_id, new_row_data):
-    """
-    读取整个文件，找到对应ID的行进行替换，然后重写文件
-    """
-    rows = []
-    # 1. 读取所有数据
-    with open(CSV_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        header = next(reader)  # 读取表头
-        rows.append(header)
-        for row in reader:
-            # 如果这一行的ID等于我们要更新的ID，就用新数据替换
-            if row[0] == str(target_id):
-                rows.append(new_row_data)
-            else:
-                rows.append(row)
-
-    # 2. 重新写入文件
-    with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
-    print(f"    📝 ID:{target_id} 的数据已更新覆盖")
+    return browser.get_driver('auto', headless=not SHOW_BROWSER)
 
 
-# --- 查坐标 (API) ---
+# --- 查坐标 (带缓存 + 限速，见 geocoder.py) ---
 def get_coordinates(place_name):
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {'q': place_name, 'format': 'json', 'limit': 1, 'accept-language': 'zh-CN'}
-    headers = {'User-Agent': 'Lizhidao_Project_Student_Demo'}
-    try:
-        res = requests.get(url, params=params, headers=headers, timeout=5)
-        data = res.json()
-        if data:
-            return data[0]['lat'], data[0]['lon']
-    except:
-        pass
+    result = geocode(place_name)
+    if result:
+        return result
     return "0", "0"
 
 
 # --- Selenium 下载图片 ---
-def download_image_selenium(driver, keyword, save_name):
+def download_image_selenium(get_driver, keyword, save_name):
     print(f"    🔍 搜索图片: {keyword} ...")
-    search_url = f"https://www.bing.com/images/search?q={keyword}"
-    driver.get(search_url)
-    time.sleep(random.uniform(2, 4))
     try:
-        img_elements = driver.find_elements(By.CSS_SELECTOR, "img.mimg")
-        if not img_elements:
-            print("    ⚠️ 未找到图片元素")
-            return False
-        img_url = img_elements[0].get_attribute("src")
+        # 先用轻量 HTTP 直接取搜索页，拿不到再让浏览器打开
+        static_srcs = find_bing_images(keyword)
+        if static_srcs:
+            img_url = static_srcs[0]
+        else:
+            search_url = f"https://www.bing.com/images/search?q={keyword}"
+            driver = get_driver()
+            rate_limiter.wait(search_url)
+            with metrics.timed("page_load"):
+                driver.get(search_url)
+            with metrics.timed("find_elements"):
+                img_elements = driver.find_elements(By.CSS_SELECTOR, "img.mimg")
+            if img_elements:
+                rate_limiter.success(search_url)
+            else:
+                rate_limiter.backoff(search_url, "没有搜索结果")
+            if not img_elements:
+                print("    ⚠️ 未找到图片元素")
+                return False
+            img_url = img_elements[0].get_attribute("src")
         save_path = os.path.join(IMAGE_DIR, save_name)
 
         if img_url.startswith("data:image"):
-            base64_data = img_url.split(",")[1]
-            with open(save_path, "wb") as f:
-                f.write(base64.decodebytes(base64_data.encode()))
-            print(f"    ✅ 图片更新成功 (Base64)")
-            return True
+            if download_to_file(img_url, save_path):
+                print(f"    ✅ 图片更新成功 (Base64)")
+                return True
         elif img_url.startswith("http"):
-            res = requests.get(img_url, timeout=10)
-            with open(save_path, "wb") as f:
-                f.write(res.content)
-            print(f"    ✅ 图片更新成功 (URL)")
-            return True
+            if download_to_file(img_url, save_path, timeout=10):
+                print(f"    ✅ 图片更新成功 (URL)")
+                return True
     except Exception as e:
         print(f"    ❌ 下载出错: {e}")
     return False
 
 
+# --- 读 Excel / 总账本，做成同样列名的表 ---
+def load_excel():
+    """Excel 前三列: 名字、类型、简介；同名多行以最后一行为准"""
+    df = pd.read_excel(EXCEL_FILE, dtype=str).iloc[:, :3]
+    df.columns = EXCEL_FIELDS
+    df = df.fillna('').apply(lambda col: col.str.strip())
+    df = df[(df['name'] != '') & (df['name'] != 'nan')]
+    return df.drop_duplicates('name', keep='last').reset_index(drop=True)
+
+
+def load_existing(catalog=None):
+    """总账本里的点位；不传 catalog (还没建过账本) 就直接读 data.csv"""
+    header = SOURCES['sites']['header']
+    if catalog is not None:
+        source_rows = catalog.rows('sites')
+    else:
+        source_rows = []
+        if os.path.exists(CSV_FILE):
+            with open(CSV_FILE, 'r', encoding='utf-8') as f:
+                source_rows = [row for row in csv.reader(f)][1:]
+    rows = [(row + [''] * len(header))[:len(header)] for row in source_rows]
+    existing = pd.DataFrame(rows, columns=header)
+    # 同名的老数据以第一条为准 (和 catalog.find 按名字查到的一致)
+    return existing.drop_duplicates('name', keep='first')
+
+
+# --- 🔍 向量化比对：每一行标成 new / changed / unchanged，并列出改了哪些字段 ---
+def diff_places(excel, existing):
+    merged = excel.merge(existing, on='name', how='left', suffixes=('', '_old'), indicator=True)
+    is_new = merged.pop('_merge') == 'left_only'
+    changed = pd.DataFrame({field: (merged[field] != merged[field + '_old'].fillna('')) & ~is_new
+                            for field in DIFF_FIELDS})
+    merged['status'] = 'unchanged'
+    merged.loc[changed.any(axis=1), 'status'] = 'changed'
+    merged.loc[is_new, 'status'] = 'new'
+    merged['changed_fields'] = ''
+    for field in DIFF_FIELDS:
+        merged['changed_fields'] += changed[field].map({True: field + ' ', False: ''})
+    merged['changed_fields'] = merged['changed_fields'].str.strip()
+    # 老数据没坐标 (查不到时记成 0) 或者图片文件不在了，也得补
+    no_coords = merged['lat'].fillna('').isin(['', '0', '0.0']) | merged['lng'].fillna('').isin(['', '0', '0.0'])
+    image_files = merged['image'].fillna('')
+    no_image = (image_files == '') | ~image_files.map(lambda name: bool(name) and os.path.exists(os.path.join(IMAGE_DIR, name)))
+    merged['need_geocode'] = is_new | no_coords
+    merged['need_image'] = is_new | no_image
+    return merged
+
+
+def plan_work(diff, policy):
+    """按策略挑出要处理的行：skip 只加新的；update-changed 再加改过的；update-all 全部重新抓"""
+    if policy == 'skip':
+        work = diff[diff['status'] == 'new'].copy()
+    elif policy == 'update-changed':
+        work = diff[diff['status'] != 'unchanged'].copy()
+        # 没改动的老数据，坐标/图片都还在的话就不用重新抓
+        needs_fetch = diff['need_geocode'] | diff['need_image']
+        work = pd.concat([work, diff[(diff['status'] == 'unchanged') & needs_fetch]])
+    else:
+        work = diff.copy()
+        work['need_geocode'] = True
+        work['need_image'] = True
+    return work
+
+
+def print_diff(diff, work, policy):
+    counts = diff['status'].value_counts()
+    print(f"📊 Excel 共 {len(diff)} 个地名: 新增 {counts.get('new', 0)}，有改动 {counts.get('changed', 0)}，"
+          f"没变 {counts.get('unchanged', 0)}")
+    for place in diff[diff['status'] == 'changed'].itertuples(index=False):
+        print(f"   ✏️ {place.name} (ID: {place.id}) 改了: {place.changed_fields}")
+    print(f"🧭 策略 {policy}: 需要处理 {len(work)} 个 (查坐标 {int(work['need_geocode'].sum())}，"
+          f"下图片 {int(work['need_image'].sum())})")
+
+
+def import_places(catalog, work, get_driver):
+    """逐个处理 plan_work 挑出来的地名：查坐标、下图片、记进总账本；每处理完一个 yield 一次"""
+    for place in work.itertuples(index=False):
+        is_new = place.status == 'new'
+        # 新地名由总账本发编号，老地名沿用原编号
+        target_id = catalog.allocate_id('sites') if is_new else place.id
+        print(f"\n{'🆕 新增' if is_new else '🔄 更新'}: 【{place.name}】 (ID: {target_id})")
+
+        # 1. 查坐标 (新地名或者老数据没坐标才查)
+        if place.need_geocode:
+            lat, lng = get_coordinates(place.name)
+        else:
+            lat, lng = place.lat, place.lng
+
+        # 2. 下图片 (覆盖旧图片，文件名保持不变，还是 ID.jpg)
+        img_filename = place.image if not is_new and place.image else f"{target_id}.jpg"
+        if place.need_image:
+            image_ok = download_image_selenium(get_driver, f"{place.name} 风景", img_filename)
+            metrics.record("image", "success" if image_ok else "fail")
+
+        # 3. 记进总账本 (编号已存在就原地更新，否则追加；CSV 最后统一导出)
+        catalog.upsert('sites', [target_id, place.name, lat, lng, place.type, place.desc, img_filename])
+        metrics.record("place", "success", status=place.status)
+        yield target_id
+
+
 # --- 主程序 ---
 def main():
-    print("🤖 交互式采集脚本启动...")
-    if not os.path.exists(IMAGE_DIR): os.makedirs(IMAGE_DIR)
+    parser = argparse.ArgumentParser(description="把 new_places.xlsx 里的地名导入总账本并导出 data.csv")
+    parser.add_argument('--policy', choices=POLICIES, default='update-changed',
+                        help="skip: 只加新地名；update-changed: 再更新有改动的；update-all: 全部重新查坐标、下图片")
+    parser.add_argument('--dry-run', action='store_true', help="只打印比对结果，不改任何数据")
+    args = parser.parse_args()
+
+    print("🤖 批量导入脚本启动...")
     if not os.path.exists(EXCEL_FILE):
         print(f"❌ 找不到 {EXCEL_FILE}")
         return
 
-    driver = setup_driver()
-    driver.minimize_window()
+    if args.dry_run:
+        # 只看比对结果：总账本只读打开，还没建过账本就直接读 data.csv，不生成 catalog.db
+        catalog = Catalog(read_only=True) if os.path.exists(CATALOG_DB) else None
+        diff = diff_places(load_excel(), load_existing(catalog))
+        print_diff(diff, plan_work(diff, args.policy), args.policy)
+        if catalog is not None:
+            catalog.close()
+        return
+
+    # 点位数据记在总账本里，结束时一次性导出 CSV
+    if not os.path.exists(IMAGE_DIR): os.makedirs(IMAGE_DIR)
+    catalog = Catalog()
+    diff = diff_places(load_excel(), load_existing(catalog))
+    work = plan_work(diff, args.policy)
+    print_diff(diff, work, args.policy)
+    metrics.record("place", "skip", count=len(diff) - len(work))
+    if work.empty:
+        catalog.close()
+        return
+
+    # 先把需要的坐标批量查好 (已缓存的不联网)
+    resolve_all(work.loc[work['need_geocode'], 'name'].tolist())
 
+    driver = None
+
+    def get_driver():
+        # 静态抓图拿不到时才启动浏览器
+        nonlocal driver
+        if driver is None:
+            driver = setup_driver()
+            driver.minimize_window()
+        return driver
+
+    changed = 0
     try:
-        df = pd.read_excel(EXCEL_FILE)
-        # 获取 {名字: ID} 字典
-        existing_map = get_existing_data()
-
-        # 计算下一个新ID (用于新增数据)
-        next_new_id = get_next_id()
-
-        print(f"📊 Excel共有 {len(df)} 行数据...")
-
-        for index, row in df.iterrows():
-            place_name = str(row.iloc[0]).strip()
-            place_type = str(row.iloc[1]).strip()
-            place_desc = str(row.iloc[2]).strip()
-
-            if not place_name or place_name == 'nan': continue
-
-            # --- 🔥 修改点2：交互逻辑 ---
-            target_id = None  # 这条数据最终使用的ID
-            need_process = True  # 是否需要处理（抓取坐标图片等）
-
-            if place_name in existing_map:
-                # 发现重复！询问用户
-                print(f"\n⚠️ 发现重复: 【{place_name}】 (ID: {existing_map[place_name]})")
-                user_choice = input(f"   是否更新此条数据？(y/n/q退出): ").lower().strip()
-
-                if user_choice == 'y':
-                    print("   🔄 正在更新数据...")
-                    target_id = existing_map[place_name]  # 使用旧ID覆盖
-                    # 保持 need_process = True，继续往下走去抓取新数据
-                elif user_choice == 'q':
-                    print("👋 用户中止任务")
-                    break
-                else:
-                    print("   ⏩ 跳过")
-                    need_process = False  # 标记为不需要处理
-            else:
-                # 是新数据
-                print(f"\n🆕 新增数据: 【{place_name}】 (ID: {next_new_id})")
-                target_id = next_new_id
-                next_new_id += 1  # 只有新增时，ID计数器才加1
-
-            # --- 开始处理 (如果是新增 OR 用户选择了更新) ---
-            if need_process and target_id:
-                # 1. 查坐标 (重新查，因为可能你想更新坐标)
-                lat, lng = get_coordinates(place_name)
-
-                # 2. 下图片 (覆盖旧图片，文件名保持不变，还是 ID.jpg)
-                img_filename = f"{target_id}.jpg"
-                download_image_selenium(driver, f"{place_name} 风景", img_filename)
-
-                # 3. 准备这一行的数据
-                row_data = [target_id, place_name, lat, lng, place_type, place_desc, img_filename]
-
-                # 4. 写入 CSV
-                if place_name in existing_map:
-                    # 如果是更新模式 -> 调用专门的更新函数
-                    update_csv_row(target_id, row_data)
-                else:
-                    # 如果是新增模式 -> 直接追加到末尾
-                    with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(row_data)
-                    print(f"    📝 新增写入完成")
-                    # 新增完后，把它加到内存的查重字典里，防止Excel里有两行一样的导致重复添加
-                    existing_map[place_name] = str(target_id)
-
-                time.sleep(1)
+        for _ in import_places(catalog, work, get_driver):
+            changed += 1
 
     finally:
+        # 坐标缓存落盘、关浏览器放在导出前面：导出出错也不能把它们跳过
+        save_cache()
+        if driver is not None:
+            browser.quit_driver('auto')
+        try:
+            # 不管是正常结束还是中途出错，已处理的数据都导出到 CSV
+            if changed:
+                with metrics.timed("csv_write"):
+                    catalog.export_csv('sites', CSV_FILE)
+                print(f"\n📝 {CSV_FILE} 已导出: 本次改动 {changed} 条")
+        finally:
+            catalog.close()
         print("\n🏁 任务结束。")
-        driver.quit()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metrics.start_run('auto')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
\ No newline at end of file
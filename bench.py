@@ -0,0 +1,510 @@
+import os
+import csv
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from html import escape
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 🛠️ 配置区 ---
+BASELINE_FILE = 'bench_baseline.json'
+POEMS_PER_PAGE = 10
+SCHOLAR_PER_PAGE = 10
+IMAGES_PER_PAGE = 35
+PICTURE_KEYWORDS = 12  # collect_picture 关键词矩阵太大，只取前几组做基准
+DESIGN_ITEMS = 20  # AI 方案预生成只取前几条文献
+
+
+# --- 1. 本地替身服务器：用仓库里现成的 CSV 和图片回放必应 / 古诗文网 / 百度学术 / Nominatim / 智谱补全接口 ---
+def read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class FixtureData:
+    def __init__(self):
+        self.poems = read_csv('literature_poems.csv')
+        self.scholar = read_csv('literature_scholar.csv')
+        self.places = {}
+        for row in read_csv('data.csv'):
+            if row.get('name') and row.get('lat') and row.get('lng'):
+                self.places[row['name'].strip()] = (row['lat'], row['lng'])
+        self.images = sorted(
+            name for name in os.listdir('images_history') if name.endswith('.jpg')) if os.path.exists('images_history') else []
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, error_rate, seed):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.data = FixtureData()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive，和真实站点一样能复用连接
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_fail():
+            self.send_body(503, b"Service Unavailable", "text/plain")
+            return
+
+        url = urlparse(self.path)
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == '/search.aspx':
+            self.send_body(200, self.gushiwen_page(qs.get('value', ''), int(qs.get('page', 1))), "text/html; charset=utf-8")
+        elif url.path == '/images/search':
+            self.send_body(200, self.bing_page(qs.get('q', '')), "text/html; charset=utf-8")
+        elif url.path == '/s':
+            self.send_body(200, self.scholar_page(qs.get('wd', ''), int(qs.get('pn', 0))), "text/html; charset=utf-8")
+        elif url.path == '/usercenter/paper/show':
+            self.send_body(200, self.paper_detail(qs.get('paperid', '')), "text/html; charset=utf-8")
+        elif url.path == '/search':
+            self.send_body(200, self.geocode(qs.get('q', '')), "application/json")
+        elif url.path.startswith('/img/'):
+            path = os.path.join('images_history', os.path.basename(url.path))
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self.send_body(200, f.read(), "image/jpeg")
+            else:
+                self.send_body(404, b"not found", "text/plain")
+        else:
+            self.send_body(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        # 先把请求体读完，不然 keep-alive 连接上的下一个请求会错位
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_fail():
+            self.send_body(503, b"Service Unavailable", "text/plain")
+            return
+        if urlparse(self.path).path == '/chat/completions':
+            self.send_body(200, self.completion(json.loads(body or b'{}')), "application/json")
+        else:
+            self.send_body(404, b"not found", "text/plain")
+
+    def completion(self, body):
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        title = next((line.split("：", 1)[-1] for line in prompt.splitlines() if "【标题】" in line), "")
+        answer = f"### 🏮 产品名称\n{title}·荔枝礼盒\n### 💡 设计理念\n(本地替身生成)"
+        return json.dumps({"choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}]},
+                          ensure_ascii=False).encode('utf-8')
+
+    def gushiwen_page(self, keyword, page):
+        hits = [p for p in self.server.data.poems if keyword in (p['title'] + p['content'])]
+        hits = hits[(page - 1) * POEMS_PER_PAGE:page * POEMS_PER_PAGE]
+        items = "".join(
+            f'<div class="cont"><p><a><b>{escape(p["title"])}</b></a></p>'
+            f'<p class="source"><a>{escape(p["era"])}</a></p>'
+            f'<div class="contson">{escape(p["content"])}</div></div>' for p in hits)
+        return f'<html><body><div class="sons">{items}</div></body></html>'.encode('utf-8')
+
+    def bing_page(self, keyword):
+        images = self.server.data.images
+        if not images:
+            return b"<html><body></body></html>"
+        # 同一个关键词总是返回同一批图，不同关键词之间有重叠 (模拟真实的重复率)
+        start = sum(keyword.encode('utf-8')) % len(images)
+        picked = [images[(start + i) % len(images)] for i in range(IMAGES_PER_PAGE)]
+        items = "".join(f'<img class="mimg" src="{self.server.base_url}/img/{quote(name)}">' for name in picked)
+        return f'<html><body>{items}</body></html>'.encode('utf-8')
+
+    def scholar_page(self, keyword, pn):
+        rows = self.server.data.scholar[pn:pn + SCHOLAR_PER_PAGE]
+        items = "".join(
+            f'<div class="result"><h3><a href="{escape(r["source"])}">{escape(r["title"])}</a></h3>'
+            f'<div class="c_abstract">{escape(r["content"])}</div>'
+            f'<div class="sc_info">{escape(r["author"])} - {escape(r["era"])}</div></div>' for r in rows)
+        return f'<html><body>{items}</body></html>'.encode('utf-8')
+
+    def paper_detail(self, paperid):
+        row = next((r for r in self.server.data.scholar if paperid and paperid in r['source']), None)
+        if row is None:
+            return b"<html><body></body></html>"
+        # 摘要/作者/期刊按标题编一份，结构和真实详情页一致
+        title = escape(row['title'])
+        authors = "".join(f'<span><a>{name}</a>，</span>' for name in ("张三", "李四", "王五", "赵六"))
+        body = (f'<div class="main-info"><h3><a>{title}</a></h3>'
+                f'<div class="author_wr"><p class="author_text">{authors}</p></div>'
+                f'<div class="abstract_wr"><p class="abstract">摘要：{title}的研究综述。</p></div>'
+                f'<div class="year_wr"><p class="kw_main">2015</p></div></div>'
+                f'<div class="publish_text"><a class="journal_title">《中国史研究》</a><span>2015年第3期</span></div>')
+        return f'<html><body>{body}</body></html>'.encode('utf-8')
+
+    def geocode(self, place):
+        hit = self.server.data.places.get(place.strip())
+        result = [{"lat": hit[0], "lon": hit[1]}] if hit else []
+        return json.dumps(result).encode('utf-8')
+
+
+# --- 2. 各采集阶段 (直接调用采集脚本里的函数，静态抓取模式指向本地服务器) ---
+def stage_poems(server, workdir):
+    # 和 collect_poems.main 一样：任务队列 -> 工人并行抓 (静态) -> 主线程 MinHash 查重、写 CSV + 总账本、交差
+    import static_fetch
+    import collect_poems
+    from catalog import Catalog
+    from crawl_queue import CrawlQueue
+    from csv_writer import BatchCsvWriter
+    from poem_dedup import PoemDedupIndex
+    static_fetch.GUSHIWEN_BASE = server.base_url
+
+    # 替身服务器只回放有结果的页 (翻过头的页静态抓不到，会去开浏览器)，任务只登记这些页
+    pages = {}
+    for keyword in collect_poems.KEYWORDS:
+        hits = sum(1 for p in server.data.poems if keyword in (p['title'] + p['content']))
+        pages[keyword] = min(collect_poems.MAX_PAGES, -(-hits // POEMS_PER_PAGE))
+    queue_db = os.path.join(workdir, 'crawl_queue.db')
+    tasks = CrawlQueue(queue_db)
+    tasks.enqueue(collect_poems.QUEUE_NAME, [(k, p) for k in collect_poems.KEYWORDS for p in range(1, pages[k] + 1)])
+
+    # 总账本建在临时目录里，先清掉诗歌数据，当成第一次采集
+    catalog = Catalog(os.path.join(workdir, 'catalog.db'))
+    catalog.delete('poems', [row[0] for row in catalog.rows('poems')])
+    writer = BatchCsvWriter(os.path.join(workdir, 'literature_poems.csv'), collect_poems.HEADER,
+                            first_id=1, source='poems', catalog=catalog)
+    results = queue.Queue()
+    stop = threading.Event()
+    try:
+        with writer, ThreadPoolExecutor(max_workers=collect_poems.WORKERS) as pool:
+            futures = [pool.submit(collect_poems.crawl_worker, worker_id, [], results, stop, queue_db)
+                       for worker_id in range(collect_poems.WORKERS)]
+            try:
+                saved = collect_poems.handle_results(tasks, writer, PoemDedupIndex(), results, futures)
+            finally:
+                stop.set()
+    finally:
+        tasks.close()
+    return saved
+
+
+def stage_scholar(server, workdir):
+    # 百度学术只能用浏览器抓，这里静态取页面，每张卡片交给 collect_scholar 的同一套解析 + 查重 + 写入
+    import lxml.html
+    import collect_scholar
+    from catalog import Catalog
+    from csv_writer import BatchCsvWriter
+    from downloader import get_session
+    from static_fetch import element_text
+
+    def text_of(item, selector):
+        elems = item.cssselect(selector)
+        return element_text(elems[0]) if elems else None
+
+    # 总账本建在临时目录里，先清掉学术数据，当成第一次采集
+    catalog = Catalog(os.path.join(workdir, 'catalog.db'))
+    catalog.delete('scholar', [row[0] for row in catalog.rows('scholar')])
+    seen_links = set()
+    saved = 0
+    with BatchCsvWriter(os.path.join(workdir, 'literature_scholar.csv'), collect_scholar.HEADER,
+                        first_id=2000, source='scholar', catalog=catalog) as writer:
+        for keyword in collect_scholar.KEYWORDS:
+            for page in range(collect_scholar.MAX_PAGES):
+                try:
+                    res = get_session().get(f"{server.base_url}/s", params={'wd': keyword, 'pn': page * 10}, timeout=10)
+                except Exception:
+                    continue
+                if res.status_code != 200:
+                    continue
+                for item in lxml.html.fromstring(res.text).cssselect(".result"):
+                    links = item.cssselect("h3 a")
+                    if not links:
+                        continue
+                    row_id = collect_scholar.save_card(writer, seen_links, element_text(links[0]), links[0].get('href'),
+                                                       text_of(item, ".c_abstract"), text_of(item, ".sc_info"))
+                    if row_id is not None:
+                        saved += 1
+    return saved
+
+
+def stage_enrich(server, workdir):
+    # 详情页补全：不写总账本，只测 “并行取详情页 + 解析 + 合并” 的吞吐
+    import static_fetch
+    import enrich_scholar
+    static_fetch.XUESHU_BASE = server.base_url
+    rows = [list(row.values()) for row in server.data.scholar]
+    todo = [row for row in rows if enrich_scholar.missing_fields(row)]
+    with ThreadPoolExecutor(max_workers=enrich_scholar.WORKERS) as pool:
+        details = list(pool.map(lambda row: static_fetch.fetch_scholar_detail(row[-1]), todo))
+    return sum(1 for row, detail in zip(todo, details) if detail and enrich_scholar.merge_detail(row, detail))
+
+
+def stage_picture(server, workdir):
+    import static_fetch
+    import collect_picture
+    from csv_writer import BatchCsvWriter
+    from image_index import ImageHashIndex
+    from keyword_scheduler import KeywordScheduler
+    static_fetch.BING_BASE = server.base_url
+    collect_picture.SAVE_DIR = os.path.join(workdir, 'images_history')
+    collect_picture.CSV_FILE = os.path.join(workdir, 'gallery.csv')
+    os.makedirs(collect_picture.SAVE_DIR, exist_ok=True)
+    hash_index = ImageHashIndex(collect_picture.SAVE_DIR, os.path.join(workdir, 'image_hashes.json')).load()
+
+    # 和 collect_picture.main 一样由调度器挑关键词 (统计文件放在临时目录里，每次从零开始)
+    scheduler = KeywordScheduler(collect_picture.SUBJECTS, collect_picture.STYLES, collect_picture.ERAS,
+                                 os.path.join(workdir, 'keyword_stats.json'))
+    saved = 0
+    with BatchCsvWriter(collect_picture.CSV_FILE, collect_picture.HEADER, first_id=3000) as writer:
+        for _ in range(PICTURE_KEYWORDS):
+            keyword = scheduler.next()
+            if keyword is None:
+                break
+            stats = {}
+            start = time.time()
+            # 静态模式能拿到结果，driver 用不上
+            new = collect_picture.download_images_for_keyword(None, keyword, writer, hash_index, stats)
+            saved += new
+            if stats.get("candidates"):
+                scheduler.update(keyword, new, stats["duplicates"], time.time() - start, not stats["capped"],
+                                 stats["download_failed"])
+    hash_index.save()
+    return saved
+
+
+def stage_get_images(server, workdir):
+    import static_fetch
+    import get_images
+    static_fetch.BING_BASE = server.base_url
+    folder = os.path.join(workdir, 'images')
+    os.makedirs(folder, exist_ok=True)
+    # 和 get_images.main 一样的流水线：主线程找链接，下载线程池从有界队列里取
+    jobs = queue.Queue(maxsize=get_images.QUEUE_SIZE)
+    workers = [threading.Thread(target=get_images.download_worker, args=(jobs, {}))
+               for _ in range(get_images.DOWNLOAD_WORKERS)]
+    for worker in workers:
+        worker.start()
+    try:
+        for i, row in enumerate(read_csv('data.csv')):
+            # 静态模式能拿到结果，用不上浏览器
+            urls = get_images.find_image_urls(None, f"{row.get('name', '')} 风景")
+            if urls:
+                jobs.put((row.get('name', ''), os.path.join(folder, f"{i}.jpg"), urls))
+    finally:
+        for _ in workers:
+            jobs.put(None)
+        for worker in workers:
+            worker.join()
+    return len(os.listdir(folder))
+
+
+def stage_auto(server, workdir):
+    # 和 auto.main 一样：Excel 和总账本比对 -> 批量查坐标 -> 逐个查坐标、下图片、记账 -> 导出 CSV (全部在临时目录里)
+    import pandas as pd
+    import auto
+    import geocoder
+    import static_fetch
+    from catalog import Catalog
+    static_fetch.BING_BASE = server.base_url
+    geocoder.GEOCODE_URL = f"{server.base_url}/search"
+    geocoder.CACHE_FILE = os.path.join(workdir, 'geocode_cache.json')
+    geocoder.REQUESTS_PER_SECOND = 1000.0  # 本地替身不用遵守 Nominatim 的限速
+    geocoder._cache = None
+    auto.IMAGE_DIR = os.path.join(workdir, 'sites_images')
+    auto.EXCEL_FILE = os.path.join(workdir, 'new_places.xlsx')
+    os.makedirs(auto.IMAGE_DIR, exist_ok=True)
+
+    # Excel 用 data.csv 里的全部地名；临时账本里删掉前 3 个当新地名，再改 3 条简介当有改动的
+    sites = read_csv('data.csv')
+    excel = pd.DataFrame(sites)[['name', 'type', 'desc']]
+    excel.loc[3:5, 'desc'] += "（修订）"
+    excel.to_excel(auto.EXCEL_FILE, index=False)
+    catalog = Catalog(os.path.join(workdir, 'catalog.db'))
+    catalog.delete('sites', [row['id'] for row in sites[:3]])
+
+    def no_browser():
+        raise RuntimeError("基准测试只走静态抓图，不开浏览器")
+
+    try:
+        diff = auto.diff_places(auto.load_excel(), auto.load_existing(catalog))
+        # 图片都在临时目录里，老地名也都要补图，相当于全部重新处理一遍
+        work = auto.plan_work(diff, 'update-changed')
+        geocoder.resolve_all(work.loc[work['need_geocode'], 'name'].tolist())
+        processed = sum(1 for _ in auto.import_places(catalog, work, no_browser))
+        geocoder.save_cache()
+        catalog.export_csv('sites', os.path.join(workdir, 'data.csv'))
+    finally:
+        catalog.close()
+    return processed
+
+
+def stage_design(server, workdir):
+    import design_proxy
+    from downloader import get_session
+    cache = design_proxy.DesignCache(os.path.join(workdir, 'design_cache'))
+    upstream = f"{server.base_url}/chat/completions"
+    design_proxy.batch(cache, 'bench-key', upstream, limit=DESIGN_ITEMS)
+
+    # 再像网页一样经代理请求同一批文献 (代理没有 Key)，预生成过的应该全部命中缓存
+    proxy = design_proxy.ProxyServer(('127.0.0.1', 0), cache, '', upstream)
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+    hits = 0
+    try:
+        for title, content in design_proxy.literature_items()[:DESIGN_ITEMS]:
+            res = get_session().post(f"http://127.0.0.1:{proxy.server_address[1]}/chat/completions",
+                                     json=design_proxy.request_body(title, content), timeout=10)
+            if res.headers.get('X-Design-Cache') == 'HIT':
+                hits += 1
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+    return hits
+
+
+STAGES = {
+    'poems': stage_poems,
+    'scholar': stage_scholar,
+    'enrich': stage_enrich,
+    'picture': stage_picture,
+    'get_images': stage_get_images,
+    'auto': stage_auto,
+    'design': stage_design,
+}
+
+
+# --- 3. 跑分 + 对比基线 ---
+def run_stage(name, func, server, workdir):
+    bytes_before, requests_before = server.bytes_sent, server.requests
+    start = time.perf_counter()
+    try:
+        records = func(server, workdir)
+        error = None
+    except Exception as e:
+        records, error = 0, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    transferred = server.bytes_sent - bytes_before
+    return {
+        "records": records,
+        "requests": server.requests - requests_before,
+        "bytes": transferred,
+        "wall_seconds": round(wall, 3),
+        "records_per_second": round(records / wall, 2) if wall else 0,
+        "bytes_per_second": round(transferred / wall) if wall else 0,
+        "error": error,
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, now in results.items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        if now["error"]:
+            regressions.append(f"{name}: 运行出错 ({now['error']})")
+        if now["records"] < old["records"]:
+            regressions.append(f"{name}: 记录数 {old['records']} -> {now['records']}")
+        if now["wall_seconds"] > old["wall_seconds"] * (1 + tolerance) + 0.05:
+            regressions.append(f"{name}: 耗时 {old['wall_seconds']}s -> {now['wall_seconds']}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线采集基准测试 (本地替身服务器)")
+    parser.add_argument('--stages', default=','.join(STAGES), help="要跑的阶段，逗号分隔")
+    parser.add_argument('--latency', type=float, default=50, help="每个请求的模拟延迟 (毫秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="随机返回 503 的比例 (0~1)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tolerance', type=float, default=0.2, help="耗时比基线慢多少算回退 (0.2 = 20%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果存为新基线")
+    args = parser.parse_args()
+
+    config = {"latency": args.latency, "error_rate": args.error_rate, "seed": args.seed}
+    server = FixtureServer(args.latency / 1000, args.error_rate, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🧪 本地替身服务器: {server.base_url} (延迟 {args.latency}ms, 错误率 {args.error_rate})")
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='lychee_bench_')
+    # 网址缓存也放进临时目录，每次基准都从“没下载过任何图”开始
+    import url_cache
+    url_cache._cache = url_cache.UrlHashCache(os.path.join(workdir, 'url_hashes.json')).load()
+    try:
+        for name in args.stages.split(','):
+            if name not in STAGES:
+                print(f"⚠️ 未知阶段: {name}")
+                continue
+            print(f"\n⏱️ 阶段 [{name}] ...")
+            results[name] = run_stage(name, STAGES[name], server, workdir)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n📊 基准结果")
+    print(f"   {'阶段':<12}{'记录':>8}{'请求':>8}{'耗时(s)':>10}{'记录/s':>10}{'KB/s':>10}")
+    for name, r in results.items():
+        print(f"   {name:<12}{r['records']:>8}{r['requests']:>8}{r['wall_seconds']:>10}"
+              f"{r['records_per_second']:>10}{r['bytes_per_second'] / 1024:>10.1f}"
+              + (f"   ❌ {r['error']}" if r['error'] else ""))
+
+    errors = [name for name, r in results.items() if r['error']]
+    if errors:
+        print(f"\n❌ 这些阶段运行出错: {', '.join(errors)}")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"config": config, "stages": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基线已保存到 {BASELINE_FILE}")
+        return
+
+    if not os.path.exists(BASELINE_FILE):
+        print(f"\n❌ 找不到基线 {BASELINE_FILE}，运行 python bench.py --save-baseline 保存一份")
+        sys.exit(1)
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"\n⚠️ 本次参数 {config} 和基线 {baseline.get('config')} 不同，不做对比")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ 性能回退:")
+        for line in regressions:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("\n✅ 没有发现性能回退")
+
+
+if __name__ == '__main__':
+    main()
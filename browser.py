@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+
+# --- 🛠️ 浏览器配置区 (所有采集脚本共用) ---
+DRIVER_CACHE_FILE = '.chromedriver_path.json'  # 记住 chromedriver 装在哪，不用每次启动都联网查版本
+DRIVER_CACHE_DAYS = 7  # 过几天重新让 webdriver_manager 检查一次更新
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+# 抓取模式下直接拦掉的请求：字体、音视频、统计/广告脚本 (都不影响我们要找的元素)
+BLOCKED_URLS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*hm.baidu.com*", "*cnzz.com*", "*bat.bing.com*",
+]
+BLOCKED_STYLES = ["*.css"]  # 样式表另算：需要人工点验证码的可视浏览器最好别拦
+
+_pool = {}  # 名字 -> 一直开着的浏览器 (同一个脚本里换关键词时直接复用)
+_pool_lock = threading.Lock()
+_path_lock = threading.Lock()
+
+
+# --- 1. chromedriver 路径缓存 ---
+def driver_path(refresh=False):
+    """环境变量 CHROMEDRIVER 优先；否则用缓存的路径，过期或文件不在了才调用 ChromeDriverManager"""
+    if os.environ.get("CHROMEDRIVER"):
+        return os.environ["CHROMEDRIVER"]
+    with _path_lock:
+        if not refresh and os.path.exists(DRIVER_CACHE_FILE):
+            try:
+                with open(DRIVER_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                fresh = time.time() - cached.get("ts", 0) < DRIVER_CACHE_DAYS * 86400
+                if fresh and os.path.exists(cached.get("path", "")):
+                    return cached["path"]
+            except Exception:
+                pass
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+        with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"path": path, "ts": time.time()}, f)
+        return path
+
+
+# --- 2. 启动一个新浏览器 ---
+def new_driver(headless=False, scraping=True, block_css=True, stealth=True):
+    """
+    headless: 后台运行；scraping: 抓取模式 (DOM 就绪就返回 + 拦截无用资源)；
+    block_css: 抓取模式下要不要连样式表也拦掉；stealth: 去掉自动化特征、伪装 User-Agent
+    """
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if stealth:
+        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+        chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    if scraping:
+        # 页面 DOM 解析完就返回，不等图片/广告全部加载完
+        chrome_options.page_load_strategy = 'eager'
+
+    try:
+        driver = webdriver.Chrome(service=Service(driver_path()), options=chrome_options)
+    except WebDriverException:
+        # Chrome 自动升级后缓存的 chromedriver 可能对不上版本，重新装一次再试
+        if os.environ.get("CHROMEDRIVER"):
+            raise
+        driver = webdriver.Chrome(service=Service(driver_path(refresh=True)), options=chrome_options)
+
+    if scraping:
+        block_resources(driver, BLOCKED_URLS + (BLOCKED_STYLES if block_css else []))
+    return driver
+
+
+def block_resources(driver, patterns):
+    """通过 Chrome DevTools 协议拦截匹配的请求"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"⚠️ 资源拦截没生效 (不影响抓取): {e}")
+
+
+# --- 3. 复用已经开着的浏览器 ---
+def _alive(driver):
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def get_driver(name, **options):
+    """按名字取一个一直开着的浏览器，没有或者已经崩了就新开 (参数同 new_driver)"""
+    with _pool_lock:
+        driver = _pool.get(name)
+    if driver is not None and _alive(driver):
+        return driver
+    if driver is not None:
+        print(f"♻️ 浏览器 [{name}] 已失效，重新启动")
+        quit_driver(name)
+    driver = new_driver(**options)
+    with _pool_lock:
+        _pool[name] = driver
+    return driver
+
+
+def quit_driver(name):
+    with _pool_lock:
+        driver = _pool.pop(name, None)
+    if driver is not None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+@atexit.register
+def quit_all():
+    """脚本结束时关掉所有浏览器 (正常退出/出错退出都会调用)"""
+    for name in list(_pool):
+        quit_driver(name)
@@ -0,0 +1,85 @@
+import os
+import json
+import gzip
+import shutil
+import hashlib
+
+from build_search_index import SOURCE_FILES, load_records
+
+# --- 🛠️ 配置区 ---
+SHARD_DIR = 'corpus'  # 输出: corpus/manifest.json + corpus/{类型序号}/{页码}.{内容哈希}.json (旁边带一份 .json.gz)
+PAGE_SIZE = 20  # 每个分片多少条，也是文献库每次往下滚动追加的条数
+MANIFEST_VERSION = 1
+
+
+# --- 1. 按类型分组 (保持 CSV 里的先后顺序) ---
+def group_by_type(records):
+    groups = {}
+    for row in records:
+        groups.setdefault(row.get('type') or '', []).append(row)
+    return groups
+
+
+# --- 2. 写一个分片：只存值数组，列名放在清单里，省掉每条重复的键名 ---
+def write_shard(folder, page, fields, rows):
+    data = json.dumps([[row.get(field) or '' for field in fields] for row in rows],
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # 文件名带内容哈希：内容变了网址就变，浏览器可以永久缓存 (serve.py 会给 immutable)
+    name = f"{page}.{hashlib.blake2b(data, digest_size=6).hexdigest()}.json"
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    # 预压缩一份，浏览器支持 DecompressionStream 时前端直接取 .gz
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + ".gz", 'wb') as f:
+        f.write(gz_data)
+    return name, len(data), len(gz_data)
+
+
+def build_shards(groups):
+    manifest = {"version": MANIFEST_VERSION, "pageSize": PAGE_SIZE, "gzip": True, "total": 0, "types": []}
+    raw_total = gz_total = files = 0
+    for type_no, (doc_type, rows) in enumerate(groups.items()):
+        # 同一类型的列以第一条记录为准 (三份 CSV 的表头不一样)
+        fields = [field for field in rows[0].keys() if field is not None]
+        folder = os.path.join(SHARD_DIR, str(type_no))
+        os.makedirs(folder, exist_ok=True)
+        shards, files_of_type = [], []
+        for page, start in enumerate(range(0, len(rows), PAGE_SIZE)):
+            chunk = rows[start:start + PAGE_SIZE]
+            name, raw_size, gz_size = write_shard(folder, page, fields, chunk)
+            files_of_type.append(f"{type_no}/{name}")
+            raw_total += raw_size
+            gz_total += gz_size
+            files += 1
+            # 每个分片里有哪些 ID：检索命中后只拉包含结果的分片
+            shards.append([row.get('id', '') for row in chunk])
+        manifest["types"].append({"type": doc_type, "fields": fields, "count": len(rows),
+                                  "files": files_of_type, "shards": shards})
+        manifest["total"] += len(rows)
+    return manifest, files, raw_total, gz_total
+
+
+def main():
+    records = load_records()
+    groups = group_by_type(records)
+
+    # 旧分片全部清掉重建，避免残留已删除的记录
+    if os.path.exists(SHARD_DIR):
+        shutil.rmtree(SHARD_DIR)
+    os.makedirs(SHARD_DIR)
+    manifest, files, raw_total, gz_total = build_shards(groups)
+    with open(os.path.join(SHARD_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+    source_size = sum(os.path.getsize(file) for file in SOURCE_FILES if os.path.exists(file))
+    manifest_size = os.path.getsize(os.path.join(SHARD_DIR, 'manifest.json'))
+    print(f"📚 文献分片已生成: {manifest['total']} 条记录，{len(manifest['types'])} 个类型，共 {files} 个分片")
+    for entry in manifest["types"]:
+        print(f"   {entry['type'] or '(无类型)'}: {entry['count']} 条，{len(entry['shards'])} 个分片")
+    print(f"   启动时只加载清单 {manifest_size / 1024:.1f} KB (原来三份 CSV 共 {source_size / 1024:.1f} KB)")
+    print(f"   分片合计 {raw_total / 1024:.1f} KB (gzip 后 {gz_total / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
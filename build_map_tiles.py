@@ -0,0 +1,182 @@
+import os
+import csv
+import json
+import math
+import shutil
+
+# --- 🛠️ 配置区 ---
+CSV_FILE = 'data.csv'
+TILE_DIR = 'map_tiles'  # 输出: map_tiles/meta.json、names.json + map_tiles/{级别}/{x}/{y}.json
+MIN_ZOOM = 3
+MAX_ZOOM = 14  # 这一级及以上不再聚合，直接显示单个点位
+CLUSTER_RADIUS = 40  # 聚合半径 (屏幕像素)
+TILE_PIXELS = 256
+TILE_ZOOM_OFFSET = 2  # 数据切片比地图瓦片粗两级：一个数据切片 = 4x4 张地图瓦片，一屏只需请求几个文件
+
+
+# --- 1. 经纬度 <-> Web 墨卡托 [0,1] 坐标 (和 Leaflet 的投影一致) ---
+def project(lat, lng):
+    x = (lng + 180) / 360
+    sin_lat = math.sin(math.radians(max(min(lat, 85.05112878), -85.05112878)))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def unproject(x, y):
+    lng = x * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lng
+
+
+def load_sites():
+    sites = []
+    with open(CSV_FILE, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lng = float(row['lat']), float(row['lng'])
+            except (TypeError, ValueError, KeyError):
+                continue
+            site = {k: v for k, v in row.items() if k is not None}
+            sites.append({"lat": lat, "lng": lng, "site": site})
+    return sites
+
+
+# --- 2. 逐级聚合 (supercluster 思路：每一级在上一级的结果上再聚合) ---
+def cluster_level(items, zoom):
+    radius = CLUSTER_RADIUS / (TILE_PIXELS * 2 ** zoom)
+    # 网格索引：格子边长 = 聚合半径，找邻居只看周围 9 个格子
+    grid = {}
+    for i, item in enumerate(items):
+        grid.setdefault((int(item["x"] / radius), int(item["y"] / radius)), []).append(i)
+
+    used = [False] * len(items)
+    result = []
+    for i, item in enumerate(items):
+        if used[i]:
+            continue
+        used[i] = True
+        cx, cy = int(item["x"] / radius), int(item["y"] / radius)
+        members = [item]
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for j in grid.get((gx, gy), ()):
+                    if used[j]:
+                        continue
+                    other = items[j]
+                    if (other["x"] - item["x"]) ** 2 + (other["y"] - item["y"]) ** 2 <= radius ** 2:
+                        used[j] = True
+                        members.append(other)
+
+        if len(members) == 1:
+            result.append(item)
+            continue
+
+        # 按点数加权求聚合中心，同时累计每种类型的点数 (前端按类型筛选时要用)
+        count = sum(m["count"] for m in members)
+        leaves = [leaf for m in members for leaf in m["leaves"]]
+        types = {}
+        for m in members:
+            for t, n in m["types"].items():
+                types[t] = types.get(t, 0) + n
+        result.append({
+            "x": sum(m["x"] * m["count"] for m in members) / count,
+            "y": sum(m["y"] * m["count"] for m in members) / count,
+            "count": count,
+            "types": types,
+            "leaves": leaves,  # 包含哪些点位 (序号)，算 expand 用
+        })
+    return result
+
+
+def set_expand_zooms(levels):
+    """
+    聚合点的 expand (点击后放大到的级别) = 它包含的点位第一次分成两个以上要素的级别，
+    按点位实际落在哪个要素里算，点一下就能看到它散开
+    """
+    owner = {zoom: {leaf: i for i, item in enumerate(items) for leaf in item["leaves"]}
+             for zoom, items in levels.items()}
+    for zoom, items in levels.items():
+        for item in items:
+            if "site" in item:
+                continue
+            item["expand"] = next((z for z in range(zoom + 1, MAX_ZOOM + 1)
+                                   if len({owner[z][leaf] for leaf in item["leaves"]}) > 1), MAX_ZOOM)
+
+
+def build_levels(sites):
+    points = []
+    for i, s in enumerate(sites):
+        x, y = project(s["lat"], s["lng"])
+        points.append({"x": x, "y": y, "count": 1, "types": {s["site"].get("type") or "": 1}, "site": s["site"],
+                       "leaves": [i]})
+
+    levels = {MAX_ZOOM: points}
+    for zoom in range(MAX_ZOOM - 1, MIN_ZOOM - 1, -1):
+        levels[zoom] = cluster_level(levels[zoom + 1], zoom)
+    set_expand_zooms(levels)
+    return levels
+
+
+# --- 3. 按级别切片写文件 ---
+def to_feature(item):
+    lat, lng = unproject(item["x"], item["y"])
+    feature = {"lat": round(lat, 6), "lng": round(lng, 6)}
+    if "site" in item:
+        feature["site"] = item["site"]
+    else:
+        feature.update({"count": item["count"], "types": item["types"], "expand": item["expand"]})
+    return feature
+
+
+def write_tiles(levels):
+    files = 0
+    for zoom, items in levels.items():
+        tile_zoom = max(0, zoom - TILE_ZOOM_OFFSET)
+        n = 2 ** tile_zoom
+        tiles = {}
+        for item in items:
+            tx = min(n - 1, int(item["x"] * n))
+            ty = min(n - 1, int(item["y"] * n))
+            tiles.setdefault((tx, ty), []).append(to_feature(item))
+        for (tx, ty), features in tiles.items():
+            folder = os.path.join(TILE_DIR, str(zoom), str(tx))
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f"{ty}.json"), 'w', encoding='utf-8') as f:
+                json.dump(features, f, ensure_ascii=False, separators=(',', ':'))
+            files += 1
+    return files
+
+
+def main():
+    sites = load_sites()
+    levels = build_levels(sites)
+
+    # 旧切片全部清掉重建，避免残留已删除的点位
+    if os.path.exists(TILE_DIR):
+        shutil.rmtree(TILE_DIR)
+    os.makedirs(TILE_DIR)
+    files = write_tiles(levels)
+
+    meta = {
+        "minZoom": MIN_ZOOM,
+        "maxZoom": MAX_ZOOM,
+        "tileZoomOffset": TILE_ZOOM_OFFSET,
+        "count": len(sites),
+        # 古道连线按 CSV 顺序连接
+        "route": [[s["lat"], s["lng"]] for s in sites],
+    }
+    with open(os.path.join(TILE_DIR, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+
+    # 地名搜索用的精简表：[地名, 纬度, 经度]，前端第一次搜索时才加载
+    names = [[s["site"].get("name", ""), s["lat"], s["lng"]] for s in sites]
+    with open(os.path.join(TILE_DIR, 'names.json'), 'w', encoding='utf-8') as f:
+        json.dump(names, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"🗺️ 点位切片已生成: {len(sites)} 个点位，{MAX_ZOOM - MIN_ZOOM + 1} 个级别，共 {files} 个切片文件")
+    for zoom in sorted(levels):
+        print(f"   级别 {zoom:>2}: {len(levels[zoom])} 个要素")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import csv
+import os
+import re
+import json
+import gzip
+
+# --- 🛠️ 配置区 ---
+# 和 index.html 里的 literatureFiles 保持一致
+SOURCE_FILES = ['literature_poems.csv', 'literature_scholar.csv', 'gallery.csv']
+INDEX_FILE = 'search_index.json'
+# 和前端 renderLibList 搜索的字段保持一致
+SEARCH_FIELDS = ['title', 'author', 'content', 'desc']
+
+# 按空白和标点切段，段内再切 n-gram (中文按字，英文数字也按字符，保证和 .includes() 的效果一致)
+SPLIT_PATTERN = re.compile(r"[\s　-〿＀-／：-＠［-｀｛-･!-/:-@\[-`{-~·—…“”‘’《》〈〉【】（）]+")
+
+
+def tokenize(text):
+    """返回文本里出现的所有单字和相邻两字 (去重)"""
+    grams = set()
+    for segment in SPLIT_PATTERN.split(str(text).lower()):
+        for i, ch in enumerate(segment):
+            grams.add(ch)
+            if i + 1 < len(segment):
+                grams.add(segment[i:i + 2])
+    return grams
+
+
+def delta_encode(numbers):
+    """有序整数列表转成差值，重复的小数字 gzip 压得更狠"""
+    out = []
+    prev = 0
+    for n in numbers:
+        out.append(n - prev)
+        prev = n
+    return out
+
+
+def load_records():
+    records = []
+    for file in SOURCE_FILES:
+        if not os.path.exists(file):
+            print(f"⚠️ 找不到 {file}，跳过")
+            continue
+        with open(file, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                # 和前端一样，没有标题的行不参与检索
+                if row.get('title'):
+                    records.append(row)
+    return records
+
+
+def build_index(records):
+    types = []
+    docs = []
+    postings = {}
+    for doc_no, row in enumerate(records):
+        doc_type = row.get('type') or ''
+        if doc_type not in types:
+            types.append(doc_type)
+        # 文档号 -> [类型序号, 原始ID]，前端用 类型+ID 找回记录
+        docs.append([types.index(doc_type), row.get('id', '')])
+
+        # 字段直接拼接 (不加分隔符)，和前端 item.title + item.author + ... 的拼法一致
+        text = "".join(row.get(field) or '' for field in SEARCH_FIELDS)
+        for gram in tokenize(text):
+            postings.setdefault(gram, []).append(doc_no)
+
+    return {
+        "version": 1,
+        "types": types,
+        "docs": docs,
+        "postings": {gram: delta_encode(postings[gram]) for gram in sorted(postings)},
+    }
+
+
+def main():
+    records = load_records()
+    index = build_index(records)
+
+    data = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(INDEX_FILE, 'wb') as f:
+        f.write(data)
+
+    raw_size = len(data)
+    gz_size = len(gzip.compress(data, compresslevel=9))
+    print(f"📇 检索索引已生成: {len(index['docs'])} 条记录，{len(index['postings'])} 个词条")
+    print(f"   {INDEX_FILE}: {raw_size / 1024:.1f} KB (gzip 后 {gz_size / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+# --- 🛠️ 配置区 ---
+SOURCE_DIRS = ['images', 'images_history']  # 要生成缩略图的文件夹
+THUMB_DIR = 'thumbs'  # 缩略图输出位置，结构为 thumbs/<原文件夹>/<文件名>-<宽度>.jpg|webp
+MANIFEST_FILE = os.path.join(THUMB_DIR, 'manifest.json')
+WIDTHS = [160, 320, 640]  # 固定宽度档位，比原图还宽的档位不生成 (不放大)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+WORKERS = os.cpu_count() or 2
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def thumb_base(src_path):
+    """images_history/history_3000.jpg -> thumbs/images_history/history_3000"""
+    return os.path.join(THUMB_DIR, os.path.splitext(src_path)[0])
+
+
+# --- 1. 子进程里干活：一张原图生成所有档位的 JPEG + WebP ---
+def make_variants(src_path):
+    base = thumb_base(src_path)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+
+    with Image.open(src_path) as img:
+        img = img.convert('RGB')
+        width, height = img.size
+        variants = []
+        for w in WIDTHS:
+            if w >= width:
+                continue
+            h = max(1, round(height * w / width))
+            small = img.resize((w, h), Image.LANCZOS)
+            jpg_path = f"{base}-{w}.jpg"
+            webp_path = f"{base}-{w}.webp"
+            small.save(jpg_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            small.save(webp_path, 'WEBP', quality=WEBP_QUALITY, method=6)
+            variants.append({
+                "w": w, "h": h,
+                # 清单里统一用 / 分隔，前端直接拿来当 URL
+                "jpg": jpg_path.replace(os.sep, '/'),
+                "webp": webp_path.replace(os.sep, '/'),
+                "jpg_bytes": os.path.getsize(jpg_path),
+                "webp_bytes": os.path.getsize(webp_path),
+            })
+    return {"width": width, "height": height, "variants": variants}
+
+
+def outputs_exist(entry):
+    return all(os.path.exists(v["jpg"]) and os.path.exists(v["webp"]) for v in entry.get("variants", []))
+
+
+# --- 2. 主进程：对比清单，只把新增/改动过的原图交给进程池 ---
+def main():
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    sources = []
+    for folder in SOURCE_DIRS:
+        if not os.path.exists(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTS) and not name.startswith('icon_'):
+                sources.append(f"{folder}/{name}")
+
+    todo = {}
+    skipped = 0
+    for src in sources:
+        stat = os.stat(src)
+        old = manifest.get(src)
+        if old and old.get("mtime") == stat.st_mtime and old.get("size") == stat.st_size and outputs_exist(old):
+            skipped += 1
+            continue
+        md5 = file_md5(src)
+        if old and old.get("md5") == md5 and outputs_exist(old):
+            # 只是时间戳变了 (比如重新 checkout)，内容没变
+            old["mtime"], old["size"] = stat.st_mtime, stat.st_size
+            skipped += 1
+            continue
+        todo[src] = {"mtime": stat.st_mtime, "size": stat.st_size, "md5": md5}
+
+    # 原图已删除的条目从清单里去掉
+    source_set = set(sources)
+    for src in [s for s in manifest if s not in source_set]:
+        del manifest[src]
+
+    print(f"🖼️ 共 {len(sources)} 张原图，需要处理 {len(todo)} 张，跳过未变化的 {skipped} 张")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        futures = {pool.submit(make_variants, src): src for src in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            src = futures[future]
+            try:
+                manifest[src] = dict(todo[src], **future.result())
+                print(f"   ✅ [{done}/{len(todo)}] {src}")
+            except Exception as e:
+                failed += 1
+                print(f"   ❌ [{done}/{len(todo)}] {src}: {e}")
+
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    tmp_path = MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, MANIFEST_FILE)
+
+    original = sum(entry["size"] for entry in manifest.values())
+    smallest = sum(min([v["webp_bytes"] for v in entry["variants"]] or [entry["size"]]) for entry in manifest.values())
+    print(f"\n🎉 缩略图完成 (失败 {failed} 张)，清单: {MANIFEST_FILE}")
+    print(f"   原图合计 {original / 1024 / 1024:.1f} MB，最小档 WebP 合计 {smallest / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
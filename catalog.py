@@ -0,0 +1,249 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import sqlite3
+
+from csv_writer import file_lock
+
+# --- 🛠️ 配置区 ---
+CATALOG_DB = 'catalog.db'  # 四份数据的总账本，CSV 只是从这里导出给网页用的
+# 每份数据: CSV 文件、表头、编号空间、默认起始编号、按哪一列查名字 / 来源链接
+# 同一个编号空间里的编号全局唯一 (诗歌/学术/影像在网页搜索里混在一起，编号不能撞)
+SOURCES = {
+    'sites': {
+        'file': 'data.csv', 'space': 'sites', 'first_id': 1, 'name': 'name', 'url': None,
+        'header': ['id', 'name', 'lat', 'lng', 'type', 'desc', 'image'],
+    },
+    'poems': {
+        'file': 'literature_poems.csv', 'space': 'literature', 'first_id': 1, 'name': 'title', 'url': 'source',
+        'header': ['id', 'title', 'author', 'era', 'content', 'type', 'source'],
+    },
+    'scholar': {
+        'file': 'literature_scholar.csv', 'space': 'literature', 'first_id': 2000, 'name': 'title', 'url': 'source',
+        'header': ['id', 'title', 'author', 'era', 'content', 'type', 'source'],
+    },
+    'gallery': {
+        'file': 'gallery.csv', 'space': 'literature', 'first_id': 3000, 'name': 'title', 'url': 'filename',
+        'header': ['id', 'title', 'desc', 'filename', 'type'],
+    },
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    source TEXT NOT NULL,
+    pos INTEGER NOT NULL,  -- 在 CSV 里的行顺序，导出时按它排
+    id TEXT NOT NULL,  -- 原样保存 (老数据里有 "[cite_start]1" 这种)
+    name TEXT,
+    url TEXT,
+    data TEXT NOT NULL,  -- 整行，JSON 数组，按表头列顺序
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source, pos)
+);
+CREATE INDEX IF NOT EXISTS idx_records_id ON records (source, id);
+CREATE INDEX IF NOT EXISTS idx_records_name ON records (source, name);
+CREATE INDEX IF NOT EXISTS idx_records_url ON records (source, url);
+CREATE TABLE IF NOT EXISTS sequences (
+    source TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ids (  -- 已经用掉/发出去的编号，分配时查它保证不撞号
+    space TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (space, id)
+);
+"""
+
+ID_NUMBER_PATTERN = re.compile(r"(\d+)\s*$")
+
+
+def id_number(row_id):
+    """编号里的数字部分："[cite_start]12" -> 12；没有数字返回 None"""
+    match = ID_NUMBER_PATTERN.search(str(row_id))
+    return int(match.group(1)) if match else None
+
+
+class Catalog:
+    """
+    所有数据集的总账本 (SQLite)：
+    - allocate_id() 从每份数据自己的序列里发号，O(1)，多进程同时发也不会撞号
+    - find() 按编号 / 名字 / 来源链接走索引查询
+    - export_csv() 导出成网页读取的 CSV 格式
+    第一次打开时，还没进账本的数据会自动从现有 CSV 导入；read_only=True 只读打开已有的账本 (不建表、不导入)。
+    注意：sqlite 连接不能跨线程用，每个线程各建一个 Catalog
+    """
+
+    def __init__(self, db_path=CATALOG_DB, read_only=False):
+        self.db_path = db_path
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30, isolation_level=None)
+            return
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        for source in SOURCES:
+            if self._next_id(source) is None:
+                self.import_csv(source)
+
+    def close(self):
+        self.conn.close()
+
+    def _next_id(self, source):
+        row = self.conn.execute("SELECT next_id FROM sequences WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    # --- 1. 从 CSV 导入 (整份替换) ---
+    def import_csv(self, source, path=None):
+        config = SOURCES[source]
+        path = path or config['file']
+        rows = []
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                rows = [row for row in reader if row]
+
+        now = time.time()
+        name_col, url_col = self._columns(source)
+        numbers = [n for n in (id_number(row[0]) for row in rows) if n is not None]
+        next_id = max([config['first_id']] + [n + 1 for n in numbers])
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("DELETE FROM records WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM ids WHERE source = ?", (source,))
+            self.conn.executemany(
+                "INSERT INTO records (source, pos, id, name, url, data, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(source, pos, row[0], _cell(row, name_col), _cell(row, url_col), json.dumps(row, ensure_ascii=False), now)
+                 for pos, row in enumerate(rows)])
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ids (space, id, source) VALUES (?, ?, ?)",
+                [(config['space'], n, source) for n in numbers])
+            self.conn.execute("INSERT OR REPLACE INTO sequences (source, next_id) VALUES (?, ?)", (source, next_id))
+        return len(rows)
+
+    # --- 2. 发号 ---
+    def allocate_id(self, source):
+        """返回一个新编号 (整数)；同一编号空间里被别的数据占了就往后跳"""
+        space = SOURCES[source]['space']
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            candidate = self._next_id(source) or SOURCES[source]['first_id']
+            while self.conn.execute(
+                    "INSERT OR IGNORE INTO ids (space, id, source) VALUES (?, ?, ?)",
+                    (space, candidate, source)).rowcount == 0:
+                candidate += 1
+            self.conn.execute("UPDATE sequences SET next_id = ? WHERE source = ?", (candidate + 1, source))
+        return candidate
+
+    # --- 3. 写入 ---
+    def append(self, source, rows):
+        """追加若干行 (列顺序同表头，第一列是编号)"""
+        if not rows:
+            return
+        space = SOURCES[source]['space']
+        name_col, url_col = self._columns(source)
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            pos = self.conn.execute(
+                "SELECT COALESCE(MAX(pos), -1) FROM records WHERE source = ?", (source,)).fetchone()[0]
+            for row in rows:
+                row = [str(v) for v in row]
+                pos += 1
+                self.conn.execute(
+                    "INSERT INTO records (source, pos, id, name, url, data, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source, pos, row[0], _cell(row, name_col), _cell(row, url_col), json.dumps(row, ensure_ascii=False), now))
+                number = id_number(row[0])
+                if number is not None:
+                    self.conn.execute("INSERT OR IGNORE INTO ids (space, id, source) VALUES (?, ?, ?)",
+                                      (space, number, source))
+
+    def upsert(self, source, row):
+        """编号已存在就原地更新 (保持原来的行顺序)，否则追加到末尾"""
+        row = [str(v) for v in row]
+        name_col, url_col = self._columns(source)
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE records SET name = ?, url = ?, data = ?, updated_at = ? WHERE source = ? AND id = ?",
+                (_cell(row, name_col), _cell(row, url_col), json.dumps(row, ensure_ascii=False), time.time(),
+                 source, row[0]))
+        if cur.rowcount == 0:
+            self.append(source, [row])
+
+    def delete(self, source, ids):
+        ids = [str(i) for i in ids]
+        with self.conn:
+            self.conn.executemany("DELETE FROM records WHERE source = ? AND id = ?", [(source, i) for i in ids])
+
+    # --- 4. 查询 (都走索引) ---
+    def find(self, source, id=None, name=None, url=None):
+        """按 编号 / 名字 / 来源链接 找一行，返回列表 (同表头顺序)；找不到返回 None"""
+        if id is not None:
+            column, value = "id", str(id)
+        elif name is not None:
+            column, value = "name", name
+        else:
+            column, value = "url", url
+        row = self.conn.execute(
+            f"SELECT data FROM records WHERE source = ? AND {column} = ? ORDER BY pos LIMIT 1",
+            (source, value)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rows(self, source):
+        for (data,) in self.conn.execute("SELECT data FROM records WHERE source = ? ORDER BY pos", (source,)):
+            yield json.loads(data)
+
+    def count(self, source):
+        return self.conn.execute("SELECT COUNT(*) FROM records WHERE source = ?", (source,)).fetchone()[0]
+
+    # --- 5. 导出 CSV (先写临时文件再替换，网页不会读到半截) ---
+    def export_csv(self, source, path=None):
+        config = SOURCES[source]
+        path = path or config['file']
+        tmp_path = path + ".tmp"
+        with file_lock(path):
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')  # 和仓库里现有的 CSV 一致，导出后 git diff 干净
+                writer.writerow(config['header'])
+                writer.writerows(self.rows(source))
+            os.replace(tmp_path, path)
+        return path
+
+    def _columns(self, source):
+        config = SOURCES[source]
+        header = config['header']
+        name_col = header.index(config['name']) if config['name'] else None
+        url_col = header.index(config['url']) if config['url'] else None
+        return name_col, url_col
+
+
+def _cell(row, col):
+    if col is None or col >= len(row):
+        return None
+    return row[col]
+
+
+# --- 命令行：python catalog.py [stats|import|export] [数据名 ...] ---
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'import', 'export'):
+        print(f"用法: python catalog.py stats|import|export [{'|'.join(SOURCES)} ...]")
+        return
+    action = sys.argv[1]
+    sources = sys.argv[2:] or list(SOURCES)
+    catalog = Catalog()
+    for source in sources:
+        if action == 'import':
+            print(f"📥 [{source}] 已从 {SOURCES[source]['file']} 导入 {catalog.import_csv(source)} 行")
+        elif action == 'export':
+            print(f"📤 [{source}] 已导出 {catalog.count(source)} 行到 {catalog.export_csv(source)}")
+        else:
+            print(f"📒 [{source}] {catalog.count(source)} 行，下一个编号 {catalog._next_id(source)}")
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,23 @@
 import os
-import csv
 import time
-import random
-import requests
-import base64
-import hashlib
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser
+import metrics
+import rate_limiter
+import url_cache
+from csv_writer import BatchCsvWriter
+from downloader import fetch_iter
+from image_index import ImageHashIndex
+from keyword_scheduler import KeywordScheduler
+from static_fetch import find_bing_images
 
 # --- 🛠️ 暴力采集配置区 ---
 SAVE_DIR = 'images_history'
 CSV_FILE = 'gallery.csv'
+HEADER = ['id', 'title', 'desc', 'filename', 'type']
 IMAGES_PER_KEYWORD = 3  # 🔥 每个关键词抓几张图？(建议 3-5 张)
+QUERY_BUDGET = 180  # 每次运行最多搜多少个关键词 (大概是以前 主体 × 风格 跑一遍的量)
+TIME_BUDGET_MINUTES = None  # 或者限定跑多少分钟，None 表示不限
 
 # --- 1. 关键词矩阵 (随意扩充，脚本会自动排列组合) ---
 # A. 核心主体
@@ -25,9 +28,9 @@ SUBJECTS = [
     "荔枝", "马匹", "马鞍", "通关文牒"  # 物品
 ]
 
-# B. 历史修饰词
+# B. 历史修饰词 (空字符串 = 不加朝代词)
 ERAS = [
-    "唐代", "古代", "宋代", "历史复原", "遗址"
+    "唐代", "古代", "宋代", "历史复原", "遗址", ""
 ]
 
 # C. 艺术形式 (确保搜出来的是古风/文物)
@@ -39,152 +42,169 @@ STYLES = [
 
 # --- 2. 浏览器初始化 ---
 def setup_driver():
-    print("🚀 启动[PRO版]影像采集引擎...")
-    chrome_options = Options()
-    # chrome_options.add_argument("--headless") # 想要后台静默运行就把这行注释去掉
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
-    service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=chrome_options)
-
-
-# --- 3. 生成去重指纹 ---
-def get_file_hash(content):
-    return hashlib.md5(content).hexdigest()
+    # 共用浏览器工厂 (browser.py)：驱动路径有缓存、拦截字体/样式等无用资源，换关键词时复用同一个浏览器
+    return browser.get_driver('picture')
 
 
-# --- 4. 核心下载逻辑 ---
-def download_images_for_keyword(driver, keyword, start_id, existing_hashes):
+# --- 3. 核心下载逻辑 ---
+def download_images_for_keyword(driver, keyword, writer, hash_index, stats=None):
+    """
+    返回这个关键词新保存了几张图；driver 为空时，需要浏览器再从浏览器池里取
+    传了 stats (字典) 会填上 candidates (候选图几张)、duplicates (查重跳过几张)、
+    download_failed (下载或保存失败几张)、capped (是否因为达到上限提前停)、failed (搜索页出错)
+    """
     print(f"\n🔍 正在通过矩阵搜索: 【{keyword}】 (目标: {IMAGES_PER_KEYWORD}张)")
 
-    # 必应搜索 (强制显示大图)
-    url = f"https://www.bing.com/images/search?q={keyword}&qft=+filterui:imagesize-large"
-    driver.get(url)
-
-    # 疯狂向下滚动，加载更多图片
-    for _ in range(3):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
-
     downloaded_count = 0
+    duplicates = 0
+    download_failed = 0
+    srcs = None
+    capped = failed = False
     try:
-        # 找到所有图片缩略图
-        img_elements = driver.find_elements(By.CSS_SELECTOR, "img.mimg")
-
-        for img in img_elements:
+        # 先用轻量 HTTP 直接取搜索页，拿不到再开浏览器
+        srcs = find_bing_images(keyword, large=True)
+        if srcs is None:
+            # 必应搜索 (强制显示大图)
+            url = f"https://www.bing.com/images/search?q={keyword}&qft=+filterui:imagesize-large"
+            driver = driver or setup_driver()
+            rate_limiter.wait(url)
+            with metrics.timed("page_load"):
+                driver.get(url)
+
+            # 疯狂向下滚动，加载更多图片
+            for _ in range(3):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                time.sleep(1)
+
+            # 找到所有图片缩略图，一次 JS 调用把链接全部取出来 (省掉逐个 get_attribute 的往返)
+            srcs = driver.execute_script(
+                "return Array.from(document.querySelectorAll('img.mimg')).map(img => img.src);")
+            srcs = [src for src in (srcs or []) if src]
+            if srcs:
+                rate_limiter.success(url)
+            else:
+                rate_limiter.backoff(url, "没有搜索结果")
+
+        # 并发下载 (连接池 + 每域名限流)，按页面顺序逐张处理
+        # 网址缓存里记着、内容已经在图库里的，不下载正文 (content 为 None)
+        for src, content in fetch_iter(srcs, timeout=5, known=hash_index.has_md5):
             if downloaded_count >= IMAGES_PER_KEYWORD:
+                capped = True
                 break
 
             try:
-                # 获取链接
-                src = img.get_attribute("src")
-                if not src: continue
-
-                # 下载内容
-                content = None
-                if src.startswith("data:image"):
-                    content = base64.decodebytes(src.split(",")[1].encode())
-                elif src.startswith("http"):
-                    try:
-                        res = requests.get(src, timeout=5)
-                        if res.status_code == 200:
-                            content = res.content
-                    except:
-                        continue
-
-                if not content: continue
-
-                # 图片查重 (计算哈希值)
-                img_hash = get_file_hash(content)
-                if img_hash in existing_hashes:
+                if not content:
+                    if hash_index.has_md5(url_cache.get_cache().md5_of(src)):
+                        metrics.record("image", "skip")
+                        duplicates += 1
+                    else:
+                        download_failed += 1  # 没拿到内容，这张图到底新不新还不知道
+                    continue
+
+                # 图片查重 (MD5 精确 + 感知哈希近似，覆盖历史所有已下载图片)
+                with metrics.timed("hash") as timer:
+                    duplicate = hash_index.find_duplicate(content)
+                    if duplicate:
+                        timer.outcome = "skip"
+                if duplicate:
                     # print("      重复图片，跳过...")
+                    metrics.record("image", "skip")
+                    duplicates += 1
                     continue
 
-                # 保存文件
-                filename = f"history_{start_id}.jpg"
+                # 保存文件 (先占一个 id，文件名里要用；落盘时这个 id 不会再变)
+                row_id = writer.new_id()
+                filename = f"history_{row_id}.jpg"
                 filepath = os.path.join(SAVE_DIR, filename)
 
                 with open(filepath, "wb") as f:
                     f.write(content)
 
-                # 写入 CSV
-                with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    # 自动生成一段描述
-                    desc = f"关于{keyword}的历史影像资料，反映了当时的文化风貌。"
-                    writer.writerow([start_id, keyword, desc, f"{SAVE_DIR}/{filename}", '文物影像'])
+                # 写入 CSV (攒一批再落盘)
+                # 自动生成一段描述
+                desc = f"关于{keyword}的历史影像资料，反映了当时的文化风貌。"
+                writer.add([keyword, desc, f"{SAVE_DIR}/{filename}", '文物影像'], row_id)
 
                 # 更新状态
-                existing_hashes.add(img_hash)
+                hash_index.add(filename, content)
+                metrics.record("image", "success")
                 print(f"      ✅ [{downloaded_count + 1}/{IMAGES_PER_KEYWORD}] 保存成功: {filename}")
 
-                start_id += 1
                 downloaded_count += 1
-                time.sleep(0.5)  # 稍微休息防封
 
             except Exception as e:
+                metrics.record("image", "fail")
+                download_failed += 1
                 continue
 
     except Exception as e:
         print(f"      ❌ 搜索页出错: {e}")
+        metrics.record("keyword", "fail", keyword=keyword)
+        failed = True
 
-    return start_id
+    if stats is not None:
+        stats.update(candidates=len(srcs or []), duplicates=duplicates, download_failed=download_failed,
+                     capped=capped, failed=failed)
+    return downloaded_count
 
 
 # --- 主程序 ---
 def main():
     if not os.path.exists(SAVE_DIR): os.makedirs(SAVE_DIR)
 
-    # 初始化 CSV
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'title', 'desc', 'filename', 'type'])
-
-    driver = setup_driver()
-
-    # 读取当前 ID
-    current_id = 3000
-    if os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            rows = list(csv.reader(f))
-            if len(rows) > 1 and rows[-1][0].isdigit():
-                current_id = int(rows[-1][0]) + 1
-
-    # 读取已有图片的哈希，防止重复下载
-    existing_hashes = set()
-    # (这里为了脚本简化，暂不读取本地已有文件的哈希，仅在单次运行中去重)
-
-    # --- 🔥 矩阵生成器 ---
-    # 随机打乱顺序，保证每次跑都能下到不一样的东西
-    random.shuffle(SUBJECTS)
-
-    count = 0
-    total_combinations = len(SUBJECTS) * len(STYLES)  # 大概 20 * 9 = 180 种组合
-
-    print(f"🎰 预计生成搜索组合: {total_combinations} 种")
-    print(f"📸 预计最大采集数量: {total_combinations * IMAGES_PER_KEYWORD} 张")
-
-    for subject in SUBJECTS:
-        for style in STYLES:
-            # 随机选取一个朝代词，或者不加
-            era = random.choice(ERAS)
-
-            # 组合出关键词，例如：“唐代 荔枝道 壁画”
-            keyword = f"{era} {subject} {style}"
-
-            # 执行采集
-            current_id = download_images_for_keyword(driver, keyword, current_id, existing_hashes)
-
-            count += 1
-            # 每搜完一个词，休息一下
-            print(f"💤 休息 2 秒...")
-            time.sleep(2)
-
+    # 初始化 CSV (不存在就写表头)，新 ID 由总账本 catalog.db 发号，默认从 3000 开始
+    writer = BatchCsvWriter(CSV_FILE, HEADER, first_id=3000, source='gallery')
+
+    print("🚀 启动[PRO版]影像采集引擎... (静态抓取拿不到结果时才会打开浏览器)")
+
+    # 读取已有图片的哈希，防止重复下载 (索引落盘，只重算新增/改动过的文件)
+    hash_index = ImageHashIndex(SAVE_DIR).load()
+
+    # --- 🔥 矩阵调度器 ---
+    # 不再打乱后挨个跑：按历史上每分钟出多少张新图，挑最有希望的组合先跑 (统计存在 keyword_stats.json)
+    scheduler = KeywordScheduler(SUBJECTS, STYLES, ERAS)
+    deadline = time.time() + TIME_BUDGET_MINUTES * 60 if TIME_BUDGET_MINUTES else None
+
+    print(f"🎰 本次最多搜索 {QUERY_BUDGET} 个组合" + (f"，限时 {TIME_BUDGET_MINUTES} 分钟" if deadline else ""))
+
+    started = time.time()
+    saved_total = 0
+    for _ in range(QUERY_BUDGET):
+        if deadline and time.time() > deadline:
+            print("\n⏰ 到时间了")
+            break
+        # 组合出关键词，例如：“唐代 荔枝道 壁画”
+        keyword = scheduler.next()
+        if keyword is None:
+            print("\n🈳 所有组合都已挖空 (或本次都搜过了)")
+            break
+
+        # 执行采集
+        stats = {}
+        start = time.time()
+        saved = download_images_for_keyword(None, keyword, writer, hash_index, stats)
+        saved_total += saved
+        if not stats.get("failed") and stats.get("candidates"):
+            # 搜索页出错或者一张候选图都没拿到 (多半是被限流了)，不算这个组合的产出，下次还可以再试
+            scheduler.update(keyword, saved, stats.get("duplicates", 0), time.time() - start,
+                             exhausted=not stats.get("capped"), failed=stats.get("download_failed", 0))
+        # 每个关键词做一次检查点：CSV 落盘 + 哈希索引落盘 + 调度统计落盘 + 网址缓存落盘
+        writer.flush()
+        hash_index.save()
+        scheduler.save()
+        url_cache.get_cache().save()
+        # 不再固定休息：下一次搜索前由 rate_limiter 按必应的响应情况决定等多久
+
+    minutes = (time.time() - started) / 60
+    print(f"\n📸 本次新增 {saved_total} 张 ({saved_total / minutes if minutes else 0:.1f} 张/分钟)")
+    scheduler.print_summary()
+    writer.close()
     print("\n🎉 海量采集完成！")
-    driver.quit()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metrics.start_run('picture')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
\ No newline at end of file
@@ -1,122 +1,271 @@
-import csv
 import os
+import json
 import time
-import random
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser
+import metrics
+import rate_limiter
+from crawl_queue import QUEUE_DB, CrawlQueue, make_owner
+from csv_writer import BatchCsvWriter
+from poem_dedup import PoemDedupIndex, minhash
+from static_fetch import cookies_from_selenium, scrape_gushiwen
 
 # --- 🛠️ 配置区 ---
 SAVE_FILE = 'literature_poems.csv'
+HEADER = ['id', 'title', 'author', 'era', 'content', 'type', 'source']
 # 这里的关键词可以根据项目书需求增加
 KEYWORDS = ["荔枝", "蜀道", "子午谷", "妃子笑", "一骑红尘", "杨贵妃", "长安", "驿站"]
 MAX_PAGES = 3  # 每个词抓3页，差不多能有100多条数据
+WORKERS = 4  # 同时开几个后台浏览器一起抓
+HOME_URL = "https://so.gushiwen.cn/"
+COOKIE_FILE = 'gushiwen_cookies.json'  # 登录状态保存在这里，删掉它就会重新扫码登录
+COOKIE_MAX_AGE_DAYS = 7  # 保存的登录状态超过这么多天 (或者里面有 Cookie 已过期) 就重新扫码
+QUEUE_NAME = 'poems'  # 在 crawl_queue.db 里的采集器名，多个进程/机器可以共用同一个队列
+IDLE_WAIT = 10  # 没有可领的任务、但还有任务在等重试或别人在抓时，隔多久再看一次
 
 
-def setup_driver():
+def setup_driver(headless=False):
     print("🚗 启动浏览器...")
-    chrome_options = Options()
-    # 必须显示界面，否则你怎么扫码登录？
-    # chrome_options.add_argument("--headless")
-
-    # 防屏蔽参数
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
+    # 登录用的浏览器必须显示界面，否则你怎么扫码登录？(完整加载页面，一次性用完就关)
+    if not headless:
+        return browser.new_driver(headless=False, scraping=False)
+    # 抓取用的工人浏览器在后台跑：拦截无用资源，DOM 就绪就开始找元素
+    return browser.new_driver(headless=True)
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
 
+# --- 🔑 登录一次，导出 Cookie 给所有工人浏览器共用 ---
+def load_saved_cookies():
+    """读取保存的 Cookie；没有、读不了或者已经过期返回 None"""
+    if not os.path.exists(COOKIE_FILE):
+        return None
+    try:
+        with open(COOKIE_FILE, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(saved, list):  # 老格式只有 Cookie 列表，按文件修改时间算保存时间
+        saved = {"saved_at": os.path.getmtime(COOKIE_FILE), "cookies": saved}
+    now = time.time()
+    age_days = (now - saved.get("saved_at", 0)) / 86400
+    expired = [c['name'] for c in saved.get("cookies", []) if c.get('expiry') and c['expiry'] < now]
+    if age_days > COOKIE_MAX_AGE_DAYS or expired:
+        reason = f"已保存 {age_days:.0f} 天" if age_days > COOKIE_MAX_AGE_DAYS else f"{len(expired)} 个 Cookie 已过期"
+        print(f"🍪 保存的登录状态{reason}，需要重新登录")
+        return None
+    return saved["cookies"]
 
-def init_csv():
-    # 如果文件不存在，先写表头
-    if not os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'title', 'author', 'era', 'content', 'type', 'source'])
 
+def login_and_export_cookies():
+    cookies = load_saved_cookies()
+    if cookies is not None:
+        print(f"🍪 使用已保存的登录状态 ({COOKIE_FILE})，如需重新登录请删除该文件")
+        return cookies
 
-def main():
     driver = setup_driver()
-    init_csv()
-
-    # 1.先打开首页
-    driver.get("https://so.gushiwen.cn/")
+    driver.get(HOME_URL)
 
-    # --- 🛑 关键步骤：给你 40秒 时间手动登录 ---
     print("\n" + "=" * 50)
     print("🚨 【请注意】浏览器已打开！")
-    print("👉 请在 40秒 内，在浏览器里点击右上角“登录”，用微信扫码登录。")
-    print("👉 登录成功后，不要关浏览器，脚本会自动开始工作！")
+    print("👉 请在浏览器里点击右上角“登录”，用微信扫码登录。")
     print("=" * 50 + "\n")
+    input("✅ 登录成功后回到这里按回车，脚本会自动开始工作...")
+
+    cookies = driver.get_cookies()
+    driver.quit()
+    with open(COOKIE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"saved_at": time.time(), "cookies": cookies}, f, ensure_ascii=False)
+    print(f"🍪 已导出 {len(cookies)} 个 Cookie")
+    return cookies
+
+
+def setup_worker_driver(cookies):
+    driver = setup_driver(headless=True)
+    # 必须先打开同域名的页面才能写入 Cookie
+    driver.get(HOME_URL)
+    for cookie in cookies:
+        cookie = {k: v for k, v in cookie.items() if k in ('name', 'value', 'path', 'domain', 'secure', 'httpOnly', 'expiry')}
+        try:
+            driver.add_cookie(cookie)
+        except Exception:
+            continue
+    return driver
 
-    # 倒计时显示
-    for i in range(40, 0, -1):
-        print(f"\r⏳ 剩余登录时间: {i} 秒...", end="")
-        time.sleep(1)
-    print("\n\n🚀 时间到！开始自动执行抓取任务...\n")
 
-    # 计算当前ID
-    current_id = 1
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, 'r', encoding='utf-8') as f:
-            current_id = len(f.readlines())
+# --- 📄 抓取一页搜索结果 ---
+def scrape_page(driver, keyword, page):
+    """
+    返回 (这一页的记录列表, 页面地址, 状态)，状态:
+    "ok" 正常 (记录可能都被关键词过滤掉了)；"end" 没有结果了，后面的页也不用抓；"captcha" 被拦到登录/验证页
+    """
+    url = f"https://so.gushiwen.cn/search.aspx?value={keyword}&page={page}"
+    rate_limiter.wait(url)  # 按域名自适应限速，代替固定的随机休息
+    with metrics.timed("page_load"):
+        driver.get(url)
 
-    for keyword in KEYWORDS:
-        print(f"\n🔍 正在搜索关键词: 【{keyword}】")
+    # 被限流时会跳到登录/验证页面 (不能按“验证码”字样判断，正常页面的登录框里也有)
+    if "search.aspx" not in driver.current_url:
+        rate_limiter.backoff(url, "跳转到验证页")
+        return [], driver.current_url, "captcha"
 
-        for page in range(1, MAX_PAGES + 1):
-            print(f"   📄 第 {page} 页...")
-            url = f"https://so.gushiwen.cn/search.aspx?value={keyword}&page={page}"
-            driver.get(url)
-            time.sleep(random.uniform(2, 4))  # 随机休息，模拟真人阅读
+    records = []
+    with metrics.timed("find_elements"):
+        poems = driver.find_elements(By.CSS_SELECTOR, ".sons .cont")
+    if not poems:
+        # 正常的搜索页但一条结果都没有：这个词翻到头了
+        rate_limiter.success(url)
+        return [], driver.current_url, "end"
+    for poem in poems:
+        try:
+            title_text = poem.find_element(By.CSS_SELECTOR, "b").text
+            content_text = poem.find_element(By.CSS_SELECTOR, ".contson").text.replace("\n", " ")
+
+            # 简单去重：如果内容里没有关键词，可能是不相关的
+            if keyword not in (title_text + content_text):
+                continue
 
             try:
-                poems = driver.find_elements(By.CSS_SELECTOR, ".sons .cont")
+                source_text = poem.find_element(By.CSS_SELECTOR, ".source").text
+                parts = source_text.split('：')
+                era = parts[0] if len(parts) > 0 else "未知"
+                author = parts[1] if len(parts) > 1 else "佚名"
+            except:
+                era, author = "未知", "佚名"
 
-                if len(poems) == 0:
-                    print("      ⚠️ 本页无内容或又弹出验证码了...")
-                    break
+            records.append([title_text, author, era, content_text])
+        except:
+            continue
+    rate_limiter.success(url)
+    return records, driver.current_url, "ok"
 
-                for poem in poems:
-                    try:
-                        title_text = poem.find_element(By.CSS_SELECTOR, "b").text
-                        content_text = poem.find_element(By.CSS_SELECTOR, ".contson").text.replace("\n", " ")
 
-                        # 简单去重：如果内容里没有关键词，可能是不相关的
-                        if keyword not in (title_text + content_text):
-                            continue
+# --- 👷 工人线程：从任务队列里领 (关键词, 页码)，需要时各自开一个后台浏览器 ---
+def crawl_worker(worker_id, cookies, results, stop, queue_db=QUEUE_DB):
+    """stop (threading.Event) 被设置后不再领新任务，手上这一页抓完就退出"""
+    tasks = CrawlQueue(queue_db)  # sqlite 连接不能跨线程，每个工人自己开一个
+    owner = make_owner(worker_id)
+    static_cookies = cookies_from_selenium(cookies)
+    driver = None  # 先用轻量 HTTP 抓，搞不定 (验证码/要 JS) 才启动浏览器
+    try:
+        while not stop.is_set():
+            task = tasks.lease(QUEUE_NAME, owner)
+            if task is None:
+                # 还有任务在等重试 (RETRY_DELAY) 或者别人正在抓，等一会再领，本次运行内就能重试完
+                if not tasks.has_open_tasks(QUEUE_NAME):
+                    return
+                stop.wait(IDLE_WAIT)
+                continue
+            keyword, page = task
+            try:
+                scraped = scrape_gushiwen(keyword, page, static_cookies)
+                if scraped is not None:
+                    records, page_url = scraped
+                    state = "ok"
+                else:
+                    # 静态解析不出结果：可能是没结果了，也可能是验证码，交给浏览器确认
+                    if driver is None:
+                        driver = setup_worker_driver(cookies)
+                    records, page_url, state = scrape_page(driver, keyword, page)
+                results.put((keyword, page, records, page_url, state, None))
+            except Exception as e:
+                results.put((keyword, page, [], None, None, e))
+    finally:
+        if driver is not None:
+            driver.quit()
+        tasks.close()
 
-                        source_text = "未知"
-                        try:
-                            source_text = poem.find_element(By.CSS_SELECTOR, ".source").text
-                            parts = source_text.split('：')
-                            era = parts[0] if len(parts) > 0 else "未知"
-                            author = parts[1] if len(parts) > 1 else "佚名"
-                        except:
-                            era, author = "未知", "佚名"
 
-                        with open(SAVE_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            writer.writerow(
-                                [current_id, title_text, author, era, content_text, '诗歌', driver.current_url])
+def handle_results(tasks, writer, dedup, results, futures):
+    """主线程：取工人的抓取结果，查重、写 CSV 并交差，直到工人都退出；返回新保存几首"""
+    saved = 0
+    while True:
+        try:
+            keyword, page, records, page_url, state, error = results.get(timeout=1)
+        except queue.Empty:
+            if all(future.done() for future in futures) and results.empty():
+                break
+            continue
+        print(f"\n🔍 【{keyword}】第 {page} 页")
+        if error:
+            print(f"      ❌ 页面出错: {error}")
+            metrics.record("page", "fail", keyword=keyword, page=page)
+            tasks.fail(QUEUE_NAME, keyword, page, error)
+            continue
+        if state == "captcha":
+            print("      ⚠️ 又弹出验证码了，稍后重试...")
+            metrics.record("page", "skip", keyword=keyword, page=page)
+            tasks.fail(QUEUE_NAME, keyword, page, "验证码")
+            continue
+        if state == "end":
+            # 和以前一样：没有更多结果就不再往后翻，后面的页直接交差
+            skipped = tasks.complete_rest(QUEUE_NAME, keyword, page)
+            print(f"      🏁 没有更多结果了，后面 {skipped} 页不用再抓")
+            metrics.record("page", "skip", keyword=keyword, page=page)
+            tasks.complete(QUEUE_NAME, keyword, page)
+            continue
 
-                        print(f"      ✅ [{current_id}] {title_text}")
-                        current_id += 1
+        for title_text, author, era, content_text in records:
+            signature = minhash(content_text)
+            duplicate = dedup.find_duplicate(content_text, signature)
+            if duplicate is not None:
+                print(f"      🔁 {title_text} 与 [{duplicate}] 重复，跳过")
+                metrics.record("poem", "skip")
+                continue
+            row_id = writer.add([title_text, author, era, content_text, '诗歌', page_url])
+            dedup.add(str(row_id), content_text, signature)
+            saved += 1
+            metrics.record("poem", "success")
+            print(f"      ✅ [{row_id}] {title_text}")
+        metrics.record("page", "success", keyword=keyword, page=page, records=len(records))
+        # 这一页先落盘再交差：writer 只在 add 时检查要不要写盘，攒着不写可能拖过任务租约 (10 分钟)
+        writer.flush()
+        tasks.complete(QUEUE_NAME, keyword, page)
+    return saved
 
-                    except:
-                        continue
 
-            except Exception as e:
-                print(f"      ❌ 页面出错: {e}")
+def main():
+    # 1. 把 关键词×页码 登记到任务队列 (已完成的页不会重复抓，中断后从断点继续)
+    tasks = CrawlQueue()
+    tasks.enqueue(QUEUE_NAME, [(keyword, page) for keyword in KEYWORDS for page in range(1, MAX_PAGES + 1)])
+    print(f"📋 任务状态: {tasks.stats(QUEUE_NAME)}")
+    if not tasks.has_open_tasks(QUEUE_NAME):
+        print("✅ 所有页面都已抓完 (重新抓取请运行: python crawl_queue.py reset poems)")
+        tasks.close()
+        return
 
+    # 2. 可视浏览器登录一次，拿到 Cookie
+    cookies = login_and_export_cookies()
+
+    # 文件不存在会自动写表头；新 ID 由总账本 catalog.db 发号 (和学术/影像的编号不会撞)
+    writer = BatchCsvWriter(SAVE_FILE, HEADER, first_id=1, source='poems')
+    # 同一首诗会在好几个关键词下重复出现 (还有“一作”异文)，用 MinHash 近似查重挡掉
+    dedup = PoemDedupIndex.from_csv(SAVE_FILE)
+
+    results = queue.Queue()
+    stop = threading.Event()  # 主线程出错或 Ctrl-C 时通知工人别再领新任务
+    print(f"\n🚀 开始自动执行抓取任务: {WORKERS} 个后台浏览器并行\n")
+
+    # 3. 主线程负责写 CSV 并交差：每页的行落盘之后才把这一页标记完成，崩溃不丢页
+    try:
+        with writer, ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [pool.submit(crawl_worker, worker_id, cookies, results, stop) for worker_id in range(WORKERS)]
+            try:
+                handle_results(tasks, writer, dedup, results, futures)
+            finally:
+                # 正常结束时工人都已退出；中途出错 / Ctrl-C 时让工人抓完手上这一页就停 (没交差的页租约过期后重抓)
+                stop.set()
+        print(f"\n📋 任务状态: {tasks.stats(QUEUE_NAME)}")
+    finally:
+        tasks.close()
     print(f"\n🎉 大功告成！数据已保存在 {SAVE_FILE}")
-    print("你可以关闭浏览器了。")
-    # driver.quit()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metrics.start_run('poems')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
@@ -1,15 +1,17 @@
-import csv
-import os
+import re
 import time
-import random
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser
+import metrics
+import rate_limiter
+from crawl_queue import CrawlQueue, make_owner
+from csv_writer import BatchCsvWriter
 
 # --- 🛠️ 配置区 ---
 SAVE_FILE = 'literature_scholar.csv'  # 保存到这个新文件
+# 表头要和之前的保持一致，方便网站读取
+HEADER = ['id', 'title', 'author', 'era', 'content', 'type', 'source']
 # 关键词：更加偏向学术、考古、地理
 KEYWORDS = [
   "荔枝道",
@@ -30,110 +32,134 @@ KEYWORDS = [
 ]
 
 MAX_PAGES = 2  # 每个词抓2页
+QUEUE_NAME = 'scholar'  # 在 crawl_queue.db 里的采集器名，可以开多个进程一起抓
+CAPTCHA_URL_MARKERS = ("wappass.baidu.com", "captcha")  # 被拦时会跳到百度安全验证页
 
 
 def setup_driver():
     print("🎓 启动学术采集助手...")
-    chrome_options = Options()
-    # 百度学术反爬比较严，必须用可视模式
-    # chrome_options.add_argument("--headless")
+    # 百度学术反爬比较严，必须用可视模式，伪装成真人浏览器；
+    # 可能要手动点验证码，样式表不拦截 (字体、统计脚本照样拦)
+    return browser.get_driver('scholar', headless=False, block_css=False)
 
-    # 伪装成真人浏览器
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
+def card_text(item, selector):
+    """论文卡片里某一块的文字；卡片上没有这一块返回 None"""
+    elems = item.find_elements(By.CSS_SELECTOR, selector)
+    return elems[0].text if elems else None
 
 
-def init_csv():
-    if not os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            # 表头要和之前的保持一致，方便网站读取
-            writer.writerow(['id', 'title', 'author', 'era', 'content', 'type', 'source'])
+def parse_card(abstract_text, info_text):
+    """从搜索结果卡片的摘要和下方那行小字里拆出 (作者, 年代, 摘要)；缺的块填占位值，留给 enrich_scholar 补"""
+    # 1. 摘要 (Content)
+    content = abstract_text.replace("\n", "").replace("摘要：", "") if abstract_text is not None else "暂无摘要预览..."
 
+    # 2. 作者和年份 (Era)
+    # 百度学术的作者信息比较杂，我们直接抓取下方的一行小字
+    if info_text is None:
+        return "学术研究组", "现代", content
+    # 简单的年份提取逻辑：找 19xx 或 20xx
+    year_match = re.search(r'(19|20)\d{2}', info_text)
+    era = year_match.group(0) + "年" if year_match else "现代"
+    # 提取作者 (取第一个名字)
+    author = info_text.split("-")[0].strip()
+    return author, era, content
 
-def main():
-    driver = setup_driver()
-    init_csv()
 
-    # 计算当前ID (防止和诗歌的ID冲突，我们从 2000 开始编号)
-    current_id = 2000
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            if len(lines) > 1:
-                current_id = 2000 + len(lines)
+def save_card(writer, seen_links, title, link, abstract_text, info_text):
+    """一张论文卡片写进 writer (先攒在内存里，攒够一批再落盘)；返回新编号，收过的论文返回 None"""
+    # 同一篇论文换个关键词又搜出来了，按链接查总账本 (走索引)，收过就跳过
+    if link in seen_links or writer.catalog.find('scholar', url=link):
+        return None
+    seen_links.add(link)  # 本次运行还没落盘的也算
 
-    print(f"📚 目标关键词: {KEYWORDS}")
+    author, era, content = parse_card(abstract_text, info_text)
+    # type 固定为 '学术研究'，方便前端显示不同颜色
+    return writer.add([title, author, era, content, '学术研究', link])
 
-    for keyword in KEYWORDS:
-        print(f"\n🔍 正在检索学术资料: 【{keyword}】")
 
-        for page in range(0, MAX_PAGES):
-            # 百度学术的分页逻辑：第1页是0，第2页是10，第3页是20
-            pn = page * 10
-            url = f"https://xueshu.baidu.com/s?wd={keyword}&pn={pn}&filter=sc_type%3D%7B1%7D"  # sc_type=1 代表只看期刊/论文
+def main():
+    driver = setup_driver()
+    # ID 由总账本 catalog.db 发号：默认从 2000 开始，和诗歌/影像共用一个编号空间，不会撞号
+    writer = BatchCsvWriter(SAVE_FILE, HEADER, first_id=2000, source='scholar')
+    seen_links = set()
 
+    print(f"📚 目标关键词: {KEYWORDS}")
+
+    # 任务队列：已完成的页不会再抓，中断后重启从断点继续
+    queue = CrawlQueue()
+    queue.enqueue(QUEUE_NAME, [(keyword, page) for keyword in KEYWORDS for page in range(0, MAX_PAGES)])
+    owner = make_owner()
+    print(f"📋 任务状态: {queue.stats(QUEUE_NAME)}")
+
+    while True:
+        task = queue.lease(QUEUE_NAME, owner)
+        if task is None:
+            writer.flush()  # 手里攒着的页先落盘交差，免得把自己的租约也当成“别人在抓”
+            if not queue.has_open_tasks(QUEUE_NAME):
+                break
+            # 剩下的任务别人在抓或者在等重试，歇一会再来看看
+            time.sleep(10)
+            continue
+        keyword, page = task
+        print(f"\n🔍 正在检索学术资料: 【{keyword}】 第 {page + 1} 页")
+
+        # 百度学术的分页逻辑：第1页是0，第2页是10，第3页是20
+        pn = page * 10
+        url = f"https://xueshu.baidu.com/s?wd={keyword}&pn={pn}&filter=sc_type%3D%7B1%7D"  # sc_type=1 代表只看期刊/论文
+
+        rate_limiter.wait(url)  # 学术网站比较敏感，按域名自适应限速 (起步慢、上限低)
+        with metrics.timed("page_load"):
             driver.get(url)
-            time.sleep(random.uniform(3, 5))  # 多休息一会，学术网站比较敏感
 
-            try:
-                # 找到所有的论文卡片
+        try:
+            # 找到所有的论文卡片
+            with metrics.timed("find_elements"):
                 items = driver.find_elements(By.CSS_SELECTOR, ".result")
 
-                if len(items) == 0:
-                    print("      ⚠️ 本页无内容或遇到验证码，跳过...")
-                    break
-
-                for item in items:
-                    try:
-                        # 1. 抓取标题
-                        title_elem = item.find_element(By.CSS_SELECTOR, "h3 a")
-                        title = title_elem.text
-                        link = title_elem.get_attribute("href")
-
-                        # 2. 抓取摘要 (Content)
-                        try:
-                            abstract_elem = item.find_element(By.CSS_SELECTOR, ".c_abstract")
-                            content = abstract_elem.text.replace("\n", "").replace("摘要：", "")
-                        except:
-                            content = "暂无摘要预览..."
-
-                        # 3. 抓取作者和年份 (Era)
-                        # 百度学术的作者信息比较杂，我们直接抓取下方的一行小字
-                        try:
-                            info_elem = item.find_element(By.CSS_SELECTOR, ".sc_info")
-                            info_text = info_elem.text
-                            # 简单的年份提取逻辑：找 19xx 或 20xx
-                            import re
-                            year_match = re.search(r'(19|20)\d{2}', info_text)
-                            era = year_match.group(0) + "年" if year_match else "现代"
-
-                            # 提取作者 (取第一个名字)
-                            author = info_text.split("-")[0].strip()
-                        except:
-                            era = "现代"
-                            author = "学术研究组"
-
-                        # 4. 写入 CSV
-                        with open(SAVE_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            # type 固定为 '学术研究'，方便前端显示不同颜色
-                            writer.writerow([current_id, title, author, era, content, '学术研究', link])
-
-                        print(f"      ✅ [{current_id}] {title[:20]}...")
-                        current_id += 1
-
-                    except Exception as e:
+            if len(items) == 0:
+                metrics.record("page", "skip", keyword=keyword, page=page)
+                if any(marker in driver.current_url for marker in CAPTCHA_URL_MARKERS) or "安全验证" in driver.title:
+                    print("      ⚠️ 遇到验证码，稍后重试...")
+                    rate_limiter.backoff(url, "验证码")
+                    queue.fail(QUEUE_NAME, keyword, page, "验证码")
+                    continue
+                # 正常页面但没有结果：这个词翻到头了，和以前一样不再往后翻
+                skipped = queue.complete_rest(QUEUE_NAME, keyword, page)
+                print(f"      🏁 没有更多结果了，后面 {skipped} 页不用再抓")
+                rate_limiter.success(url)
+                queue.complete(QUEUE_NAME, keyword, page)
+                continue
+
+            for item in items:
+                try:
+                    title_elem = item.find_element(By.CSS_SELECTOR, "h3 a")
+                    row_id = save_card(writer, seen_links, title_elem.text, title_elem.get_attribute("href"),
+                                       card_text(item, ".c_abstract"), card_text(item, ".sc_info"))
+                    if row_id is None:
+                        metrics.record("paper", "skip")
                         continue
+                    print(f"      ✅ [{row_id}] {title_elem.text[:20]}...")
+                    metrics.record("paper", "success")
+
+                except Exception as e:
+                    metrics.record("paper", "fail")
+                    continue
+
+            metrics.record("page", "success", keyword=keyword, page=page)
+            rate_limiter.success(url)
+            # 这一页的数据真正写进文件后才算完成，中途崩溃会重抓而不是丢数据
+            writer.after_flush(lambda keyword=keyword, page=page: queue.complete(QUEUE_NAME, keyword, page))
+
+        except Exception as e:
+            print(f"      ❌ 页面出错: {e}")
+            metrics.record("page", "fail", keyword=keyword, page=page)
+            rate_limiter.backoff(url, e)
+            queue.fail(QUEUE_NAME, keyword, page, e)
 
-            except Exception as e:
-                print(f"      ❌ 页面出错: {e}")
+    writer.close()
+    print(f"📋 任务状态: {queue.stats(QUEUE_NAME)}")
+    queue.close()
 
     print(f"\n🎉 学术采集完成！数据已保存到 {SAVE_FILE}")
     print("💡 提示：百度学术如果弹出验证码，请手动点击一下，脚本会自动继续。")
@@ -141,4 +167,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metrics.start_run('scholar')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
\ No newline at end of file
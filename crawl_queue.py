@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import socket
+import sqlite3
+
+# --- 🛠️ 配置区 ---
+QUEUE_DB = 'crawl_queue.db'  # 多个进程/多台机器共享这个文件即可一起干活
+LEASE_SECONDS = 600  # 领走的任务 10 分钟没交差，就当工人挂了，别人可以重新领
+MAX_ATTEMPTS = 3  # 同一页最多试几次
+RETRY_DELAY = 120  # 失败 (验证码/空页) 后隔多久才允许重试
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    collector TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending / leased / done / failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (collector, keyword, page)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_pick ON tasks (collector, status, available_at);
+"""
+
+
+def make_owner(worker_id=0):
+    """工人标识：主机名-进程号-线程编号，方便排查是谁领走的"""
+    return f"{socket.gethostname()}-{os.getpid()}-{worker_id}"
+
+
+class CrawlQueue:
+    """
+    (采集器, 关键词, 页码) 任务队列，SQLite 存储：
+    - lease() 原子地领一个任务，带租期，过期自动回收
+    - complete() / fail() 交差，失败的隔一会再重试，超过次数标记 failed
+    - 重启后已完成的页不会再抓，从中断的地方继续
+    注意：sqlite 连接不能跨线程用，每个线程各建一个 CrawlQueue
+    """
+
+    def __init__(self, db_path=QUEUE_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # --- 1. 加任务 (已存在的不会重复加，也不会把已完成的改回去) ---
+    def enqueue(self, collector, items):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (collector, keyword, page, updated_at) VALUES (?, ?, ?, ?)",
+                [(collector, keyword, page, now) for keyword, page in items])
+
+    def reopen(self, collector, items):
+        """已经交差 (done / failed) 的任务又要重抓时改回待抓；正在被别人租着的不动。返回改了几个"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            cur = self.conn.executemany(
+                """UPDATE tasks SET status = 'pending', attempts = 0, lease_owner = NULL,
+                           lease_until = 0, available_at = 0, error = NULL, updated_at = ?
+                    WHERE collector = ? AND keyword = ? AND page = ? AND status IN ('done', 'failed')""",
+                [(now, collector, keyword, page) for keyword, page in items])
+        return cur.rowcount
+
+    # --- 2. 领任务 ---
+    def _expire_leases(self, collector, now):
+        """最后一次机会的租约过期了 (工人中途挂了)，不会再有人领，直接标记 failed"""
+        self.conn.execute(
+            """UPDATE tasks SET status = 'failed', lease_owner = NULL, updated_at = ?,
+                      error = COALESCE(error, '租约过期，工人没有交差')
+               WHERE collector = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?""",
+            (now, collector, now, MAX_ATTEMPTS))
+
+    def lease(self, collector, owner, lease_seconds=LEASE_SECONDS):
+        """返回 (keyword, page)；没有可领的任务返回 None"""
+        now = time.time()
+        with self.conn:
+            # BEGIN IMMEDIATE 直接拿写锁，保证两个工人不会领到同一个任务
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._expire_leases(collector, now)
+            row = self.conn.execute(
+                """SELECT keyword, page FROM tasks
+                   WHERE collector = ? AND attempts < ? AND (
+                         (status = 'pending' AND available_at <= ?)
+                      OR (status = 'leased' AND lease_until < ?))
+                   ORDER BY rowid LIMIT 1""",
+                (collector, MAX_ATTEMPTS, now, now)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                """UPDATE tasks SET status = 'leased', attempts = attempts + 1,
+                          lease_owner = ?, lease_until = ?, updated_at = ?
+                   WHERE collector = ? AND keyword = ? AND page = ?""",
+                (owner, now + lease_seconds, now, collector, row[0], row[1]))
+        return row[0], row[1]
+
+    # --- 3. 交差 ---
+    def complete(self, collector, keyword, page):
+        with self.conn:
+            self.conn.execute(
+                """UPDATE tasks SET status = 'done', lease_owner = NULL, error = NULL, updated_at = ?
+                   WHERE collector = ? AND keyword = ? AND page = ?""",
+                (time.time(), collector, keyword, page))
+
+    def complete_rest(self, collector, keyword, page):
+        """这个关键词在第 page 页就没有结果了：后面还没抓的页也不用抓了，一起标记完成"""
+        with self.conn:
+            cur = self.conn.execute(
+                """UPDATE tasks SET status = 'done', lease_owner = NULL, error = NULL, updated_at = ?
+                   WHERE collector = ? AND keyword = ? AND page > ? AND status IN ('pending', 'failed')""",
+                (time.time(), collector, keyword, page))
+        return cur.rowcount
+
+    def fail(self, collector, keyword, page, error=""):
+        """失败的任务放回队列，RETRY_DELAY 秒后可重试；次数用完标记为 failed"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                """UPDATE tasks SET
+                          status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                          lease_owner = NULL, available_at = ?, updated_at = ?, error = ?
+                   WHERE collector = ? AND keyword = ? AND page = ?""",
+                (MAX_ATTEMPTS, now + RETRY_DELAY, now, str(error)[:500], collector, keyword, page))
+
+    # --- 4. 统计 / 重置 ---
+    def stats(self, collector):
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM tasks WHERE collector = ? GROUP BY status", (collector,)).fetchall()
+        return dict(rows)
+
+    def has_open_tasks(self, collector):
+        """还有没完成、也没彻底失败的任务 (包括别人正在抓的、等待重试的)"""
+        with self.conn:
+            self._expire_leases(collector, time.time())
+        row = self.conn.execute(
+            """SELECT COUNT(*) FROM tasks WHERE collector = ?
+                      AND ((status = 'pending' AND attempts < ?) OR status = 'leased')""",
+            (collector, MAX_ATTEMPTS)).fetchone()
+        return row[0] > 0
+
+    def reset(self, collector, only_failed=False):
+        """把任务改回待抓状态 (重新采集一轮用)"""
+        where = "collector = ?" + (" AND status = 'failed'" if only_failed else "")
+        with self.conn:
+            cur = self.conn.execute(
+                f"""UPDATE tasks SET status = 'pending', attempts = 0, lease_owner = NULL,
+                           lease_until = 0, available_at = 0, error = NULL, updated_at = ?
+                    WHERE {where}""", (time.time(), collector))
+        return cur.rowcount
+
+
+# --- 命令行：python crawl_queue.py [stats|reset|retry] <采集器名> ---
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('stats', 'reset', 'retry'):
+        print("用法: python crawl_queue.py stats|reset|retry <poems|scholar>")
+        return
+    action, collector = sys.argv[1], sys.argv[2]
+    queue = CrawlQueue()
+    if action == 'stats':
+        print(f"📋 [{collector}] 任务状态: {queue.stats(collector) or '空'}")
+    elif action == 'reset':
+        print(f"🔄 [{collector}] 已重置 {queue.reset(collector)} 个任务")
+    else:
+        print(f"🔁 [{collector}] 失败任务重新排队: {queue.reset(collector, only_failed=True)} 个")
+    queue.close()
+
+
+if __name__ == '__main__':
+    main()
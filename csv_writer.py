@@ -0,0 +1,234 @@
+import os
+import io
+import csv
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，用 msvcrt 锁
+    fcntl = None
+    import msvcrt
+
+import metrics
+
+# --- 🛠️ 配置区 ---
+BATCH_SIZE = 50  # 攒够多少行写一次盘
+FLUSH_INTERVAL = 30  # 或者距离上次写盘超过多少秒 (免得任务租约过期前还没落盘)
+TAIL_BLOCK = 64 * 1024  # 从文件末尾往回读多少字节找最后一行
+LOCK_TIMEOUT = 60  # 等文件锁最多多少秒 (另一个采集脚本正在写同一个文件)
+
+
+# --- 1. 跨进程文件锁 (锁旁边的 .lock 文件，不影响别人读 CSV) ---
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    handle = open(path + ".lock", 'a+b')
+    deadline = time.time() + timeout
+    try:
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise TimeoutError(f"等待 {path} 的文件锁超时")
+                time.sleep(0.05)
+        yield
+    finally:
+        try:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        handle.close()
+
+
+# --- 2. 从文件末尾读最后一行的 id (不用把整个文件读进内存) ---
+def read_last_id(path):
+    """返回最后一行第一列的整数 id；文件不存在/只有表头/最后一行不是数字时返回 None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        block = TAIL_BLOCK
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            data = f.read(size - start)
+            lines = data.splitlines()
+            # 从 start 开始读，第一行可能是半行，除非已经读到了文件开头
+            candidates = lines if start == 0 else lines[1:]
+            for line in reversed(candidates):
+                if not line.strip():
+                    continue
+                try:
+                    first = next(csv.reader([line.decode('utf-8-sig')]))[0]
+                except (UnicodeDecodeError, StopIteration, IndexError):
+                    return None
+                return int(first) if first.strip().isdigit() else None
+            if start == 0:
+                return None
+            block *= 4  # 最后一行特别长，再往前多读一些
+
+
+def _repair_tail(path):
+    """上次写到一半崩溃留下的半行 (没有换行结尾) 直接截掉"""
+    with open(path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        start = max(0, size - TAIL_BLOCK)
+        f.seek(start)
+        data = f.read()
+        cut = data.rfind(b"\n")
+        if cut == -1 and start > 0:
+            return  # 半行比 TAIL_BLOCK 还长，不敢乱截
+        f.truncate(start + cut + 1)
+        print(f"⚠️ {path} 末尾有上次没写完的半行，已截掉")
+
+
+def _read_reserved(path):
+    """<csv>.ids 里记着下一个还没被占的 id (new_id() 占掉的号可能还没写进 CSV)；没有返回 None"""
+    try:
+        with open(path + ".ids", 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_reserved(path, next_id):
+    with open(path + ".ids", 'w', encoding='utf-8') as f:
+        f.write(str(next_id))
+
+
+# --- 3. 批量写入器 ---
+class BatchCsvWriter:
+    """
+    攒一批行再一次性追加写盘 (加文件锁 + fsync)，几个采集脚本可以同时写同一个 CSV。
+        with BatchCsvWriter('x.csv', header, first_id=1) as writer:
+            new_id = writer.add([title, author, ...])  # id 自动分配
+            writer.after_flush(lambda: queue.complete(...))  # 这批真正落盘之后才执行
+    如果别的进程在这期间也往文件里写了，落盘时本批行的 id 会顺延到文件末尾之后。
+    文件名等地方要先知道 id 的，用 new_id() 在文件锁里占号 (记在 <csv>.ids)，占到的号落盘时不会再改。
+    传了 source (catalog.py 里的数据名) 时改由总账本发号，每批先记进账本再追加到 CSV，不会撞号也不用顺延；
+    catalog 可以传一个已经打开的 Catalog (比如基准测试临时目录里的账本)，不传就打开默认的 catalog.db
+    """
+
+    def __init__(self, path, header, first_id=1, batch_size=BATCH_SIZE, source=None, catalog=None):
+        self.path = path
+        self.header = header
+        self.first_id = first_id
+        self.batch_size = batch_size
+        self.source = source
+        self.catalog = None
+        self._rows = []
+        self._reserved = []  # 和 _rows 一一对应：这一行的 id 是不是 new_id() 占下的 (不能顺延)
+        self._callbacks = []
+        self._last_flush = time.time()
+        if source:
+            if catalog is None:
+                from catalog import Catalog  # 按需导入，catalog 本身也要用这里的 file_lock
+                catalog = Catalog()
+            self.catalog = catalog
+        with file_lock(path):
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                with open(path, 'w', newline='', encoding='utf-8') as f:
+                    csv.writer(f, lineterminator='\n').writerow(header)
+            else:
+                _repair_tail(path)
+            self.next_id = self._free_id()
+
+    def _id_after(self, last_id):
+        return max(self.first_id, last_id + 1) if last_id is not None else self.first_id
+
+    def _free_id(self):
+        """持有文件锁时调用：文件最后一行和已占号之后的第一个 id"""
+        free = self._id_after(read_last_id(self.path))
+        reserved = _read_reserved(self.path)
+        return max(free, reserved) if reserved is not None else free
+
+    def new_id(self):
+        """先占一个 id (比如文件名里要用)，再用 add(fields, row_id) 写入；几个进程同时占也不会撞号"""
+        if self.catalog:
+            return self.catalog.allocate_id(self.source)
+        with file_lock(self.path):
+            row_id = max(self._free_id(), self.next_id)
+            _write_reserved(self.path, row_id + 1)
+        self.next_id = row_id + 1
+        return row_id
+
+    def add(self, fields, row_id=None):
+        """追加一行 (不含 id)，返回分配到的 id；攒够一批自动写盘"""
+        reserved = row_id is not None
+        if self.catalog and not reserved:
+            row_id, reserved = self.new_id(), True  # 总账本发的号本身就不会撞
+        elif not reserved:
+            row_id = self.next_id
+            self.next_id += 1
+        self._rows.append([row_id] + list(fields))
+        self._reserved.append(reserved)
+        if len(self._rows) >= self.batch_size or time.time() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+        return row_id
+
+    def after_flush(self, callback):
+        """注册一个回调：当前已攒的行写盘成功后再执行 (比如把任务标记为完成)"""
+        if self._rows:
+            self._callbacks.append(callback)
+        else:
+            callback()
+
+    def flush(self):
+        self._last_flush = time.time()
+        if not self._rows:
+            return
+        rows, callbacks = self._rows, self._callbacks
+        with metrics.timed("csv_write", rows=len(rows)), file_lock(self.path):
+            if self.catalog:
+                self.catalog.append(self.source, rows)  # 总账本先记上，CSV 万一没写完可以重新导出
+            # 别的进程写过 / 占过号了就把这批 id 顺延，保证全文件 id 不重复 (new_id() 占下的号不动)
+            expected = self._free_id()
+            loose = [row for row, reserved in zip(rows, self._reserved) if not reserved]
+            if loose and loose[0][0] < expected:
+                shift = expected - loose[0][0]
+                for row in loose:
+                    row[0] += shift
+                self.next_id += shift
+                print(f"    ↪️ {self.path} 被其他进程写入过，本批 id 顺延 {shift}")
+
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='\n').writerows(rows)
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                f.write(buffer.getvalue())
+                f.flush()
+                os.fsync(f.fileno())
+            if not self.catalog:
+                # 按文件末尾算下一个 id 时，已经写进来的号也不能再占
+                _write_reserved(self.path, max(expected, max(row[0] for row in rows) + 1))
+        self._rows, self._reserved, self._callbacks = [], [], []
+        for callback in callbacks:
+            callback()
+
+    def close(self):
+        self.flush()
+        if self.catalog:
+            self.catalog.close()
+            self.catalog = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
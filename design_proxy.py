@@ -0,0 +1,391 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+import rate_limiter
+from downloader import get_session
+
+# --- 🛠️ 配置区 ---
+UPSTREAM_URL = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+MODEL = "glm-4-flash"  # 和 index.html 里 generateDesign 用的模型一致
+API_KEY_ENV = "ZHIPU_API_KEY"  # 代理自己的 Key (网页没设置 Key、请求又是文创方案提示词时用它)；网页带了 Authorization 就用网页的
+HOST = '127.0.0.1'
+PORT = 8790  # index.html 在本地打开时默认连 http://127.0.0.1:8790/chat/completions
+# 允许哪些网页跨域调用代理：本机 (localhost / 127.0.0.1，任意端口) 之外，默认只放行直接双击打开的 index.html
+# (file:// 页面发的 Origin 是 "null")；线上页面要用就加 --allow-origin https://你的域名
+LOCAL_ORIGIN = re.compile(r"^https?://(localhost|127\.0\.0\.1|\[::1\])(:\d+)?$")
+ALLOWED_ORIGINS = ["null"]
+TITLE_LIMIT = 200  # 用代理自己的 Key 时，提示词里的标题最长多少字
+CACHE_DIR = 'design_cache'  # 一个方案一个 JSON 文件：design_cache/<哈希前两位>/<哈希>.json
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # 超过就按最久没用过的先删 (LRU)
+CONTENT_LIMIT = 500  # 提示词里只放内容的前 500 字 (和网页的 content.substring(0, 500) 一致)
+UPSTREAM_TIMEOUT = 60
+BATCH_WORKERS = 4  # 批量预生成时同时发几个请求 (智谱免费模型有并发限制，别开太大)
+
+
+# --- 1. 提示词：和 index.html 里 generateDesign 拼的完全一样 (缩进差异不影响缓存命中，见 cache_key) ---
+def build_prompt(title, content):
+    return f"""你是一位顶级文创设计师。请基于以下历史文献或文物图片，设计一款文创产品。
+【标题】：{title}
+【描述/内容】：{content[:CONTENT_LIMIT]}
+请Strictly按照Markdown格式输出：
+### 🏮 产品名称
+(起一个有文化韵味的名字)
+### 💡 设计理念
+(50字以内，结合荔枝道文化)
+### 🎨 视觉设计
+(描述配色、材质、图案)
+### 🖌️ AI绘画提示词
+(一段英文Prompt，用于生成产品效果图)"""
+
+
+def request_body(title, content):
+    return {"model": MODEL, "messages": [{"role": "user", "content": build_prompt(title, content)}], "stream": False}
+
+
+def _prompt_pattern():
+    # 把 build_prompt 的模板拆成固定部分，标题和内容两个空位换成限长的通配
+    template = " ".join(build_prompt("\x00", "\x01").split())
+    head, rest = template.split("\x00")
+    middle, tail = rest.split("\x01")
+    return re.compile(f"{re.escape(head)}(.{{0,{TITLE_LIMIT}}}){re.escape(middle)}(.{{0,{CONTENT_LIMIT}}}){re.escape(tail)}", re.S)
+
+
+PROMPT_PATTERN = _prompt_pattern()
+
+
+def is_design_request(body):
+    """是不是网页 generateDesign 发的那种请求 (固定模型 + 固定提示词模板)；代理自己的 Key 只给这种请求用，不做通用中转"""
+    messages = body.get("messages")
+    if set(body) - {"model", "messages", "stream"} or body.get("model") != MODEL:
+        return False
+    if not isinstance(messages, list) or len(messages) != 1 or not isinstance(messages[0], dict):
+        return False
+    message = messages[0]
+    if message.get("role") != "user" or not isinstance(message.get("content"), str):
+        return False
+    return PROMPT_PATTERN.fullmatch(" ".join(message["content"].split())) is not None
+
+
+def cache_key(body):
+    """模型 + 消息内容的哈希；空白一律压成一个空格，网页模板字符串里的缩进不影响命中"""
+    messages = [[m.get("role", ""), " ".join(str(m.get("content", "")).split())] for m in body.get("messages", [])]
+    canonical = json.dumps([body.get("model", MODEL), messages], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# --- 2. 磁盘 LRU 缓存 (文件修改时间 = 最近一次使用时间) ---
+class DesignCache:
+    def __init__(self, folder=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 哈希 -> 文件大小，越靠后越是最近用过的
+        self._total = 0
+        self._lock = threading.Lock()
+        found = []
+        if os.path.exists(folder):
+            for sub in os.listdir(folder):
+                sub_dir = os.path.join(folder, sub)
+                if not os.path.isdir(sub_dir):
+                    continue
+                for name in os.listdir(sub_dir):
+                    if name.endswith('.json'):
+                        stat = os.stat(os.path.join(sub_dir, name))
+                        found.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                if key in self._entries:
+                    self._total -= self._entries.pop(key)
+            return None
+        try:
+            os.utime(path)  # 摸一下，标记为最近用过
+        except OSError:
+            pass
+        with self._lock:
+            if key not in self._entries:  # 别的进程 (比如批量预生成) 写进来的
+                size = os.path.getsize(path)
+                self._entries[key] = size
+                self._total += size
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(payload)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = len(payload)
+            self._total += len(payload)
+            evicted = []
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self._total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+        if evicted:
+            metrics.record("design_evict", "skip", count=len(evicted))
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._entries:
+                return True
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --- 3. 取一个方案：先查缓存，没有再问上游 (同一个提示词同时只问一次) ---
+_inflight = {}  # 哈希 -> [锁, 正在用这把锁的线程数]；没人用了就删掉，不会越攒越多
+_inflight_lock = threading.Lock()
+
+
+@contextmanager
+def _key_lock(key):
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _inflight[key]
+
+
+def call_upstream(body, api_key, upstream=UPSTREAM_URL):
+    """返回 (HTTP 状态码, 响应 JSON)"""
+    rate_limiter.wait(upstream)
+    with metrics.timed("design_upstream") as t:
+        res = get_session().post(upstream, json=body, timeout=UPSTREAM_TIMEOUT,
+                                 headers={"Authorization": f"Bearer {api_key}"})
+        if res.status_code != 200:
+            t.outcome = "fail"
+            t.fields["status"] = res.status_code
+    rate_limiter.report_status(upstream, res.status_code)
+    try:
+        return res.status_code, res.json()
+    except ValueError:
+        return 502, {"error": {"message": f"上游返回的不是 JSON (HTTP {res.status_code})"}}
+
+
+def complete(cache, body, api_key, upstream=UPSTREAM_URL):
+    """返回 (HTTP 状态码, 响应 JSON, 是否命中缓存)；只缓存正常返回了内容的结果"""
+    key = cache_key(body)
+    data = cache.get(key)
+    if data is not None:
+        metrics.record("design_cache", "success")
+        return 200, data, True
+    with _key_lock(key):
+        data = cache.get(key)  # 排队期间别的线程已经生成好了
+        if data is not None:
+            metrics.record("design_cache", "success")
+            return 200, data, True
+        metrics.record("design_cache", "skip")
+        if not api_key:
+            return 401, {"error": {"message": f"缓存里没有这个方案，代理也没有 Key (设置环境变量 {API_KEY_ENV})"}}, False
+        status, data = call_upstream(dict(body, stream=False), api_key, upstream)
+        if status == 200 and data.get("choices"):
+            cache.put(key, data)
+        return status, data, False
+
+
+# --- 4. 代理服务：网页把请求发到这里，接口格式和智谱一样 ---
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def origin_allowed(self):
+        """没有 Origin 的是命令行/脚本 (代理默认只监听本机)；浏览器来的只放行本机页面和 --allow-origin 配置的"""
+        origin = self.headers.get("Origin")
+        return origin is None or origin in self.server.allowed_origins or bool(LOCAL_ORIGIN.match(origin))
+
+    def send_cors(self):
+        origin = self.headers.get("Origin")
+        if origin is None or not self.origin_allowed():
+            return
+        self.send_header("Access-Control-Allow-Origin", origin)
+        self.send_header("Vary", "Origin")
+        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
+        if self.headers.get("Access-Control-Request-Private-Network"):
+            self.send_header("Access-Control-Allow-Private-Network", "true")  # 线上页面访问本机代理 (Chrome)
+
+    def send_json(self, status, data, cache_status=None):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_cors()
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if cache_status:
+            self.send_header("X-Design-Cache", cache_status)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_OPTIONS(self):
+        if not self.origin_allowed():
+            self.send_json(403, {"error": {"message": "这个网页不在代理允许的来源里 (--allow-origin)"}})
+            return
+        self.send_response(204)
+        self.send_cors()
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        if not self.origin_allowed():
+            self.send_json(403, {"error": {"message": "这个网页不在代理允许的来源里 (--allow-origin)"}})
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {"error": {"message": "只支持 /chat/completions"}})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        except ValueError:
+            self.send_json(400, {"error": {"message": "请求体不是合法 JSON"}})
+            return
+        if body.get("stream"):
+            self.send_json(400, {"error": {"message": "代理不支持流式输出 (stream=true)"}})
+            return
+        auth = self.headers.get('Authorization', '')
+        api_key = auth[7:].strip() if auth.startswith('Bearer ') else ''
+        if not api_key:
+            if not is_design_request(body):
+                self.send_json(403, {"error": {"message": "代理自己的 Key 只用于文创方案提示词，其他请求请带上自己的 Key"}})
+                return
+            api_key = self.server.api_key
+        start = time.time()
+        try:
+            status, data, hit = complete(self.server.cache, body, api_key, self.server.upstream)
+        except Exception as e:
+            self.send_json(502, {"error": {"message": f"连接上游失败: {e}"}})
+            return
+        print(f"   {'⚡ 命中' if hit else '🤖 生成'} {cache_key(body)[:10]} "
+              f"HTTP {status} ({time.time() - start:.2f}s)")
+        self.send_json(status, data, "HIT" if hit else "MISS")
+
+
+class ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache, api_key, upstream, allowed_origins=ALLOWED_ORIGINS):
+        super().__init__(address, ProxyHandler)
+        self.cache = cache
+        self.api_key = api_key
+        self.upstream = upstream
+        self.allowed_origins = set(allowed_origins)
+
+
+# --- 5. 批量预生成：三份文献 CSV 里的每一条都先生成好 ---
+def literature_items():
+    from build_search_index import load_records
+    items = []
+    for row in load_records():
+        # 和网页一样：标题 + (正文或描述)
+        items.append((row['title'], row.get('content') or row.get('desc') or ''))
+    return items
+
+
+def batch(cache, api_key, upstream=UPSTREAM_URL, workers=BATCH_WORKERS, limit=None):
+    todo, seen = [], set()
+    for title, content in literature_items():
+        body = request_body(title, content)
+        key = cache_key(body)
+        if key in seen or key in cache:
+            continue
+        seen.add(key)
+        todo.append((title, body))
+    if limit:
+        todo = todo[:limit]
+    print(f"🎨 待生成 {len(todo)} 条 (缓存里已有 {len(cache)} 条)，{workers} 个并发")
+    if todo and not api_key:
+        print(f"❌ 没有 Key：请设置环境变量 {API_KEY_ENV} 或者加 --api-key")
+        return 0
+
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(complete, cache, body, api_key, upstream): title for title, body in todo}
+        for future in as_completed(futures):
+            try:
+                status, data, _ = future.result()
+            except Exception as e:
+                status, data = None, {"error": {"message": str(e)}}
+            if status == 200 and data.get("choices"):
+                done += 1
+            else:
+                failed += 1
+                print(f"   ⚠️ {futures[future]}: {(data.get('error') or {}).get('message', status)}")
+            if (done + failed) % 20 == 0:
+                print(f"   ... {done + failed}/{len(todo)}")
+    print(f"✅ 预生成完成: 成功 {done} 条，失败 {failed} 条，缓存共 {len(cache)} 条")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 文创方案缓存代理 / 批量预生成")
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'batch'])
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--upstream', default=UPSTREAM_URL, help="补全接口地址 (测试时可以指向本地假接口)")
+    parser.add_argument('--api-key', default=os.environ.get(API_KEY_ENV, ''))
+    parser.add_argument('--allow-origin', action='append', default=[],
+                        help="额外允许跨域调用代理的网页来源，比如 https://example.com (可以写多次)")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS)
+    parser.add_argument('--limit', type=int, default=None, help="批量模式最多生成几条")
+    args = parser.parse_args()
+
+    cache = DesignCache()
+    if args.command == 'batch':
+        batch(cache, args.api_key, args.upstream, args.workers, args.limit)
+        return
+
+    server = ProxyServer((args.host, args.port), cache, args.api_key, args.upstream, ALLOWED_ORIGINS + args.allow_origin)
+    print(f"🎨 AI 方案缓存代理已启动: http://{args.host}:{args.port}/chat/completions")
+    print(f"   缓存 {len(cache)} 条，上游 {args.upstream}{'' if args.api_key else ' (没有 Key，只能返回缓存)'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    metrics.start_run('design_proxy')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
@@ -0,0 +1,259 @@
+import os
+import base64
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import rate_limiter
+import url_cache
+
+# --- 🛠️ 下载配置区 ---
+MAX_WORKERS = 8  # 同时下载的最大线程数
+PER_HOST_LIMIT = 4  # 同一个域名最多同时几个连接 (做个有礼貌的爬虫)
+CHUNK_SIZE = 64 * 1024  # 流式写盘的块大小
+DEFAULT_TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+# --- 1. 共享的长连接 Session (连接池复用 keep-alive) ---
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+    return _session
+
+
+# --- 2. 每个域名一个信号量，限制并发连接数 ---
+def _host_slot(url):
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_slots[host]
+
+
+def decode_data_url(src):
+    """把 data:image;base64,... 形式的 src 解码成字节"""
+    return base64.decodebytes(src.split(",")[1].encode())
+
+
+# --- 3. 网址 -> 哈希缓存：联网之前先查，能确定是已知的图就不下载正文 ---
+def _conditional_headers(url, known):
+    """
+    返回 (缓存条目, 请求头)；请求头为 None 表示不用联网 (近期下过，内容调用方已经有了)
+    known(md5) 由调用方提供：这个内容是不是已经有了/不需要了
+    """
+    entry = url_cache.get_cache().lookup(url)
+    if not known or not entry or not known(entry["md5"]):
+        return entry, {}
+    if url_cache.get_cache().fresh(entry):
+        return entry, None
+    # 缓存过期了：带上 ETag (没有就带 Last-Modified) 问一下，没变服务器回 304，不传正文
+    if entry.get("etag"):
+        return entry, {"If-None-Match": entry["etag"]}
+    if entry.get("last_modified"):
+        return entry, {"If-Modified-Since": entry["last_modified"]}
+    return entry, {}
+
+
+def _known_from_headers(url, res, entry, known):
+    """
+    只看响应头就能认出是已知的图：ETag 和记过的某张图一样，或者同一网址 Last-Modified 和大小都没变。
+    只有大小对上不算 (换了图大小碰巧一样也有可能)，要下正文
+    """
+    cache = url_cache.get_cache()
+    etag = res.headers.get("ETag")
+    md5 = cache.md5_for_etag(url, etag)
+    if md5 and known(md5):
+        if entry and entry["md5"] == md5:
+            cache.touch(url)
+        else:
+            cache.record(url, md5, int(res.headers.get("Content-Length") or 0), etag, res.headers.get("Last-Modified"))
+        return True
+    length = res.headers.get("Content-Length")
+    last_modified = res.headers.get("Last-Modified")
+    if (entry and last_modified and entry.get("last_modified") == last_modified
+            and length and length.isdigit() and int(length) == entry["size"]
+            and entry.get("etag") in (None, etag) and known(entry["md5"])):
+        cache.touch(url)
+        return True
+    return False
+
+
+def _too_large(res):
+    length = res.headers.get("Content-Length")
+    return bool(length and length.isdigit() and int(length) > url_cache.MAX_IMAGE_BYTES)
+
+
+# --- 4. 下载成字节 (适合需要先算哈希再决定是否保存的场景) ---
+def fetch_bytes(url, timeout=DEFAULT_TIMEOUT, known=None):
+    """
+    返回图片内容；失败返回 None。
+    传了 known(md5) 时，网址缓存 / 响应头能确定内容已知的，也返回 None (不下载正文)
+    """
+    if not url:
+        return None
+    if url.startswith("data:image"):
+        try:
+            return decode_data_url(url)
+        except Exception:
+            return None
+    if not url.startswith("http"):
+        return None
+
+    entry, headers = _conditional_headers(url, known)
+    if headers is None:
+        metrics.record("download", "skip", reason="url_cache")
+        return None
+
+    rate_limiter.wait(url)
+    with _host_slot(url), metrics.timed("download") as timer:
+        try:
+            with get_session().get(url, timeout=timeout, stream=True, headers=headers) as res:
+                rate_limiter.report_status(url, res.status_code)
+                if res.status_code == 304 and entry:
+                    url_cache.get_cache().touch(url)
+                    timer.outcome, timer.fields["reason"] = "skip", "not_modified"
+                    return None
+                if res.status_code != 200:
+                    timer.outcome = "fail"
+                    return None
+                if known and _known_from_headers(url, res, entry, known):
+                    timer.outcome, timer.fields["reason"] = "skip", "headers"
+                    return None
+                if _too_large(res):
+                    timer.outcome, timer.fields["reason"] = "fail", "too_large"
+                    return None
+                chunks, size = [], 0
+                for chunk in res.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > url_cache.MAX_IMAGE_BYTES:  # 没给 Content-Length 的大文件，超了就断开
+                        timer.outcome, timer.fields["reason"] = "fail", "too_large"
+                        return None
+                    chunks.append(chunk)
+                content = b"".join(chunks)
+                timer.fields["bytes"] = len(content)
+                url_cache.get_cache().record(url, hashlib.md5(content).hexdigest(), len(content),
+                                             res.headers.get("ETag"), res.headers.get("Last-Modified"))
+                return content
+        except Exception as e:
+            timer.outcome, timer.fields["reason"] = "fail", type(e).__name__
+            rate_limiter.backoff(url, type(e).__name__)
+            return None
+
+
+# --- 5. 流式下载到文件 (先写临时文件，成功后再替换，避免半截文件) ---
+def download_to_file(url, save_path, timeout=DEFAULT_TIMEOUT, known=None):
+    """
+    下载 url 到 save_path，成功返回 True；known 同 fetch_bytes，认出是已知的图时不下载、返回 False。
+    和 fetch_bytes 一样不抛异常：网络出错、写盘失败都返回 False (半截的临时文件会删掉，metrics 记为 fail)
+    """
+    if not url:
+        return False
+    if url.startswith("data:image"):
+        content = fetch_bytes(url)
+        if not content:
+            return False
+        try:
+            with open(save_path, "wb") as f:
+                f.write(content)
+        except OSError:
+            metrics.record("download", "fail", reason="write")
+            return False
+        return True
+    if not url.startswith("http"):
+        return False
+
+    entry, headers = _conditional_headers(url, known)
+    if headers is None:
+        metrics.record("download", "skip", reason="url_cache")
+        return False
+
+    tmp_path = save_path + ".part"
+    rate_limiter.wait(url)
+    with _host_slot(url), metrics.timed("download") as timer:
+        try:
+            with get_session().get(url, timeout=timeout, stream=True, headers=headers) as res:
+                rate_limiter.report_status(url, res.status_code)
+                if res.status_code == 304 and entry:
+                    url_cache.get_cache().touch(url)
+                    timer.outcome, timer.fields["reason"] = "skip", "not_modified"
+                    return False
+                if res.status_code != 200:
+                    timer.outcome = "fail"
+                    return False
+                if known and _known_from_headers(url, res, entry, known):
+                    timer.outcome, timer.fields["reason"] = "skip", "headers"
+                    return False
+                if _too_large(res):
+                    timer.outcome, timer.fields["reason"] = "fail", "too_large"
+                    return False
+                digest, size = hashlib.md5(), 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in res.iter_content(CHUNK_SIZE):
+                        if chunk:
+                            size += len(chunk)
+                            if size > url_cache.MAX_IMAGE_BYTES:
+                                break
+                            digest.update(chunk)
+                            f.write(chunk)
+            if size > url_cache.MAX_IMAGE_BYTES:
+                os.remove(tmp_path)
+                timer.outcome, timer.fields["reason"] = "fail", "too_large"
+                return False
+            timer.fields["bytes"] = size
+            os.replace(tmp_path, save_path)
+            url_cache.get_cache().record(url, digest.hexdigest(), size, res.headers.get("ETag"),
+                                         res.headers.get("Last-Modified"))
+            return True
+        except Exception as e:
+            timer.outcome, timer.fields["reason"] = "fail", type(e).__name__
+            rate_limiter.backoff(url, type(e).__name__)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+# --- 6. 并发批量下载 (按输入顺序产出结果，调用方 break 后剩余任务自动取消) ---
+def fetch_iter(urls, timeout=DEFAULT_TIMEOUT, max_workers=MAX_WORKERS, known=None):
+    """
+    逐个产出 (url, content)，content 失败 (或按 known 认出是已知的图) 时为 None。
+    最多提前下载 max_workers 张，消费者拿够了直接 break 即可。
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        todo = iter(urls)
+        try:
+            for url in todo:
+                pending.append((url, pool.submit(fetch_bytes, url, timeout, known)))
+                if len(pending) >= max_workers:
+                    break
+            while pending:
+                url, future = pending.popleft()
+                next_url = next(todo, None)
+                if next_url is not None:
+                    pending.append((next_url, pool.submit(fetch_bytes, next_url, timeout, known)))
+                yield url, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
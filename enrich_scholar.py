@@ -0,0 +1,155 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from catalog import Catalog, SOURCES
+from crawl_queue import CrawlQueue, make_owner
+from static_fetch import SCHOLAR_BOILERPLATE, fetch_scholar_detail
+
+# --- 🛠️ 配置区 ---
+SOURCE = 'scholar'  # 总账本里的学术数据，补完再导出 literature_scholar.csv
+QUEUE_NAME = 'scholar_detail'  # 在 crawl_queue.db 里的采集器名：(编号, 0) 一篇论文一个任务
+WORKERS = 4  # 同时取几个详情页 (共用一个 HTTP 会话复用连接，总速率还是由 rate_limiter 按域名管着)
+MAX_AUTHORS = 3  # 作者太多只留前几个，后面加“等”
+# collect_scholar 从搜索结果卡片里没读到时填的占位值，有这些的行才需要补
+PLACEHOLDER_CONTENT = "暂无摘要预览..."
+PLACEHOLDER_AUTHOR = "学术研究组"
+PLACEHOLDER_ERA = "现代"
+HEADER = SOURCES[SOURCE]['header']
+
+
+def missing_fields(row):
+    """这一行还缺哪些字段 (摘要 / 作者 / 年份)；都齐了返回空列表"""
+    record = dict(zip(HEADER, row))
+    missing = []
+    # 以前把详情页的站点介绍当成了摘要，这种也要重新补
+    if (not record['content'].strip() or record['content'] == PLACEHOLDER_CONTENT
+            or record['content'].startswith(SCHOLAR_BOILERPLATE)):
+        missing.append('content')
+    if not record['author'].strip() or record['author'] == PLACEHOLDER_AUTHOR:
+        missing.append('author')
+    if not record['era'].strip() or record['era'] == PLACEHOLDER_ERA:
+        missing.append('era')
+    return missing
+
+
+def merge_detail(row, detail):
+    """把详情页的信息填进缺的字段 (已经有的不覆盖)；返回新行，什么都没补上返回 None"""
+    record = dict(zip(HEADER, row))
+    missing = missing_fields(row)
+    changed = False
+    if 'content' in missing and detail['abstract']:
+        record['content'] = detail['abstract']
+        changed = True
+    if 'author' in missing and detail['authors']:
+        authors = detail['authors']
+        record['author'] = "、".join(authors[:MAX_AUTHORS]) + ("等" if len(authors) > MAX_AUTHORS else "")
+        changed = True
+    if 'era' in missing and (detail['year'] or detail['venue']):
+        # 网页把 era 显示成 [2015年《中国史研究》]，没有单独的期刊列，出处一起放这里
+        year = f"{detail['year']}年" if detail['year'] else ""
+        venue = f"《{detail['venue']}》" if detail['venue'] else ""
+        record['era'] = year + venue
+        changed = True
+    return [record[col] for col in HEADER] if changed else None
+
+
+def register_tasks(tasks, todo):
+    """
+    还缺字段的行登记成任务；以前交过差的也改回待抓 (比如以前把站点介绍当成了摘要，
+    现在 missing_fields 认出来了，不改回来的话队列里还是 done，永远不会重取)
+    """
+    items = [(row_id, 0) for row_id in todo]
+    tasks.enqueue(QUEUE_NAME, items)
+    return tasks.reopen(QUEUE_NAME, items)
+
+
+# --- 👷 工人线程：从任务队列里领论文编号，静态取详情页 (不开浏览器) ---
+def enrich_worker(worker_id, links, results):
+    tasks = CrawlQueue()  # sqlite 连接不能跨线程，每个工人自己开一个
+    owner = make_owner(worker_id)
+    try:
+        while True:
+            task = tasks.lease(QUEUE_NAME, owner)
+            if task is None:
+                return
+            row_id = task[0]
+            link = links.get(row_id)
+            try:
+                detail = fetch_scholar_detail(link) if link else None
+                results.put((row_id, detail, None))
+            except Exception as e:
+                results.put((row_id, None, e))
+    finally:
+        tasks.close()
+
+
+def main():
+    # 1. 找出还缺摘要/作者/年份的行 (已经齐的直接跳过，不发请求)
+    catalog = Catalog()
+    rows = {row[0]: row for row in catalog.rows(SOURCE)}
+    todo = {row_id: row for row_id, row in rows.items() if missing_fields(row) and row[HEADER.index('source')]}
+    print(f"🎓 学术数据共 {len(rows)} 条，需要补全 {len(todo)} 条")
+
+    # 2. 登记到任务队列 (中断后从断点继续)
+    tasks = CrawlQueue()
+    register_tasks(tasks, todo)
+    print(f"📋 任务状态: {tasks.stats(QUEUE_NAME)}")
+    if not tasks.has_open_tasks(QUEUE_NAME):
+        print(f"✅ 没有要补的了 (重新补全请运行: python crawl_queue.py reset {QUEUE_NAME})")
+        tasks.close()
+        catalog.close()
+        return
+
+    # 3. 工人并行取详情页，主线程负责写总账本并交差
+    links = {row_id: row[HEADER.index('source')] for row_id, row in todo.items()}
+    results = queue.Queue()
+    enriched = 0
+    print(f"\n🚀 开始补全: {WORKERS} 个线程并行取详情页\n")
+    try:
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [pool.submit(enrich_worker, worker_id, links, results) for worker_id in range(WORKERS)]
+
+            while True:
+                try:
+                    row_id, detail, error = results.get(timeout=1)
+                except queue.Empty:
+                    if all(future.done() for future in futures) and results.empty():
+                        break
+                    continue
+                if error or detail is None:
+                    reason = error or "详情页取不到或遇到验证码"
+                    print(f"      ⚠️ [{row_id}] {reason}，稍后重试")
+                    metrics.record("paper_detail", "fail")
+                    tasks.fail(QUEUE_NAME, row_id, 0, reason)
+                    continue
+
+                row = rows.get(row_id)
+                new_row = merge_detail(row, detail) if row else None
+                if new_row is None:
+                    # 页面正常但也没有我们缺的信息，重取也一样，直接交差
+                    print(f"      ➖ [{row_id}] 详情页没有更多信息")
+                    metrics.record("paper_detail", "skip")
+                else:
+                    catalog.upsert(SOURCE, new_row)
+                    enriched += 1
+                    print(f"      ✅ [{row_id}] {new_row[1][:20]}... 作者: {new_row[2]} {new_row[3]}")
+                    metrics.record("paper_detail", "success")
+                tasks.complete(QUEUE_NAME, row_id, 0)
+    finally:
+        # 4. 不管中途是否出错，已经补好的都导出给网页
+        if enriched:
+            catalog.export_csv(SOURCE)
+        print(f"\n📋 任务状态: {tasks.stats(QUEUE_NAME)}")
+        tasks.close()
+        catalog.close()
+
+    print(f"🎉 补全完成！更新了 {enriched} 条，已导出 literature_scholar.csv")
+
+
+if __name__ == '__main__':
+    metrics.start_run('enrich_scholar')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
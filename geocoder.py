@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+import unicodedata
+
+import metrics
+from downloader import get_session
+
+# --- 🛠️ 配置区 ---
+# 地理编码接口，可用环境变量换成本地替身 (例如 http://127.0.0.1:8080/search) 做测试
+GEOCODE_URL = os.environ.get("GEOCODE_URL", "https://nominatim.openstreetmap.org/search")
+CACHE_FILE = 'geocode_cache.json'
+REQUESTS_PER_SECOND = 1.0  # Nominatim 官方要求每秒不超过 1 次
+HIT_TTL = 90 * 24 * 3600  # 查到的坐标缓存 90 天
+MISS_TTL = 24 * 3600  # 查不到的地名缓存 1 天，避免反复白查
+HEADERS = {'User-Agent': 'Lizhidao_Project_Student_Demo'}
+
+_cache = None
+_cache_lock = threading.Lock()
+_rate_lock = threading.Lock()
+_last_request = 0.0
+
+
+def normalize_place(name):
+    """缓存键：全角转半角、去首尾空白、合并中间空白、小写"""
+    name = unicodedata.normalize("NFKC", str(name)).strip().lower()
+    return " ".join(name.split())
+
+
+# --- 1. 缓存读写 ---
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                    _cache = json.load(f)
+            except Exception:
+                print(f"⚠️ 坐标缓存 {CACHE_FILE} 损坏，重新建立")
+    return _cache
+
+
+def save_cache():
+    with _cache_lock:
+        cache = _load_cache()
+        tmp_path = CACHE_FILE + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, CACHE_FILE)
+
+
+def lookup_cached(place_name):
+    """
+    命中且未过期返回 (lat, lng) 或 None (已知查不到)；
+    未命中/已过期返回 False，表示需要联网查询
+    """
+    with _cache_lock:
+        entry = _load_cache().get(normalize_place(place_name))
+    if not entry:
+        return False
+    ttl = HIT_TTL if entry.get("lat") is not None else MISS_TTL
+    if time.time() - entry.get("ts", 0) > ttl:
+        return False
+    if entry.get("lat") is None:
+        return None
+    return entry["lat"], entry["lng"]
+
+
+# --- 2. 限速 (全局每秒请求数预算) ---
+def _wait_for_slot():
+    global _last_request
+    with _rate_lock:
+        gap = 1.0 / REQUESTS_PER_SECOND
+        wait = _last_request + gap - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.time()
+
+
+# --- 3. 联网查询单个地名 ---
+def _query(place_name):
+    """
+    查到返回 (lat, lng)，确认查不到返回 None；
+    网络/接口出错直接抛异常 (不写入缓存，下次还会重试)
+    """
+    _wait_for_slot()
+    params = {'q': place_name, 'format': 'json', 'limit': 1, 'accept-language': 'zh-CN'}
+    with metrics.timed("geocode") as timer:
+        res = get_session().get(GEOCODE_URL, params=params, headers=HEADERS, timeout=5)
+        res.raise_for_status()
+        data = res.json()
+        if data:
+            return data[0]['lat'], data[0]['lon']
+        timer.outcome = "skip"  # 接口正常，但查不到这个地名
+    return None
+
+
+def geocode(place_name):
+    """带缓存的地理编码：返回 (lat, lng)；查不到或出错返回 None"""
+    cached = lookup_cached(place_name)
+    if cached is not False:
+        metrics.record("geocode_cache", "hit")
+        return cached
+    metrics.record("geocode_cache", "miss")
+    try:
+        result = _query(place_name)
+    except Exception as e:
+        print(f"    ⚠️ 坐标查询失败 [{place_name}]: {e}")
+        return None
+
+    entry = {"ts": time.time(), "lat": None, "lng": None}
+    if result:
+        entry["lat"], entry["lng"] = result
+    with _cache_lock:
+        _load_cache()[normalize_place(place_name)] = entry
+    return result
+
+
+# --- 4. 批量预解析 (在下载图片之前把所有没缓存的地名一次查完) ---
+def resolve_all(place_names):
+    """返回 {地名: (lat, lng) 或 None}，只对缓存未命中的地名联网"""
+    results = {}
+    todo = []
+    seen = set()
+    for name in place_names:
+        key = normalize_place(name)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        cached = lookup_cached(name)
+        if cached is False:
+            todo.append(name)
+        else:
+            results[name] = cached
+
+    if todo:
+        print(f"🌐 需要联网查询坐标: {len(todo)} 个 (缓存命中 {len(results)} 个)")
+        for i, name in enumerate(todo, 1):
+            results[name] = geocode(name)
+            print(f"   📍 [{i}/{len(todo)}] {name} -> {results[name] or '未找到'}")
+        save_cache()
+    else:
+        print(f"🌐 坐标全部命中缓存 ({len(results)} 个)，无需联网")
+    return results
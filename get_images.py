@@ -1,45 +1,37 @@
 import csv
 import os
-import time
-import random
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import queue
+import shutil
+import hashlib
+import threading
+
+import browser
+import metrics
+import rate_limiter
+import url_cache
+from downloader import download_to_file
+from static_fetch import find_bing_images
 
 # --- 配置区 ---
 IMAGE_DIR = 'images'  # 图片保存文件夹
 CSV_FILE = 'data.csv'  # 数据源文件
 BROWSER_HEADLESS = False  # 设置为 False 可以看到浏览器自动运行的过程，设置为 True 则后台静默运行
+DOWNLOAD_WORKERS = 4  # 后台下载线程数
+QUEUE_SIZE = 8  # 找到链接、等待下载的任务最多排多少个
+CANDIDATES = 3  # 每个地名留几个候选链接，第一张下载失败就换下一张
+IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"BM")  # JPEG / PNG / GIF / BMP 文件头
 
 
 def setup_driver():
-    """初始化浏览器驱动"""
-    chrome_options = Options()
-    if BROWSER_HEADLESS:
-        chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    # 伪装 User-Agent
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
-
-    # 自动下载并安装适配的 ChromeDriver
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
-
-
-def download_image(url, save_path):
-    """下载图片并保存"""
+    """初始化浏览器驱动 (共用浏览器工厂：驱动路径有缓存，拦截字体/样式/统计脚本)"""
+    return browser.get_driver('get_images', headless=BROWSER_HEADLESS)
+
+
+def download_image(url, save_path, known=None):
+    """下载图片并保存 (共享连接池，流式写盘)；known(md5) 认出是已有的图就不下载"""
     try:
         # 设置超时时间，防止卡死
-        response = requests.get(url, timeout=15)
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
+        if download_to_file(url, save_path, timeout=15, known=known):
             print(f"    └─ 成功保存: {os.path.basename(save_path)}")
             return True
     except Exception as e:
@@ -47,6 +39,98 @@ def download_image(url, save_path):
     return False
 
 
+def looks_like_image(path):
+    """看文件头判断是不是图片 (有时候下回来的是 HTML 错误页)"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    return head.startswith(IMAGE_MAGIC) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
+
+# --- 1. 找图 (生产者，跑在浏览器所在的主线程) ---
+def find_image_urls(get_driver, keyword):
+    """返回候选图片链接 (只要 http 开头的，base64 小图太模糊)，最多 CANDIDATES 个"""
+    # 先用轻量 HTTP 直接取搜索页，拿不到再让浏览器打开
+    srcs = find_bing_images(keyword)
+    if not srcs:
+        driver = get_driver()
+        search_url = f"https://www.bing.com/images/search?q={keyword}"
+        # 按域名自适应限速，代替固定的随机等待
+        rate_limiter.wait(search_url)
+        with metrics.timed("page_load"):
+            driver.get(search_url)
+
+        # Bing 的图片缩略图通常有 class 'mimg'；一次 JS 调用把链接全部取出来
+        # (src 是空的就用 data-src，有些图是懒加载)
+        with metrics.timed("find_elements"):
+            srcs = driver.execute_script(
+                "return Array.from(document.querySelectorAll('img.mimg')).map(img => img.src || img.dataset.src);")
+        srcs = [src for src in (srcs or []) if src]
+        if srcs:
+            rate_limiter.success(search_url)
+        else:
+            rate_limiter.backoff(search_url, "没有搜索结果")
+    return [src for src in srcs if src.startswith("http")][:CANDIDATES]
+
+
+def existing_images(folder):
+    """已有图片的 MD5 -> 路径 (配合网址缓存：候选链接的内容已经是别的地点的图，就不再下载)"""
+    found = {}
+    if os.path.exists(folder):
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and looks_like_image(path):
+                with open(path, 'rb') as f:
+                    found.setdefault(hashlib.md5(f.read()).hexdigest(), path)
+    return found
+
+
+# --- 2. 下载 + 校验 (消费者，线程池) ---
+def download_worker(jobs, existing):
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        # 一个任务出了意外 (比如磁盘写不进去) 只算这张失败，线程不能死：
+        # 死光了就没人取队列，主线程往满队列里放任务 / 收工信号会一直卡住
+        try:
+            download_job(job, existing)
+        except Exception as e:
+            print(f"    ❌ [{job[0]}] 下载线程出错: {e}")
+            metrics.record("image", "fail")
+            try:
+                os.remove(job[1])  # 下了半截的文件不留
+            except OSError:
+                pass
+
+
+def download_job(job, existing):
+    """下一个地点的图：候选链接挨个试，都不行再看是不是已有的图，能复制就复制"""
+    site_name, save_path, urls = job
+    saved = False
+    for url in urls:
+        # 先试没见过的图：已经是别的地点用过的图，网址缓存 / 响应头认出来就跳过，换下一张
+        if download_image(url, save_path, known=existing.__contains__) and looks_like_image(save_path):
+            existing.setdefault(url_cache.get_cache().md5_of(url), save_path)
+            saved = True
+            break
+        if os.path.exists(save_path):
+            os.remove(save_path)  # 不是图片 (错误页之类)，删掉换下一张
+    if not saved:
+        # 候选全是已有的图：和以前一样用重复的图，但直接本地复制，不再下载
+        same = next((existing[md5] for md5 in (url_cache.get_cache().md5_of(url) for url in urls)
+                     if md5 in existing), None)
+        if same and os.path.exists(same):
+            shutil.copyfile(same, save_path)
+            print(f"    └─ 候选图都是已有的图，直接复制 {os.path.basename(same)}")
+            saved = True
+    if not saved:
+        print(f"    ❌ [{site_name}] {len(urls)} 个候选链接都没下成功")
+    metrics.record("image", "success" if saved else "fail")
+
+
 def main():
     # 1. 创建文件夹
     if not os.path.exists(IMAGE_DIR):
@@ -57,9 +141,25 @@ def main():
         print(f"❌ 错误：找不到 {CSV_FILE}，请确认文件位置。")
         return
 
-    print("🤖 正在启动浏览器机器人...")
-    driver = setup_driver()
-    driver.maximize_window()  # 最大化窗口
+    driver = None
+
+    def get_driver():
+        # 静态搜索拿不到结果时才启动浏览器
+        nonlocal driver
+        if driver is None:
+            print("🤖 正在启动浏览器机器人...")
+            driver = setup_driver()
+            driver.maximize_window()  # 最大化窗口
+        return driver
+
+    # 3. 找图和下载分成两道工序：主线程 (浏览器) 只管找链接，下载交给后台线程池，
+    #    中间用有界队列连起来，浏览器不用干等下载，下载线程也不会被塞爆
+    jobs = queue.Queue(maxsize=QUEUE_SIZE)
+    existing = existing_images(IMAGE_DIR)
+    workers = [threading.Thread(target=download_worker, args=(jobs, existing), daemon=True)
+               for _ in range(DOWNLOAD_WORKERS)]
+    for worker in workers:
+        worker.start()
 
     try:
         with open(CSV_FILE, 'r', encoding='utf-8') as f:
@@ -74,53 +174,46 @@ def main():
                 # 如果图片已存在，跳过
                 if os.path.exists(save_path):
                     print(f"⏩ [{site_name}] 图片已存在，跳过。")
+                    metrics.record("image", "skip")
                     continue
 
                 keyword = f"{site_name} 风景"
                 print(f"\n🔍 正在搜索: {keyword}")
 
                 # --- 核心采集逻辑 (使用 Bing 图片搜索，比百度更适合脚本) ---
-                search_url = f"https://www.bing.com/images/search?q={keyword}"
-                driver.get(search_url)
-
-                # 随机等待 2-4 秒，模仿人类查看网页
-                time.sleep(random.uniform(2, 4))
-
                 try:
-                    # 寻找第一张图片元素。Bing 的图片缩略图通常有 class 'mimg'
-                    # 我们尝试获取页面上第一个有效的图片标签
-                    img_elements = driver.find_elements(By.CSS_SELECTOR, "img.mimg")
-
-                    found_url = None
-                    if img_elements:
-                        # 获取第一张图的 src
-                        found_url = img_elements[0].get_attribute("src")
-
-                        # 如果 src 是空的，尝试 data-src (有些网站懒加载)
-                        if not found_url:
-                            found_url = img_elements[0].get_attribute("data-src")
-
-                    if found_url:
-                        # 过滤掉 base64 格式的小图标（太模糊），尽量找 http 开头的链接
-                        if found_url.startswith("http"):
-                            print(f"    ├─ 找到图片链接...")
-                            download_image(found_url, save_path)
-                        else:
-                            print(f"    ├─ ⚠️ 警告: 找到的图片格式不支持下载 (Base64)，尝试下一张...")
-                            # 这里可以写更复杂的逻辑去处理 Base64，但对于初学者，跳过即可
-                    else:
-                        print(f"    ├─ ❌ 未找到相关图片元素")
-
+                    urls = find_image_urls(get_driver, keyword)
                 except Exception as e:
                     print(f"    ├─ ❌ 页面解析出错: {e}")
+                    metrics.record("image", "fail")
+                    continue
 
-                # 采集完一个，休息一下，做个有礼貌的爬虫
-                time.sleep(random.uniform(1, 2))
+                if urls:
+                    print(f"    ├─ 找到 {len(urls)} 个图片链接，交给下载线程...")
+                    jobs.put((site_name, save_path, urls))  # 队列满了会在这里等，下载跟不上时自动放慢
+                else:
+                    print(f"    ├─ ❌ 未找到可下载的图片 (没有结果或只有 Base64 小图)")
+                    metrics.record("image", "fail")
 
     finally:
+        # 通知下载线程收工，等队列里剩下的下完 (放收工信号带超时：下载线程万一都没了，不在满队列上死等)
+        for _ in workers:
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    jobs.put(None, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+        for worker in workers:
+            worker.join()
         print("\n🏁 任务结束，正在关闭浏览器...")
-        driver.quit()
+        if driver is not None:
+            browser.quit_driver('get_images')
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metrics.start_run('get_images')
+    try:
+        main()
+    finally:
+        metrics.finish_run()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import io
+import json
+import hashlib
+
+try:
+    from PIL import Image
+except ImportError:  # 没装 Pillow 时只做 MD5 精确查重
+    Image = None
+
+# --- 🛠️ 配置区 ---
+INDEX_FILE = 'image_hashes.json'  # 哈希索引落盘位置
+PHASH_MAX_DISTANCE = 4  # 感知哈希汉明距离 <= 这个值就当成同一张图 (重新压缩/缩放过的)
+PHASH_BANDS = 8  # 64位哈希切成8段，距离<=7的两张图至少有一段完全相同
+
+
+def md5_hex(content):
+    return hashlib.md5(content).hexdigest()
+
+
+def dhash_hex(content):
+    """差值哈希 (dHash)：缩成 9x8 灰度图，比较相邻像素明暗，得到 64 位指纹"""
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(content)).convert("L").resize((9, 8))
+    except Exception:
+        return None
+    pixels = list(img.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def _bands(phash):
+    step = 16 // PHASH_BANDS
+    return [(i, phash[i * step:(i + 1) * step]) for i in range(PHASH_BANDS)]
+
+
+def _distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class ImageHashIndex:
+    """
+    images_history 的持久化哈希索引：
+    - 按 (mtime, size) 增量更新，没变的文件不重新计算
+    - MD5 精确查重 O(1)
+    - dHash 分段分桶，近似查重只比较同桶的少量候选
+    """
+
+    def __init__(self, image_dir, index_file=INDEX_FILE):
+        self.image_dir = image_dir
+        self.index_file = index_file
+        self.entries = {}  # 文件名 -> {mtime, size, md5, phash}
+        self.by_md5 = {}
+        self.by_band = {}
+        self.dirty = False
+
+    # --- 1. 读盘 + 增量刷新 ---
+    def load(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("files", {})
+            except Exception:
+                print(f"⚠️ 哈希索引 {self.index_file} 损坏，重新建立")
+                self.entries = {}
+
+        on_disk = set()
+        rehashed = 0
+        if os.path.exists(self.image_dir):
+            for name in os.listdir(self.image_dir):
+                path = os.path.join(self.image_dir, name)
+                if not os.path.isfile(path) or name.startswith("."):
+                    continue
+                on_disk.add(name)
+                stat = os.stat(path)
+                old = self.entries.get(name)
+                if old and old.get("mtime") == stat.st_mtime and old.get("size") == stat.st_size:
+                    continue
+                with open(path, "rb") as f:
+                    content = f.read()
+                self.entries[name] = self._make_entry(content, stat.st_mtime, stat.st_size)
+                rehashed += 1
+
+        removed = [name for name in self.entries if name not in on_disk]
+        for name in removed:
+            del self.entries[name]
+
+        self.dirty = bool(rehashed or removed)
+        self._rebuild_lookup()
+        print(f"🗂️ 哈希索引就绪: {len(self.entries)} 张 (本次新算 {rehashed} 张)")
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.index_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_file)
+        self.dirty = False
+
+    # --- 2. 查重 ---
+    def find_duplicate(self, content):
+        """返回重复的已有文件名；没有重复返回 None"""
+        name = self.by_md5.get(md5_hex(content))
+        if name:
+            return name
+        phash = dhash_hex(content)
+        if phash is None:
+            return None
+        for band in _bands(phash):
+            for candidate in self.by_band.get(band, ()):
+                other = self.entries[candidate].get("phash")
+                if other and _distance(phash, other) <= PHASH_MAX_DISTANCE:
+                    return candidate
+        return None
+
+    def has_md5(self, md5):
+        """这个内容 (按 MD5) 是不是已经在图库里了；给下载器的网址缓存用，不用下载就能判重"""
+        return md5 in self.by_md5
+
+    # --- 3. 新增 ---
+    def add(self, name, content):
+        path = os.path.join(self.image_dir, name)
+        stat = os.stat(path)
+        replaced = name in self.entries
+        self.entries[name] = self._make_entry(content, stat.st_mtime, stat.st_size)
+        if replaced:
+            self._rebuild_lookup()
+        else:
+            self._index_entry(name)
+        self.dirty = True
+
+    # --- 内部工具 ---
+    def _make_entry(self, content, mtime, size):
+        return {"mtime": mtime, "size": size, "md5": md5_hex(content), "phash": dhash_hex(content)}
+
+    def _rebuild_lookup(self):
+        self.by_md5 = {}
+        self.by_band = {}
+        for name in self.entries:
+            self._index_entry(name)
+
+    def _index_entry(self, name):
+        entry = self.entries[name]
+        self.by_md5.setdefault(entry["md5"], name)
+        if entry.get("phash"):
+            for band in _bands(entry["phash"]):
+                self.by_band.setdefault(band, []).append(name)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import random
+import itertools
+
+# --- 🛠️ 配置区 ---
+STATS_FILE = 'keyword_stats.json'  # 每个搜索组合的历史产出，跨运行累积
+# 先验：还没数据的组合/主体/风格，当成 “PRIOR_SECONDS 秒出 PRIOR_IMAGES 张新图” (约每分钟 6 张)
+PRIOR_IMAGES = 1.0
+PRIOR_SECONDS = 10.0
+FACTOR_NAMES = ('subject', 'style', 'era')
+EXHAUSTED_DAYS = 30  # 挖空的组合过这么多天再放回来试 (必应的结果会更新)
+
+
+def stats_key(keyword):
+    """keyword_stats.json 里每条臂的键：查询词排序后拼起来 (和关键词里词的先后顺序无关)"""
+    return " ".join(sorted(keyword.split()))
+
+
+def _sample_rate(new, seconds):
+    """新图产出率 (张/秒) 的 Gamma 后验 (泊松过程)，采一个样"""
+    return random.gammavariate(PRIOR_IMAGES + new, 1 / (PRIOR_SECONDS + seconds))
+
+
+def _rate(new, seconds):
+    return (PRIOR_IMAGES + new) / (PRIOR_SECONDS + seconds)
+
+
+class KeywordScheduler:
+    """
+    关键词矩阵调度 (多臂老虎机)：目标是每分钟多出新图，而不是每分钟多发查询。
+    - 每个 主体 × 风格 × 朝代 组合是一条臂，记录它出了几张新图、几张重复、花了多少秒
+    - 跑过后候选图都看过了 (存下或查重跳过，没有下载失败的) 的组合标记为“挖空了”，
+      EXHAUSTED_DAYS 天内不再跑
+    - 没跑过的组合，用它的主体、风格、朝代各自的历史产出率估计 (Thompson 采样)，
+      产出高的方向多跑，没怎么试过的方向也有机会被抽中
+    """
+
+    def __init__(self, subjects, styles, eras, stats_file=STATS_FILE):
+        self.stats_file = stats_file
+        self.keywords = {}  # 统计键 -> 关键词
+        self.factors = {}  # 统计键 -> [主体, 风格, 朝代]
+        for subject, style, era in itertools.product(subjects, styles, eras):
+            keyword = " ".join(word for word in (era, subject, style) if word)
+            key = stats_key(keyword)
+            self.keywords[key] = keyword
+            self.factors[key] = [subject, style, era]
+        self.arms = {}  # 统计键 -> {keyword, factors, pulls, new, duplicates, seconds, exhausted}
+        self.factor_stats = {}  # ("subject", "荔枝道") -> {"new": 张数, "seconds": 秒数}
+        self.tried = set()  # 这次运行已经搜过的 (同一个词再搜一遍还是同一页结果)
+        self.load()
+
+    # --- 1. 统计落盘 ---
+    def load(self):
+        if not os.path.exists(self.stats_file):
+            return self
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                self.arms = json.load(f).get("arms", {})
+        except (OSError, ValueError):
+            print(f"⚠️ {self.stats_file} 读不了，从头统计")
+            self.arms = {}
+        for arm in self.arms.values():
+            self._add_to_factors(arm["factors"], arm["new"], arm["seconds"])
+        exhausted = sum(1 for key in self.keywords if self._exhausted(key))
+        print(f"🎯 关键词调度: {len(self.keywords)} 个组合，已挖空 {exhausted} 个")
+        return self
+
+    def save(self):
+        tmp_path = self.stats_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "arms": self.arms}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.stats_file)
+
+    def _add_to_factors(self, factors, new, seconds):
+        for name, value in zip(FACTOR_NAMES, factors):
+            stats = self.factor_stats.setdefault((name, value), {"new": 0, "seconds": 0.0})
+            stats["new"] += new
+            stats["seconds"] += seconds
+
+    # --- 2. 选下一个关键词 ---
+    def _exhausted(self, key):
+        """挖空了、而且还没过 EXHAUSTED_DAYS 天"""
+        arm = self.arms.get(key)
+        if not arm or not arm.get("exhausted"):
+            return False
+        return time.time() - arm.get("last_run", 0) < EXHAUSTED_DAYS * 86400
+
+    def _sample(self, key):
+        arm = self.arms.get(key)
+        if arm and arm["pulls"]:
+            return _sample_rate(arm["new"], arm["seconds"])
+        samples = []
+        for name, value in zip(FACTOR_NAMES, self.factors[key]):
+            stats = self.factor_stats.get((name, value), {"new": 0, "seconds": 0.0})
+            samples.append(_sample_rate(stats["new"], stats["seconds"]))
+        return sum(samples) / len(samples)
+
+    def next(self):
+        """返回下一个最值得搜的关键词；全部挖空或本次都搜过了返回 None"""
+        best, best_score = None, -1.0
+        for key in self.keywords:
+            if key in self.tried or self._exhausted(key):
+                continue
+            score = self._sample(key)
+            if score > best_score:
+                best, best_score = key, score
+        if best is None:
+            return None
+        self.tried.add(best)
+        return self.keywords[best]
+
+    # --- 3. 回报结果 ---
+    def update(self, keyword, new, duplicates, seconds, exhausted, failed=0):
+        """
+        new: 新保存几张；duplicates: 查重跳过几张；seconds: 这次搜索 + 下载总耗时
+        exhausted: 候选图都过了一遍 (没因为达到每词上限提前停)
+        failed: 下载失败几张；有失败的说明还有候选图没看到内容，不算挖空
+        """
+        key = stats_key(keyword)
+        arm = self.arms.setdefault(key, {
+            "keyword": keyword, "factors": self.factors.get(key, ["", "", ""]),
+            "pulls": 0, "new": 0, "duplicates": 0, "failed": 0, "seconds": 0.0, "exhausted": False,
+        })
+        arm["pulls"] += 1
+        arm["new"] += new
+        arm["duplicates"] += duplicates
+        arm["failed"] = arm.get("failed", 0) + failed
+        arm["seconds"] = round(arm["seconds"] + seconds, 3)
+        # 只有真的看过候选图 (存下或查重跳过) 才能说挖空了；下载全失败的一张都没看到，下次还要再试
+        arm["exhausted"] = exhausted and failed == 0 and new + duplicates > 0
+        arm["last_run"] = round(time.time())
+        self._add_to_factors(arm["factors"], new, seconds)
+
+    # --- 4. 汇总 ---
+    def print_summary(self, top=5):
+        print("\n📈 各方向的新图产出 (张/分钟，含先验):")
+        for name, label in zip(FACTOR_NAMES, ("主体", "风格", "朝代")):
+            ranked = sorted(((value, stats) for (n, value), stats in self.factor_stats.items() if n == name),
+                            key=lambda item: _rate(item[1]["new"], item[1]["seconds"]), reverse=True)
+            text = "，".join(f"{value or '(不加)'} {_rate(s['new'], s['seconds']) * 60:.1f}" for value, s in ranked[:top])
+            print(f"   {label}: {text or '暂无数据'}")
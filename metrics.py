@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+
+# --- 🛠️ 配置区 ---
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")  # 事件流和 Prometheus 汇总都写在这里
+EVENTS_FILE = 'events.jsonl'
+
+_lock = threading.Lock()
+_run = {"collector": None, "run_id": None, "started": time.time(), "file": None}
+_samples = {}  # 阶段 -> [耗时秒数, ...]
+_counts = {}  # (阶段, 结果) -> 次数
+
+
+# --- 1. 开始 / 结束一次采集 ---
+def start_run(collector):
+    """每个采集脚本 main() 开头调一次；之后的事件会写进 metrics/events.jsonl"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+        _run.update({
+            "collector": collector,
+            "run_id": uuid.uuid4().hex[:12],
+            "started": time.time(),
+            "file": open(os.path.join(METRICS_DIR, EVENTS_FILE), 'a', encoding='utf-8'),
+        })
+    _emit({"event": "run_start"})
+
+
+def finish_run():
+    """main() 结束时调用：写 Prometheus textfile 汇总并打印各阶段耗时"""
+    if _run["collector"] is None:
+        return
+    duration = time.time() - _run["started"]
+    _emit({"event": "run_end", "seconds": round(duration, 3)})
+    write_prometheus(duration)
+    print_summary(duration)
+    with _lock:
+        if _run["file"]:
+            _run["file"].close()
+        _run.update({"collector": None, "file": None})
+
+
+# --- 2. 记录 ---
+def record(stage, outcome="success", seconds=None, **fields):
+    """记一次事件：outcome 为 success / skip / fail，seconds 为耗时 (可选)"""
+    with _lock:
+        _counts[(stage, outcome)] = _counts.get((stage, outcome), 0) + 1
+        if seconds is not None:
+            _samples.setdefault(stage, []).append(seconds)
+    event = {"event": "stage", "stage": stage, "outcome": outcome}
+    if seconds is not None:
+        event["seconds"] = round(seconds, 4)
+    event.update(fields)
+    _emit(event)
+
+
+class _Timer:
+    def __init__(self):
+        self.outcome = "success"
+        self.fields = {}
+
+
+@contextmanager
+def timed(stage, **fields):
+    """
+    计时一个阶段：
+        with metrics.timed("page_load") as t:
+            driver.get(url)
+            if not ok: t.outcome = "skip"
+    代码块抛异常时记为 fail (异常照常往外抛)
+    """
+    timer = _Timer()
+    timer.fields.update(fields)
+    start = time.perf_counter()
+    try:
+        yield timer
+    except BaseException:
+        timer.outcome = "fail"
+        raise
+    finally:
+        record(stage, timer.outcome, time.perf_counter() - start, **timer.fields)
+
+
+def _emit(event):
+    handle = _run["file"]
+    if handle is None:
+        return
+    event = dict(event, ts=round(time.time(), 3), collector=_run["collector"], run=_run["run_id"])
+    line = json.dumps(event, ensure_ascii=False)
+    with _lock:
+        handle.write(line + "\n")
+        handle.flush()
+
+
+# --- 3. 汇总 ---
+def quantile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def write_prometheus(duration):
+    """node_exporter textfile 格式，先写临时文件再改名，避免被读到半截"""
+    collector = _run["collector"]
+    label = f'collector="{collector}"'
+    lines = [
+        "# HELP lychee_stage_seconds Stage latency of the last run.",
+        "# TYPE lychee_stage_seconds summary",
+    ]
+    with _lock:
+        samples = {k: list(v) for k, v in _samples.items()}
+        counts = dict(_counts)
+    for stage, values in sorted(samples.items()):
+        stage_label = f'{label},stage="{stage}"'
+        for q in (0.5, 0.95):
+            lines.append(f'lychee_stage_seconds{{{stage_label},quantile="{q}"}} {quantile(values, q):.6f}')
+        lines.append(f'lychee_stage_seconds_sum{{{stage_label}}} {sum(values):.6f}')
+        lines.append(f'lychee_stage_seconds_count{{{stage_label}}} {len(values)}')
+
+    lines += ["# HELP lychee_stage_events_total Stage events by outcome in the last run.",
+              "# TYPE lychee_stage_events_total gauge"]
+    for (stage, outcome), n in sorted(counts.items()):
+        lines.append(f'lychee_stage_events_total{{{label},stage="{stage}",outcome="{outcome}"}} {n}')
+
+    lines += ["# HELP lychee_stage_throughput Successful events per second of run time.",
+              "# TYPE lychee_stage_throughput gauge"]
+    for (stage, outcome), n in sorted(counts.items()):
+        if outcome == "success" and duration > 0:
+            lines.append(f'lychee_stage_throughput{{{label},stage="{stage}"}} {n / duration:.4f}')
+
+    lines += ["# HELP lychee_run_duration_seconds Wall time of the last run.",
+              "# TYPE lychee_run_duration_seconds gauge",
+              f'lychee_run_duration_seconds{{{label}}} {duration:.3f}',
+              "# HELP lychee_run_finished_timestamp_seconds When the last run finished.",
+              "# TYPE lychee_run_finished_timestamp_seconds gauge",
+              f'lychee_run_finished_timestamp_seconds{{{label}}} {time.time():.0f}']
+
+    path = os.path.join(METRICS_DIR, f"{collector}.prom")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def print_summary(duration):
+    with _lock:
+        samples = {k: list(v) for k, v in _samples.items()}
+        counts = dict(_counts)
+    stages = sorted({stage for stage, _ in counts} | set(samples))
+    print(f"\n📈 [{_run['collector']}] 本次运行 {duration:.1f} 秒，各阶段统计:")
+    for stage in stages:
+        values = samples.get(stage, [])
+        outcome_text = " ".join(f"{o}={n}" for (s, o), n in sorted(counts.items()) if s == stage)
+        timing = f"合计 {sum(values):.1f}s p50 {quantile(values, 0.5):.2f}s p95 {quantile(values, 0.95):.2f}s" if values else ""
+        print(f"   {stage:<16}{outcome_text:<32}{timing}")
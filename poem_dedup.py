@@ -0,0 +1,170 @@
+import os
+import re
+import csv
+import sys
+import hashlib
+
+# --- 🛠️ 配置区 ---
+POEMS_FILE = 'literature_poems.csv'
+SHINGLE_SIZE = 3  # 按 3 个字切片 (中文不分词，直接按字)
+NUM_PERM = 64  # MinHash 签名长度 (格子数，取 2 的幂)
+BANDS = 16  # LSH 分 16 段，每段 4 个值；相似度约 0.5 以上的两首诗大概率落进同一个桶
+SIMILARITY_THRESHOLD = 0.7  # 签名估算的相似度 >= 这个值就当成同一首
+SALT = b'lychee-poems'  # 哈希加盐固定下来，每次运行的签名一致
+
+_BIN_SHIFT = 64 - (NUM_PERM - 1).bit_length()  # 64 位哈希的高几位决定落在哪个格子
+_EMPTY = 1 << 64
+
+# “(不辞 一作：不妨)” 这类异文注释，还有所有标点空白，比较前都去掉
+ANNOTATION_PATTERN = re.compile(r"[（(][^（()）]*一作[^（()）]*[)）]")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize(content):
+    content = ANNOTATION_PATTERN.sub("", str(content))
+    return NON_WORD_PATTERN.sub("", content)
+
+
+def shingles(content):
+    text = normalize(content)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(content):
+    """
+    返回 NUM_PERM 个整数的签名；内容为空返回 None。
+    用“单次哈希分格”(one permutation hashing)：每个切片只算一次哈希，按高位分到 NUM_PERM 个格子里
+    各取最小值，比算 NUM_PERM 次哈希快几十倍；短诗切片少会有空格子，用右边最近的非空格子填上
+    """
+    grams = shingles(content)
+    if not grams:
+        return None
+    sig = [_EMPTY] * NUM_PERM
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode('utf-8'), digest_size=8, salt=SALT).digest(), 'big')
+        b = h >> _BIN_SHIFT
+        if h < sig[b]:
+            sig[b] = h
+    if _EMPTY in sig:
+        result = list(sig)
+        for i in range(NUM_PERM):
+            if sig[i] == _EMPTY:
+                # 向右找最近的非空格子，加上距离作区分 (两首诗切片集合相同，填出来的值也一定相同)
+                step = 1
+                while sig[(i + step) % NUM_PERM] == _EMPTY:
+                    step += 1
+                result[i] = sig[(i + step) % NUM_PERM] + step * _EMPTY
+        sig = result
+    return sig
+
+
+def similarity(sig_a, sig_b):
+    """两个签名相同位置相等的比例 ≈ 切片集合的 Jaccard 相似度"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _bands(sig):
+    rows = NUM_PERM // BANDS
+    return [(i, tuple(sig[i * rows:(i + 1) * rows])) for i in range(BANDS)]
+
+
+class PoemDedupIndex:
+    """
+    诗词正文的近似查重索引 (MinHash + LSH)：
+    - 查重只和同桶的少量候选比较，不用和全部已有诗词逐一比
+    - 抓取时在线过滤 (find_duplicate / add)，也能对整个 CSV 做一次批量压缩 (compact)
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.signatures = {}  # 编号 -> 签名
+        self.buckets = {}
+
+    @classmethod
+    def from_csv(cls, path=POEMS_FILE):
+        """用已有 CSV 建索引 (id 列当编号，content 列算签名)"""
+        index = cls()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    index.add(row.get('id'), row.get('content', ''))
+        print(f"🧬 诗词查重索引就绪: {len(index)} 首")
+        return index
+
+    # --- 1. 查重 ---
+    def find_duplicate(self, content, signature=None):
+        """返回最相似的已有编号；没有重复返回 None"""
+        sig = signature or minhash(content)
+        if sig is None:
+            return None
+        best, best_score = None, self.threshold
+        seen = set()
+        for band in _bands(sig):
+            for key in self.buckets.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(sig, self.signatures[key])
+                if score >= best_score:
+                    best, best_score = key, score
+        return best
+
+    # --- 2. 新增 ---
+    def add(self, key, content, signature=None):
+        sig = signature or minhash(content)
+        if sig is None or key in self.signatures:
+            return
+        self.signatures[key] = sig
+        for band in _bands(sig):
+            self.buckets.setdefault(band, []).append(key)
+
+    def add_if_new(self, key, content):
+        """不重复就加进索引并返回 None；重复返回已有编号 (不加入)"""
+        sig = minhash(content)
+        duplicate = self.find_duplicate(content, sig)
+        if duplicate is None:
+            self.add(key, content, sig)
+        return duplicate
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+# --- 3. 批量压缩：同一首诗只保留最早的一条 (改总账本，再导出 CSV) ---
+def compact(apply=False):
+    """返回 [(删掉的 id, 保留的 id, 标题)]；apply=True 时真正删除并重新导出 literature_poems.csv"""
+    from catalog import Catalog, SOURCES
+    header = SOURCES['poems']['header']
+    id_col, title_col, content_col = header.index('id'), header.index('title'), header.index('content')
+
+    catalog = Catalog()
+    index = PoemDedupIndex()
+    removed = []
+    for row in catalog.rows('poems'):
+        if len(row) <= content_col:
+            continue
+        duplicate = index.add_if_new(row[id_col], row[content_col])
+        if duplicate is not None:
+            removed.append((row[id_col], duplicate, row[title_col]))
+
+    if apply and removed:
+        catalog.delete('poems', [row_id for row_id, _, _ in removed])
+        catalog.export_csv('poems')
+    catalog.close()
+    return removed
+
+
+if __name__ == '__main__':
+    # 用法: python poem_dedup.py [--apply]   (不加 --apply 只预览不改数据)
+    apply = '--apply' in sys.argv
+    removed = compact(apply=apply)
+    for row_id, kept_id, title in removed:
+        print(f"   🔁 [{row_id}] {title} 与 [{kept_id}] 重复")
+    if not removed:
+        print("✅ 没有发现重复的诗词")
+    elif apply:
+        print(f"🧹 已删除 {len(removed)} 条重复记录，并重新导出 {POEMS_FILE}")
+    else:
+        print(f"👀 发现 {len(removed)} 条重复记录 (加 --apply 真正删除)")
@@ -0,0 +1,120 @@
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+import metrics
+
+# --- 🛠️ 限速配置区 ---
+# 每个域名: (起始速率, 最低速率, 最高速率)，单位 次/秒
+# 一切正常就慢慢提速，遇到空页/验证码/HTTP 错误立刻减半 (AIMD，和 TCP 拥塞控制一个思路)
+DOMAIN_RATES = {
+    "so.gushiwen.cn": (0.33, 0.05, 2.0),
+    "www.gushiwen.cn": (0.33, 0.05, 2.0),
+    "xueshu.baidu.com": (0.25, 0.05, 1.0),  # 学术网站比较敏感，起步和上限都压低
+    "www.bing.com": (0.5, 0.1, 4.0),
+    "open.bigmodel.cn": (1.0, 0.1, 5.0),  # AI 方案批量预生成，免费模型 429 了就退
+}
+# 图片 CDN 只是静态文件服务器，按域名后缀匹配 (tse1~tse4.mm.bing.net 各算一个域名)，
+# 速率给高，8 个下载线程不会被令牌卡住；遇到 429/5xx 一样会减半
+IMAGE_CDN_RATES = {
+    ".mm.bing.net": (32.0, 2.0, 64.0),
+    ".th.bing.com": (32.0, 2.0, 64.0),
+}
+DEFAULT_RATE = (4.0, 0.5, 20.0)  # 其他域名 (图片原站、本地测试服务器) 默认放得比较开
+INCREASE = 0.05  # 每次成功加多少 次/秒
+DECREASE = 0.5  # 每次出问题速率乘以多少
+JITTER = 0.2  # 间隔随机多等 0~20%，别像机器一样准时
+BACKOFF_STATUS = {403, 429, 500, 502, 503, 504}  # 这些状态码说明对方不高兴了
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def host_of(url):
+    return (urlparse(url).hostname or url).lower()
+
+
+# --- 1. 单个域名的令牌桶 ---
+class DomainLimiter:
+    def __init__(self, host, rate, min_rate, max_rate):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._tokens = 1.0  # 桶容量 1：不攒突发，请求之间至少隔 1/rate 秒
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """拿一个令牌，不够就睡到够为止 (多线程共用同一个域名的速率)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1  # 先预订再睡，后来的线程会排在后面
+            wait = 0.0
+            if self._tokens < 0:
+                wait = -self._tokens / self.rate * (1 + random.uniform(0, JITTER))
+        if wait > 0:
+            metrics.record("throttle_wait", seconds=wait, host=self.host)
+            time.sleep(wait)
+        return wait
+
+    def success(self):
+        """加性增：一切正常，慢慢提速"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + INCREASE)
+
+    def backoff(self, reason=""):
+        """乘性减：速率减半，并清空令牌，下一个请求至少等一个新间隔"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * DECREASE)
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        print(f"    🐢 {self.host} 降速到 {rate:.2f} 次/秒 ({reason or '异常'})")
+        metrics.record("backoff", "fail", host=self.host, reason=str(reason)[:80], rate=round(rate, 3))
+
+
+# --- 2. 按域名取限速器 (全进程共享) ---
+def rates_for(host):
+    """(起始, 最低, 最高) 速率：先查 DOMAIN_RATES，再按后缀查图片 CDN，都不是就用默认"""
+    if host in DOMAIN_RATES:
+        return DOMAIN_RATES[host]
+    for suffix, rates in IMAGE_CDN_RATES.items():
+        if host == suffix.lstrip('.') or host.endswith(suffix):
+            return rates
+    return DEFAULT_RATE
+
+
+def limiter(url):
+    host = host_of(url)
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = DomainLimiter(host, *rates_for(host))
+        return _limiters[host]
+
+
+def wait(url):
+    """请求 url 之前调用"""
+    return limiter(url).acquire()
+
+
+def success(url):
+    limiter(url).success()
+
+
+def backoff(url, reason=""):
+    limiter(url).backoff(reason)
+
+
+def report_status(url, status_code):
+    """根据 HTTP 状态码自动加速/减速"""
+    if status_code in BACKOFF_STATUS:
+        backoff(url, f"HTTP {status_code}")
+    elif status_code == 200:
+        success(url)
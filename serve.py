@@ -0,0 +1,331 @@
+import os
+import re
+import gzip
+import fnmatch
+import hashlib
+import argparse
+import mimetypes
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli  # 可选：pip install brotli，装了才提供 .br
+except ImportError:
+    brotli = None
+
+# --- 🛠️ 配置区 ---
+SITE_DIR = '.'
+CACHE_DIR = '.serve_cache'  # 预压缩的 .gz / .br 放这里，目录结构和网站一致
+HOST = '127.0.0.1'
+PORT = 8000
+COMPRESSIBLE = ('.html', '.csv', '.json', '.js', '.css', '.svg', '.txt', '.xml')  # 图片本身已压缩，不再压
+MIN_COMPRESS_SIZE = 1024  # 太小的文件压缩省不了几个字节
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# 文件名里带内容哈希 (name.<哈希>.ext，比如 corpus 分片和旁边的 .json.gz)，或者网址带着 ?v=<当前内容哈希>
+# (至少 8 位十六进制，构建脚本生成的都比这长) 的，内容永远不会变
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}(\.\w+)+$")
+VERSION = re.compile(r"[0-9a-f]{8,}")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"  # 其他文件浏览器可以缓存，但每次带 ETag 问一下，没变只回 304
+# 仓库根目录就是网站目录，这些东西不能让浏览器读到
+DENY = ['.*', '*/.*', '__pycache__/*', '*.py', '*.pyc', '*.db', '*.db-*', '*.lock', '*.tmp', '*.jsonl', '*.xlsx',
+        'gushiwen_cookies.json', 'metrics/*']
+ENCODING_SUFFIX = {'br': '.br', 'gzip': '.gz'}
+CHUNK = 64 * 1024
+
+mimetypes.add_type('text/csv', '.csv')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('application/json', '.json')
+
+_hash_cache = {}  # (路径, 大小, 修改时间) -> 内容哈希
+_hash_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+# --- 1. 路径安全检查 ---
+def resolve(url_path):
+    """网址路径 -> 磁盘路径；越界或者在黑名单里返回 None"""
+    relative = unquote(url_path).lstrip('/')
+    root = os.path.abspath(SITE_DIR)
+    path = os.path.abspath(os.path.join(root, relative))
+    if path != root and not path.startswith(root + os.sep):
+        return None
+    rel = os.path.relpath(path, root).replace(os.sep, '/')
+    if rel != '.' and any(fnmatch.fnmatch(rel, pattern) for pattern in DENY):
+        return None
+    return path
+
+
+# --- 2. 强 ETag：内容哈希 (文件没改过就不重算) ---
+def content_hash(path, stat):
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_cache:
+            return _hash_cache[key]
+    h = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    with _hash_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+def is_immutable(path, digest, version=''):
+    """文件名带哈希，或者 ?v= 是当前内容哈希的前缀 (至少 8 位)：可以让浏览器永久缓存"""
+    if HASHED_NAME.search(path):
+        return True
+    return bool(VERSION.fullmatch(version)) and digest.startswith(version)
+
+
+# --- 3. 预压缩：.gz 总有，装了 brotli 再加 .br ---
+def _fresh(variant, source):
+    return os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(source)
+
+
+def variant_path(path, encoding):
+    """返回压缩版本的路径 (过期或没有就现场压一份)；压完反而更大返回 None"""
+    suffix = ENCODING_SUFFIX[encoding]
+    sibling = path + suffix  # 构建脚本自己生成的 (比如 corpus/*.json.gz) 直接用
+    if _fresh(sibling, path):
+        variant = sibling
+    else:
+        variant = os.path.join(CACHE_DIR, os.path.relpath(path, SITE_DIR) + suffix)
+        with _build_lock:
+            if not _fresh(variant, path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                if encoding == 'br':
+                    packed = brotli.compress(data, quality=BROTLI_QUALITY)
+                else:
+                    packed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+                os.makedirs(os.path.dirname(variant), exist_ok=True)
+                with open(variant + '.tmp', 'wb') as f:
+                    f.write(packed)
+                os.replace(variant + '.tmp', variant)
+    return variant if os.path.getsize(variant) < os.path.getsize(path) else None
+
+
+def compressible(path, size):
+    return path.endswith(COMPRESSIBLE) and size >= MIN_COMPRESS_SIZE
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def precompress():
+    """启动前把所有能压的文件都压好，第一次访问不用现场等"""
+    raw = packed = files = 0
+    root = os.path.abspath(SITE_DIR)
+    for folder, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if resolve(os.path.relpath(os.path.join(folder, d), root)) is not None]
+        for name in names:
+            path = os.path.join(folder, name)
+            if resolve(os.path.relpath(path, root)) is None:
+                continue
+            size = os.path.getsize(path)
+            if not compressible(path, size):
+                continue
+            best = size
+            for encoding in available_encodings():
+                variant = variant_path(path, encoding)
+                if variant:
+                    best = min(best, os.path.getsize(variant))
+            raw += size
+            packed += best
+            files += 1
+    print(f"🗜️ 预压缩完成: {files} 个文件，{raw / 1024:.1f} KB -> {packed / 1024:.1f} KB"
+          f" ({'/'.join(available_encodings())})")
+
+
+# --- 4. 请求头解析 ---
+def accepted(header):
+    """Accept-Encoding -> 客户端接受的编码集合 (q=0 的不算)"""
+    result = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = re.search(r"q\s*=\s*([\d.]+)", params)
+        if name and (not q or float(q.group(1)) > 0):
+            result.add(name.strip().lower())
+    return result
+
+
+def etag_matches(header, etag):
+    """If-None-Match 用弱比较 (忽略 W/ 前缀)"""
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def parse_range(header, size):
+    """只支持单段 Range；返回 (起, 止)，无法满足返回 False，格式不认识返回 None (当成普通请求)"""
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if end < start and match.group(2):
+        return None if int(match.group(2)) < start else False
+    if start >= size:
+        return False
+    return start, end
+
+
+# --- 5. 请求处理 ---
+class StaticHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        url = urlparse(self.path)
+        path = resolve(url.path)
+        if path and os.path.isdir(path):
+            if not url.path.endswith('/'):
+                self.send_response(301)
+                self.send_header("Location", url.path + '/' + (f"?{url.query}" if url.query else ''))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            path = os.path.join(path, 'index.html')
+        if not path or not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        digest = content_hash(path, stat)
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        version = parse_qs(url.query).get('v', [''])[0]
+        immutable = is_immutable(path, digest, version)
+
+        # Range 只对原文件生效 (图片、视频拖动进度)；If-Range 对不上就退回完整响应
+        byte_range = None
+        if self.headers.get('Range'):
+            if_range = self.headers.get('If-Range')
+            if not if_range or if_range.strip() == f'"{digest}"' or if_range.strip() == last_modified:
+                byte_range = parse_range(self.headers['Range'], stat.st_size)
+
+        encoding, body_path, size = None, path, stat.st_size
+        if byte_range is None and compressible(path, stat.st_size):
+            wanted = accepted(self.headers.get('Accept-Encoding'))
+            for candidate in available_encodings():
+                if candidate in wanted:
+                    variant = variant_path(path, candidate)
+                    if variant:
+                        encoding, body_path, size = candidate, variant, os.path.getsize(variant)
+                        break
+        etag = f'"{digest}-{ENCODING_SUFFIX[encoding][1:]}"' if encoding else f'"{digest}"'
+
+        headers = {
+            "ETag": etag,
+            "Last-Modified": last_modified,
+            "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+            "Accept-Ranges": "bytes",
+        }
+        if compressible(path, stat.st_size):
+            headers["Vary"] = "Accept-Encoding"
+
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{stat.st_size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, length = 0, size
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+        else:
+            self.send_response(200)
+        content_type, packed = mimetypes.guess_type(path)
+        if packed:  # 直接请求 .gz 文件本身 (前端自己解压)，按压缩包原样给
+            content_type = 'application/gzip' if packed == 'gzip' else 'application/octet-stream'
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/json', 'application/javascript'):
+            content_type += '; charset=utf-8'
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.copy_body(body_path, start, length)
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def copy_body(self, path, start, length):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while length > 0:
+                block = f.read(min(CHUNK, length))
+                if not block:
+                    break
+                self.wfile.write(block)
+                length -= len(block)
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地预览网站：预压缩 + ETag + 长缓存 + Range")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--build-only', action='store_true', help="只生成压缩文件，不启动服务")
+    args = parser.parse_args()
+
+    precompress()
+    if args.build_only:
+        return
+    if not brotli:
+        print("💡 没装 brotli (pip install brotli)，只提供 gzip")
+    server = StaticServer((args.host, args.port), StaticHandler)
+    print(f"🌐 网站已启动: http://{args.host}:{args.port}/  (Ctrl+C 停止)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import os
+import re
+from urllib.parse import quote, urlsplit
+
+import lxml.html
+
+import metrics
+import rate_limiter
+from downloader import get_session
+
+# --- 🛠️ 配置区 ---
+# 设成 0 就全部走 Selenium (老办法)
+ENABLED = os.environ.get("STATIC_FETCH", "1") != "0"
+# 站点地址可以用环境变量换成本地服务器，对着保存下来的 HTML 做测试
+GUSHIWEN_BASE = os.environ.get("GUSHIWEN_BASE", "https://so.gushiwen.cn")
+BING_BASE = os.environ.get("BING_BASE", "https://www.bing.com")
+XUESHU_BASE = os.environ.get("XUESHU_BASE", "https://xueshu.baidu.com")
+TIMEOUT = 10
+SCHOLAR_BOILERPLATE = "百度学术集成海量学术资源"  # 百度学术页面 meta description 的开头，不是论文摘要
+
+
+def gushiwen_search_url(keyword, page):
+    return f"{GUSHIWEN_BASE}/search.aspx?value={quote(keyword)}&page={page}"
+
+
+def bing_images_url(keyword, large=False):
+    url = f"{BING_BASE}/images/search?q={quote(keyword)}"
+    if large:
+        url += "&qft=+filterui:imagesize-large"
+    return url
+
+
+def scholar_detail_url(link):
+    """CSV 里存的论文详情页地址，换到 XUESHU_BASE 上 (路径和 paperid 不变)"""
+    parts = urlsplit(link)
+    return f"{XUESHU_BASE}{parts.path}?{parts.query}" if parts.query else f"{XUESHU_BASE}{parts.path}"
+
+
+# --- 1. 取网页 ---
+def fetch_html(url, cookies=None):
+    """
+    返回 HTML 文本；请求失败或非 200 返回 None (调用方应改用 Selenium)。
+    验证码页面不在这里判断 (正常页面的登录框里也有“验证码”字样)，
+    它解析不出结果，调用方同样会退回浏览器
+    """
+    if not ENABLED:
+        return None
+    rate_limiter.wait(url)
+    with metrics.timed("page_static") as timer:
+        try:
+            res = get_session().get(url, timeout=TIMEOUT, cookies=cookies)
+        except Exception as e:
+            timer.outcome = "fail"
+            rate_limiter.backoff(url, type(e).__name__)
+            return None
+        if res.status_code != 200:
+            timer.outcome = "fail"
+            rate_limiter.report_status(url, res.status_code)
+            return None
+        res.encoding = res.apparent_encoding if res.encoding in (None, 'ISO-8859-1') else res.encoding
+        html = res.text
+        if not html.strip():
+            timer.outcome = "skip"
+            return None
+        timer.fields["bytes"] = len(res.content)
+        return html
+
+
+def cookies_from_selenium(cookies):
+    """Selenium 导出的 Cookie 列表 -> requests 能用的 {name: value}"""
+    return {c['name']: c['value'] for c in cookies or [] if 'name' in c and 'value' in c}
+
+
+def element_text(elem):
+    """模仿 Selenium 的 .text：<br> 当换行，每行去掉首尾空白"""
+    for br in elem.iter('br'):
+        br.tail = "\n" + (br.tail or "")
+    lines = [line.strip() for line in elem.text_content().split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+# --- 2. 古诗文网搜索页 (选择器和 Selenium 版一致) ---
+def parse_gushiwen(html, keyword):
+    """返回 [[标题, 作者, 朝代, 正文], ...]"""
+    return _poem_records(lxml.html.fromstring(html).cssselect(".sons .cont"), keyword)
+
+
+def _poem_records(poems, keyword):
+    records = []
+    for poem in poems:
+        titles = poem.cssselect("b")
+        contents = poem.cssselect(".contson")
+        if not titles or not contents:
+            continue
+        title_text = element_text(titles[0])
+        content_text = element_text(contents[0]).replace("\n", " ")
+
+        # 简单去重：如果内容里没有关键词，可能是不相关的
+        if keyword not in (title_text + content_text):
+            continue
+
+        sources = poem.cssselect(".source")
+        if sources:
+            parts = element_text(sources[0]).split('：')
+            era = parts[0] if len(parts) > 0 else "未知"
+            author = parts[1] if len(parts) > 1 else "佚名"
+        else:
+            era, author = "未知", "佚名"
+        records.append([title_text, author, era, content_text])
+    return records
+
+
+def scrape_gushiwen(keyword, page, cookies=None):
+    """
+    静态抓一页古诗文搜索结果：成功返回 (记录列表, 页面地址)，记录可能都被关键词过滤掉了 (空列表)；
+    页面里根本没有结果块 (没结果了、验证码或者要 JS 渲染) 时返回 None，交给浏览器确认
+    """
+    url = gushiwen_search_url(keyword, page)
+    html = fetch_html(url, cookies)
+    if html is None:
+        return None
+    poems = lxml.html.fromstring(html).cssselect(".sons .cont")
+    if not poems:
+        return None
+    rate_limiter.success(url)
+    return _poem_records(poems, keyword), url
+
+
+# --- 3. 必应图片搜索页 ---
+def parse_bing_images(html):
+    """返回 img.mimg 的图片地址列表 (懒加载的图在 data-src 里)"""
+    srcs = []
+    for img in lxml.html.fromstring(html).cssselect("img.mimg"):
+        src = img.get("src") or img.get("data-src")
+        if src and (src.startswith("http") or src.startswith("data:image")):
+            srcs.append(src)
+    return srcs
+
+
+def find_bing_images(keyword, large=False):
+    """静态取必应图片搜索结果：返回图片地址列表，需要浏览器时返回 None"""
+    url = bing_images_url(keyword, large)
+    html = fetch_html(url)
+    if html is None:
+        return None
+    srcs = parse_bing_images(html)
+    if not srcs:
+        return None
+    rate_limiter.success(url)
+    return srcs
+
+
+# --- 4. 百度学术论文详情页 ---
+def _first_text(root, selectors):
+    for selector in selectors:
+        for elem in root.cssselect(selector):
+            text = element_text(elem).replace("\n", " ").strip()
+            if text:
+                return text
+    return ""
+
+
+def parse_scholar_detail(html):
+    """返回 {abstract, authors, year, venue}，没找到的字段是空字符串 / 空列表"""
+    root = lxml.html.fromstring(html)
+    # meta description 不能当摘要用：百度学术每一页都是同一句站点介绍 (SCHOLAR_BOILERPLATE)
+    abstract = _first_text(root, ["p.abstract", ".abstract_wr .abstract", ".abstract"])
+    abstract = re.sub(r"^摘要[:：]\s*", "", abstract)
+
+    authors = []
+    for elem in root.cssselect(".author_text a, .author_wr .author_text span"):
+        name = element_text(elem).strip(" ,，;；")
+        if name and name not in authors:
+            authors.append(name)
+
+    venue = _first_text(root, [".journal_title", ".publish_text a", ".container_wr .kw_main"]).strip("《》 ")
+    year_text = _first_text(root, [".year_wr .kw_main", ".publish_text span", ".publish_text"])
+    year_match = re.search(r"(19|20)\d{2}", year_text)
+    return {
+        "abstract": abstract,
+        "authors": authors,
+        "year": year_match.group(0) if year_match else "",
+        "venue": venue,
+    }
+
+
+def fetch_scholar_detail(link):
+    """静态取一篇论文的详情页：返回 parse_scholar_detail 的结果，取不到或一个字段都没解析出来 (验证码) 返回 None"""
+    url = scholar_detail_url(link)
+    html = fetch_html(url)
+    if html is None:
+        return None
+    detail = parse_scholar_detail(html)
+    if not any(detail.values()):
+        rate_limiter.backoff(url, "空页或验证码")
+        return None
+    rate_limiter.success(url)
+    return detail
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+import design_proxy  # noqa: E402
+
+
+# --- 假的补全接口：数一数被调用了几次，每次慢一点，好让并发请求撞在一起 ---
+class FakeUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), FakeUpstreamHandler)
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/chat/completions"
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.calls += 1
+        time.sleep(self.server.delay)
+        payload = json.dumps({"choices": [{"message": {"content": "方案: " + body["messages"][0]["content"][:20]}}]},
+                             ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def upstream():
+    server = serve(FakeUpstream(delay=0.2))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return design_proxy.DesignCache(str(tmp_path / 'design_cache'))
+
+
+# --- 缓存命中 / 未命中 ---
+def test_miss_then_hit(cache, upstream):
+    body = design_proxy.request_body("荔枝道", "子午道上的驿站")
+    status, data, hit = design_proxy.complete(cache, body, 'key', upstream.url)
+    assert (status, hit) == (200, False)
+    status, again, hit = design_proxy.complete(cache, body, 'key', upstream.url)
+    assert (status, hit) == (200, True)
+    assert again == data
+    assert upstream.calls == 1
+
+
+def test_whitespace_does_not_change_key(cache, upstream):
+    body = design_proxy.request_body("荔枝道", "子午道上的驿站")
+    design_proxy.complete(cache, body, 'key', upstream.url)
+    # 网页模板字符串里每行前面有缩进
+    indented = json.loads(json.dumps(body))
+    indented["messages"][0]["content"] = indented["messages"][0]["content"].replace("\n", "\n            ")
+    assert design_proxy.complete(cache, indented, '', upstream.url)[2] is True
+
+
+def test_miss_without_key_is_not_sent_upstream(cache, upstream):
+    status, _, hit = design_proxy.complete(cache, design_proxy.request_body("荔枝道", ""), '', upstream.url)
+    assert (status, hit) == (401, False)
+    assert upstream.calls == 0
+
+
+# --- 同一个提示词同时来多次，只问上游一次，用完的锁要清掉 ---
+def test_concurrent_misses_are_coalesced(cache, upstream):
+    body = design_proxy.request_body("荔枝道", "同时来的请求")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(design_proxy.complete(cache, body, 'key', upstream.url)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstream.calls == 1
+    assert [status for status, _, _ in results] == [200] * 8
+    assert sum(1 for _, _, hit in results if not hit) == 1
+    assert design_proxy._inflight == {}
+
+
+# --- LRU 淘汰 ---
+def test_eviction_drops_least_recently_used(tmp_path):
+    folder = str(tmp_path / 'design_cache')
+    entry = {"choices": [{"message": {"content": "x" * 100}}]}
+    size = len(json.dumps(entry).encode('utf-8'))
+    cache = design_proxy.DesignCache(folder, max_bytes=size * 2)
+    cache.put('aa01', entry)
+    cache.put('bb02', entry)
+    assert cache.get('aa01') == entry  # aa01 刚用过，bb02 变成最久没用的
+    cache.put('cc03', entry)
+    assert 'bb02' not in cache
+    assert 'aa01' in cache and 'cc03' in cache
+    assert len(cache) == 2
+
+    # 重新打开时按文件修改时间恢复顺序
+    reopened = design_proxy.DesignCache(folder, max_bytes=size * 2)
+    assert len(reopened) == 2
+
+
+# --- 代理服务：只放行本机网页，代理自己的 Key 只用于文创方案提示词 ---
+@pytest.fixture
+def proxy(cache, upstream):
+    server = serve(design_proxy.ProxyServer(('127.0.0.1', 0), cache, 'server-key', upstream.url,
+                                            design_proxy.ALLOWED_ORIGINS + ['https://example.com']))
+    yield f"http://127.0.0.1:{server.server_address[1]}/chat/completions"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body, **headers):
+    import requests
+    return requests.post(url, json=body, headers=headers, timeout=10)
+
+
+@pytest.mark.parametrize("origin", ["http://localhost:8000", "http://127.0.0.1:5500", "null", "https://example.com"])
+def test_allowed_origins(proxy, origin):
+    res = post(proxy, design_proxy.request_body("荔枝道", "驿站"), Origin=origin)
+    assert res.status_code == 200
+    assert res.headers["Access-Control-Allow-Origin"] == origin
+
+
+def test_other_origins_are_rejected(proxy, upstream):
+    res = post(proxy, design_proxy.request_body("荔枝道", "驿站"), Origin="https://evil.example")
+    assert res.status_code == 403
+    assert "Access-Control-Allow-Origin" not in res.headers
+    assert upstream.calls == 0
+
+
+def test_server_key_only_for_design_prompt(proxy, upstream):
+    res = post(proxy, {"model": design_proxy.MODEL, "messages": [{"role": "user", "content": "随便聊聊"}]})
+    assert res.status_code == 403
+    assert upstream.calls == 0
+    # 带了自己的 Key 的请求照常转发
+    res = post(proxy, {"model": design_proxy.MODEL, "messages": [{"role": "user", "content": "随便聊聊"}]},
+               Authorization="Bearer user-key")
+    assert res.status_code == 200
+    assert upstream.calls == 1
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+import downloader  # noqa: E402
+import url_cache  # noqa: E402
+
+OLD_IMAGE = b"\xff\xd8old-image-bytes"
+NEW_IMAGE = b"\xff\xd8new-image-bytes"  # 换了图，大小碰巧一样
+
+
+# --- 本地图片服务器：响应头按测试要求给 ---
+class ImageHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.bodies_requested += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(NEW_IMAGE)))
+        for name, value in self.server.extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(NEW_IMAGE)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    httpd.extra_headers = {}
+    httpd.bodies_requested = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = url_cache.UrlHashCache(str(tmp_path / 'url_hashes.json'))
+    monkeypatch.setattr(url_cache, "_cache", cache)
+    return cache
+
+
+def remember_old_image(cache, url, **headers):
+    """网址缓存里记着这个网址以前下过 OLD_IMAGE，而且已经过了信任期 (要联网确认)"""
+    cache.record(url, hashlib.md5(OLD_IMAGE).hexdigest(), len(OLD_IMAGE), **headers)
+    cache.entries[url_cache.normalize_url(url)]["ts"] = 0
+    return {hashlib.md5(OLD_IMAGE).hexdigest()}
+
+
+def image_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/th/id/OIP.a1b2c3"
+
+
+def test_same_size_without_validators_downloads_body(server, cache):
+    url = image_url(server)
+    known = remember_old_image(cache, url)
+    assert downloader.fetch_bytes(url, known=known.__contains__) == NEW_IMAGE
+
+
+def test_same_size_with_changed_last_modified_downloads_body(server, cache):
+    url = image_url(server)
+    known = remember_old_image(cache, url, last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    server.extra_headers = {"Last-Modified": "Tue, 02 Jan 2024 00:00:00 GMT"}
+    assert downloader.fetch_bytes(url, known=known.__contains__) == NEW_IMAGE
+
+
+def test_matching_last_modified_and_size_is_skipped(server, cache):
+    url = image_url(server)
+    known = remember_old_image(cache, url, last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    server.extra_headers = {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert downloader.fetch_bytes(url, known=known.__contains__) is None
+
+
+def test_matching_etag_is_skipped(server, cache):
+    url = image_url(server)
+    known = remember_old_image(cache, url, etag='"v1"')
+    server.extra_headers = {"ETag": '"v1"'}
+    assert downloader.fetch_bytes(url, known=known.__contains__) is None
+
+
+def test_download_to_file_failure_returns_false(tmp_path, cache, monkeypatch):
+    import metrics
+    monkeypatch.setattr(metrics, "_counts", {})
+    save_path = tmp_path / "1.jpg"
+    # 没有服务在听的端口：连接失败也不抛异常，返回 False，不留半截文件，记一次 fail
+    assert downloader.download_to_file("http://127.0.0.1:9/th/id/x.jpg", str(save_path), timeout=2) is False
+    assert not any(tmp_path.glob("*.jpg*"))
+    assert metrics._counts.get(("download", "fail")) == 1
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("requests")
+
+import enrich_scholar  # noqa: E402
+from crawl_queue import CrawlQueue  # noqa: E402
+from static_fetch import SCHOLAR_BOILERPLATE  # noqa: E402
+
+BOILERPLATE_ROW = ['2001', '从《全唐诗》看唐代驿传制度', '张三', '2015年',
+                   SCHOLAR_BOILERPLATE + "，融合人工智能、深度学习、大数据分析等技术，为科研工作者提供全面快捷的学术服务。",
+                   '学术研究', 'https://xueshu.baidu.com/usercenter/paper/show?paperid=abc']
+
+
+@pytest.fixture
+def tasks(tmp_path):
+    queue = CrawlQueue(str(tmp_path / 'crawl_queue.db'))
+    yield queue
+    queue.close()
+
+
+def test_boilerplate_abstract_counts_as_missing():
+    assert enrich_scholar.missing_fields(BOILERPLATE_ROW) == ['content']
+
+
+def test_done_task_with_boilerplate_is_leased_again(tasks):
+    # 上一次运行把站点介绍当成摘要写进去了，任务已经交差
+    tasks.enqueue(enrich_scholar.QUEUE_NAME, [('2001', 0)])
+    assert tasks.lease(enrich_scholar.QUEUE_NAME, 'old-run') == ('2001', 0)
+    tasks.complete(enrich_scholar.QUEUE_NAME, '2001', 0)
+    assert not tasks.has_open_tasks(enrich_scholar.QUEUE_NAME)
+
+    todo = {row[0]: row for row in [BOILERPLATE_ROW] if enrich_scholar.missing_fields(row)}
+    assert enrich_scholar.register_tasks(tasks, todo) == 1
+    assert tasks.has_open_tasks(enrich_scholar.QUEUE_NAME)
+    assert tasks.lease(enrich_scholar.QUEUE_NAME, 'new-run') == ('2001', 0)
@@ -0,0 +1,29 @@
+import queue
+import threading
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("requests")
+
+import get_images  # noqa: E402
+
+
+def test_worker_survives_a_failing_job(tmp_path, monkeypatch):
+    done = []
+
+    def download_job(job, existing):
+        if job[0] == "坏任务":
+            raise OSError("No space left on device")
+        done.append(job[0])
+
+    monkeypatch.setattr(get_images, "download_job", download_job)
+    jobs = queue.Queue(maxsize=2)
+    worker = threading.Thread(target=get_images.download_worker, args=(jobs, {}), daemon=True)
+    worker.start()
+    jobs.put(("坏任务", str(tmp_path / "1.jpg"), ["http://127.0.0.1/x.jpg"]))
+    jobs.put(("好任务", str(tmp_path / "2.jpg"), ["http://127.0.0.1/y.jpg"]))
+    jobs.put(None, timeout=5)
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert done == ["好任务"]
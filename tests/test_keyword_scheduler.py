@@ -0,0 +1,29 @@
+import time
+
+import keyword_scheduler
+from keyword_scheduler import KeywordScheduler
+
+
+def make_scheduler(tmp_path):
+    return KeywordScheduler(['荔枝'], ['壁画', '拓片'], [''], str(tmp_path / 'keyword_stats.json'))
+
+
+def test_failed_downloads_do_not_exhaust(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    scheduler.update('荔枝 壁画', 0, 0, 5.0, exhausted=True, failed=10)
+    assert scheduler.arms['壁画 荔枝']['exhausted'] is False
+
+
+def test_all_duplicates_exhaust(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    scheduler.update('荔枝 拓片', 0, 4, 5.0, exhausted=True)
+    scheduler.save()
+    reloaded = make_scheduler(tmp_path)
+    assert [reloaded.next(), reloaded.next()] == ['荔枝 壁画', None]
+
+
+def test_exhausted_arm_comes_back_after_expiry(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    scheduler.update('荔枝 拓片', 0, 4, 5.0, exhausted=True)
+    scheduler.arms['拓片 荔枝']['last_run'] = time.time() - (keyword_scheduler.EXHAUSTED_DAYS + 1) * 86400
+    assert {scheduler.next(), scheduler.next()} == {'荔枝 壁画', '荔枝 拓片'}
@@ -0,0 +1,20 @@
+import serve
+
+DIGEST = "3f2a9c0d11e4b7a8"
+
+
+def test_hashed_names_are_immutable():
+    assert serve.is_immutable("corpus/0/1.a1b2c3d4e5f6.json", DIGEST)
+    # 构建脚本预压缩好的分片
+    assert serve.is_immutable("corpus/0/1.a1b2c3d4e5f6.json.gz", DIGEST)
+    assert not serve.is_immutable("corpus/manifest.json", DIGEST)
+    assert not serve.is_immutable("data.csv", DIGEST)
+
+
+def test_version_must_be_a_real_hash_prefix():
+    assert serve.is_immutable("data.csv", DIGEST, DIGEST[:8])
+    assert serve.is_immutable("data.csv", DIGEST, DIGEST)
+    assert not serve.is_immutable("data.csv", DIGEST, DIGEST[:1])
+    assert not serve.is_immutable("data.csv", DIGEST, DIGEST[:7])
+    assert not serve.is_immutable("data.csv", DIGEST, "deadbeef")
+    assert not serve.is_immutable("data.csv", DIGEST, "")
@@ -0,0 +1,90 @@
+import re
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("requests")
+
+import static_fetch  # noqa: E402
+from conftest import read_fixture  # noqa: E402
+
+
+# --- 古诗文网搜索页 (fixtures/gushiwen_*.html 是保存下来的页面) ---
+def test_parse_gushiwen_records():
+    records = static_fetch.parse_gushiwen(read_fixture('gushiwen_search.html'), "荔枝")
+    assert records == [
+        ["过华清宫绝句三首·其一", "杜牧", "唐代", "长安回望绣成堆，山顶千门次第开。 一骑红尘妃子笑，无人知是荔枝来。"],
+        ["惠州一绝 / 食荔枝", "苏轼", "宋代", "罗浮山下四时春，卢橘杨梅次第新。 日啖荔枝三百颗，不辞长作岭南人。"],
+        # 没有 .source 的按未知/佚名处理
+        ["荔枝叹", "佚名", "未知", "十里一置飞尘灰，五里一堠兵火催。"],
+    ]
+
+
+def test_parse_gushiwen_filters_unrelated_poems():
+    titles = [record[0] for record in static_fetch.parse_gushiwen(read_fixture('gushiwen_search.html'), "荔枝")]
+    assert "静夜思" not in titles
+
+
+def test_parse_gushiwen_empty_page_despite_login_captcha_text():
+    # 正常页面的登录框里也有“验证码”字样，不能因此判成验证码页；解析结果为空由调用方交给浏览器确认
+    assert static_fetch.parse_gushiwen(read_fixture('gushiwen_empty.html'), "荔枝") == []
+
+
+def test_scrape_gushiwen_results_present_none_match(monkeypatch):
+    # 页面正常、有结果块，只是都被关键词过滤掉了：静态抓取算成功，不用开浏览器
+    monkeypatch.setattr(static_fetch, "fetch_html", lambda url, cookies=None: read_fixture('gushiwen_search.html'))
+    records, url = static_fetch.scrape_gushiwen("蜀道", 1)
+    assert records == []
+    assert url == static_fetch.gushiwen_search_url("蜀道", 1)
+
+
+def test_scrape_gushiwen_without_results_needs_browser(monkeypatch):
+    monkeypatch.setattr(static_fetch, "fetch_html", lambda url, cookies=None: read_fixture('gushiwen_empty.html'))
+    assert static_fetch.scrape_gushiwen("荔枝", 1) is None
+
+
+def test_gushiwen_search_url_uses_base(monkeypatch):
+    monkeypatch.setattr(static_fetch, "GUSHIWEN_BASE", "http://127.0.0.1:8000")
+    assert static_fetch.gushiwen_search_url("荔枝", 2) == \
+        "http://127.0.0.1:8000/search.aspx?value=%E8%8D%94%E6%9E%9D&page=2"
+
+
+# --- 必应图片搜索页 ---
+def test_parse_bing_images():
+    srcs = static_fetch.parse_bing_images(read_fixture('bing_images.html'))
+    assert srcs == [
+        "https://tse1.mm.bing.net/th/id/OIP.a1b2c3?w=200&h=150&pid=1.7",
+        "https://tse2.mm.bing.net/th/id/OIP.d4e5f6?w=200&pid=1.7",  # 懒加载的图只有 data-src
+        "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQ==",
+    ]
+
+
+def test_bing_images_url(monkeypatch):
+    monkeypatch.setattr(static_fetch, "BING_BASE", "http://127.0.0.1:8000")
+    assert static_fetch.bing_images_url("荔枝道", large=True).endswith("&qft=+filterui:imagesize-large")
+
+
+# --- 百度学术论文详情页 ---
+def test_parse_scholar_detail():
+    detail = static_fetch.parse_scholar_detail(read_fixture('xueshu_paper.html'))
+    assert detail == {
+        "abstract": "唐代驿传制度是中央政令传达和物资转运的基础。本文以《全唐诗》中的驿站诗为材料，考察驿道分布与驿传运作。",
+        "authors": ["张三", "李四", "王五", "赵六"],
+        "year": "2015",
+        "venue": "中国史研究",
+    }
+
+
+def test_scholar_detail_ignores_meta_description():
+    # 没有摘要块的页面，meta description 里是百度学术的站点介绍，不能写成摘要
+    html = re.sub(r'<div class="abstract_wr">.*?</div>', '', read_fixture('xueshu_paper.html'), flags=re.S)
+    detail = static_fetch.parse_scholar_detail(html)
+    assert detail["abstract"] == ""
+    assert detail["authors"] == ["张三", "李四", "王五", "赵六"]
+
+
+def test_scholar_detail_url_keeps_paperid(monkeypatch):
+    monkeypatch.setattr(static_fetch, "XUESHU_BASE", "http://127.0.0.1:8000")
+    link = "https://xueshu.baidu.com/usercenter/paper/show?paperid=bd420016315f6471849f5549fde95324&site=xueshu_se"
+    assert static_fetch.scholar_detail_url(link) == \
+        "http://127.0.0.1:8000/usercenter/paper/show?paperid=bd420016315f6471849f5549fde95324&site=xueshu_se"
@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import time
+import atexit
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# --- 🛠️ 配置区 ---
+CACHE_FILE = 'url_hashes.json'  # 图片网址 -> 内容哈希/大小/ETag/时间，跨运行累积
+TRUST_DAYS = 30  # 这么多天内记过的网址直接信缓存，不联网；过期的带 If-None-Match 问一下
+EXPIRE_DAYS = 180  # 超过这么久没见过的网址加载时丢掉，免得文件越攒越大
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 单张图超过这个大小直接放弃 (Content-Length 超了不下，流式下载中途超了就断开)
+BING_THUMB_HOST = re.compile(r"^tse\d+\.mm\.bing\.net$")  # 必应缩略图的 tse1~tse4 是同一批图的镜像
+DROP_PARAMS = re.compile(r"^(utm_\w+|spm|from)$")  # 不影响图片内容的统计参数
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_url(url):
+    """同一张图的不同写法归成一个键：主机名小写、去掉默认端口/锚点/统计参数、参数排序、必应镜像主机合并"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if BING_THUMB_HOST.match(host):
+        host = "tse.mm.bing.net"
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not DROP_PARAMS.match(k))
+    return urlunsplit((parts.scheme.lower(), host, parts.path or "/", urlencode(query), ""))
+
+
+class UrlHashCache:
+    """
+    图片网址 -> 内容哈希的持久化索引，下载前先查：
+    - lookup() 查这个网址以前下回来的是什么内容 (md5、大小、ETag、Last-Modified)
+    - md5_for_etag() 别的网址 (同一主机) 返回过同一个 ETag，说明是同一张图
+    下载器 (downloader.py) 每下完一张就 record() 一次
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.entries = {}  # 规范化网址 -> {md5, size, etag, last_modified, ts}
+        self.by_etag = {}  # "主机 ETag" -> md5
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("urls", {})
+            except (OSError, ValueError):
+                print(f"⚠️ 网址缓存 {self.path} 损坏，重新建立")
+                self.entries = {}
+        cutoff = time.time() - EXPIRE_DAYS * 86400
+        expired = [key for key, entry in self.entries.items() if entry.get("ts", 0) < cutoff]
+        for key in expired:
+            del self.entries[key]
+        self.dirty = bool(expired)
+        for key, entry in self.entries.items():
+            self._index_etag(key, entry)
+        return self
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            data = json.dumps({"urls": self.entries}, ensure_ascii=False, separators=(',', ':'))
+            self.dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    # --- 1. 查询 ---
+    def lookup(self, url):
+        with self._lock:
+            return self.entries.get(normalize_url(url))
+
+    def md5_of(self, url):
+        entry = self.lookup(url)
+        return entry["md5"] if entry else None
+
+    def fresh(self, entry):
+        return time.time() - entry.get("ts", 0) < TRUST_DAYS * 86400
+
+    def md5_for_etag(self, url, etag):
+        if not etag:
+            return None
+        with self._lock:
+            return self.by_etag.get(self._etag_key(normalize_url(url), etag))
+
+    # --- 2. 记录 ---
+    def record(self, url, md5, size, etag=None, last_modified=None):
+        key = normalize_url(url)
+        entry = {"md5": md5, "size": size, "ts": round(time.time())}
+        if etag:
+            entry["etag"] = etag
+        if last_modified:
+            entry["last_modified"] = last_modified
+        with self._lock:
+            self.entries[key] = entry
+            self._index_etag(key, entry)
+            self.dirty = True
+
+    def touch(self, url):
+        """服务器确认没变 (304 / ETag 或 Last-Modified 对上)，刷新时间"""
+        with self._lock:
+            entry = self.entries.get(normalize_url(url))
+            if entry:
+                entry["ts"] = round(time.time())
+                self.dirty = True
+
+    def _etag_key(self, key, etag):
+        return f"{urlsplit(key).netloc} {etag}"
+
+    def _index_etag(self, key, entry):
+        if entry.get("etag"):
+            self.by_etag[self._etag_key(key, entry["etag"])] = entry["md5"]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# --- 全进程共用一份 (第一次用到时加载，进程退出时自动落盘) ---
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UrlHashCache().load()
+            atexit.register(_cache.save)
+    return _cache